@@ -1,20 +1,31 @@
 import os
 import json
-import google.generativeai as genai
-from fastapi import APIRouter, Depends, HTTPException, Query
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from db.database import get_db
+from db.database import get_db, SessionLocal
 from db import models
 from schemas.ai_metadata import AiMetadataCreate, AiMetadataOut
+from schemas.jobs import JobOut
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 from datetime import datetime
-
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from api import llm
+from api.jobs import enqueue
+from api.llm import LLM_MAX_CONCURRENCY
+from api.tokens import authorize_business, get_current_session, require_admin
 
 router = APIRouter(prefix="/ai-metadata", tags=["AI Metadata"])
 
+# --- 🚀 SYSTEM DESIGN: BATCHED GENERATION ---
+# A full catalog refresh packs METADATA_BATCH_SIZE businesses into one prompt
+# and reads per-business results out of the combined JSON. Anything the model
+# dropped or mangled falls back to the single-business prompt. Batches are
+# prepared in parallel, but the API calls themselves share the process-wide
+# LLM_MAX_CONCURRENCY slots in api/llm.py with every other caller.
+METADATA_BATCH_SIZE = int(os.getenv("METADATA_BATCH_SIZE", "10"))
+
 # --- Helper to clean lists ---
 def ensure_string(value):
     """Converts lists/arrays to a clean comma-separated string."""
@@ -24,10 +35,8 @@ def ensure_string(value):
 
 # --- CREATE (Manual) ---
 @router.post("/", response_model=AiMetadataOut)
-def create_metadata(data: AiMetadataCreate, db: Session = Depends(get_db)):
-    business = db.query(models.BusinessProfile).filter_by(business_id=data.business_id).first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
+def create_metadata(data: AiMetadataCreate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    authorize_business(db, data.business_id, session)
     
     new_metadata = models.AiMetadata(**data.model_dump())
     db.add(new_metadata)
@@ -62,41 +71,49 @@ def get_metadata(metadata_id: UUID, db: Session = Depends(get_db)):
 
 # --- DELETE ---
 @router.delete("/{metadata_id}")
-def delete_metadata(metadata_id: UUID, db: Session = Depends(get_db)):
+def delete_metadata(metadata_id: UUID, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
     metadata = db.query(models.AiMetadata).filter_by(ai_metadata_id=metadata_id).first()
     if not metadata:
         raise HTTPException(status_code=404, detail="Metadata not found")
+    authorize_business(db, metadata.business_id, session)
     
     db.delete(metadata)
     db.commit()
     return {"message": "Metadata deleted successfully"}
 
 # --- GENERATE (The Smart Version) ---
-@router.post("/generate", response_model=AiMetadataOut)
-def generate_metadata(business_id: UUID = Query(...), db: Session = Depends(get_db)):
-    # 1. Fetch Main Business Profile
-    business = db.query(models.BusinessProfile).filter_by(business_id=business_id).first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
-
-    # 2. Fetch Related Data (Services, Hours) safely
-    services_list = []
+@router.post("/generate", response_model=JobOut, status_code=202)
+def generate_metadata(business_id: UUID = Query(...), db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    # Validate now, generate later: the LLM call runs on the job pool (poll /jobs/{job_id})
+    authorize_business(db, business_id, session)
+    return enqueue("ai_metadata", generate_metadata_job, business_id)
+
+@router.post("/generate-batch", response_model=JobOut, status_code=202)
+def generate_metadata_batch_endpoint(
+    business_ids: Optional[List[UUID]] = Body(None, embed=True),
+    batch_size: int = Query(METADATA_BATCH_SIZE, ge=1, le=50),
+    session: dict = Depends(require_admin),
+):
+    # No ids = refresh the whole catalog; progress and totals come back on the job.
+    # One batch run at a time: a second one would only pay for the same LLM calls again
+    return enqueue("ai_metadata_batch", generate_all_metadata, business_ids, batch_size, LLM_MAX_CONCURRENCY, None, exclusive=True)
+
+def generate_metadata_job(business_id: UUID) -> dict:
+    db = SessionLocal()
     try:
-        services_q = db.query(models.Service).filter_by(business_id=business_id).all()
-        services_list = [f"{s.name} (${s.price})" for s in services_q]
-    except Exception:
-        pass 
+        metadata = generate_metadata_for_business(business_id, db)
+        return AiMetadataOut.model_validate(metadata, from_attributes=True).model_dump(mode="json")
+    finally:
+        db.close()
+
+def build_metadata_context(business, services, op_info) -> str:
+    services_list = [f"{s.name} (${s.price})" for s in services]
 
     op_info_str = "Not listed"
-    try:
-        op_info = db.query(models.OperationalInfo).filter_by(business_id=business_id).first()
-        if op_info:
-            op_info_str = f"Open: {op_info.opening_hours} - {op_info.closing_hours}, Off: {op_info.off_days}"
-    except Exception:
-        pass
-
-    # 3. Construct a RICH Context Prompt
-    context_text = f"""
+    if op_info:
+        op_info_str = f"Open: {op_info.opening_hours} - {op_info.closing_hours}, Off: {op_info.off_days}"
+
+    return f"""
     Business Name: {business.name}
     Type: {business.business_type}
     Description: {business.description or 'No description provided.'}
@@ -112,7 +129,26 @@ def generate_metadata(business_id: UUID = Query(...), db: Session = Depends(get_
     - Operational Info: {op_info_str}
     """
 
-    prompt = f"""
+def load_metadata_contexts(db: Session, business_ids) -> dict:
+    # Three queries for any number of businesses: profiles, services, operational info
+    businesses = db.query(models.BusinessProfile).filter(models.BusinessProfile.business_id.in_(business_ids)).all()
+    services = {}
+    for s in db.query(models.Service).filter(models.Service.business_id.in_(business_ids)).all():
+        services.setdefault(s.business_id, []).append(s)
+    op_infos = {}
+    for info in db.query(models.OperationalInfo).filter(models.OperationalInfo.business_id.in_(business_ids)).all():
+        op_infos.setdefault(info.business_id, info)
+
+    # Keep the caller's order so the same batch always yields the same (cacheable) prompt
+    by_id = {b.business_id: b for b in businesses}
+    return {
+        business_id: build_metadata_context(by_id[business_id], services.get(business_id, []), op_infos.get(business_id))
+        for business_id in business_ids
+        if business_id in by_id
+    }
+
+def metadata_prompt(context_text: str) -> str:
+    return f"""
     Act as a Senior SEO Specialist. 
     Analyze this local business and generate optimized metadata.
 
@@ -127,47 +163,140 @@ def generate_metadata(business_id: UUID = Query(...), db: Session = Depends(get_
     4. "detected_entities": A single string listing important entities (City, Services, Brands).
     """
 
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash') 
-        
-        response = model.generate_content(prompt)
-        
-        # Clean response
-        clean_text = response.text.replace("```json", "").replace("```", "").strip()
-        ai_data = json.loads(clean_text)
+def batch_metadata_prompt(contexts: dict) -> str:
+    sections = "\n".join(f"    ### business_id: {business_id}\n{context}" for business_id, context in contexts.items())
+    return f"""
+    Act as a Senior SEO Specialist. 
+    Analyze each of these {len(contexts)} local businesses separately and generate optimized metadata for each one.
+
+{sections}
+
+    Return ONLY a valid JSON object whose keys are the business_id values above, exactly as written.
+    Each value is an object with these 4 keys.
+    IMPORTANT: The values for 'keywords', 'intent_labels', and 'detected_entities' MUST be simple comma-separated STRINGS, not arrays.
 
+    1. "keywords": A single string of 15 comma-separated specific keywords (combine location + service + slogan).
+    2. "extracted_insights": A compelling 1-sentence marketing pitch.
+    3. "intent_labels": A single string of 3 user intents (e.g., "Booking, Inquiry, Discovery").
+    4. "detected_entities": A single string listing important entities (City, Services, Brands).
+    """
+
+def parse_llm_json(response_text: str):
+    clean_text = response_text.replace("```json", "").replace("```", "").strip()
+    return json.loads(clean_text)
+
+def save_metadata(db: Session, results: dict) -> dict:
+    # results: {business_id: ai_data}. Update if exists, one commit for the whole batch
+    existing = {
+        m.business_id: m
+        for m in db.query(models.AiMetadata).filter(models.AiMetadata.business_id.in_(list(results))).all()
+    }
+    saved = {}
+    for business_id, ai_data in results.items():
         # ✅ FIX: Force conversion of Lists to clean comma-separated Strings
-        keywords_str = ensure_string(ai_data.get("keywords"))
-        insights_str = ensure_string(ai_data.get("extracted_insights"))
-        intents_str = ensure_string(ai_data.get("intent_labels"))
-        entities_str = ensure_string(ai_data.get("detected_entities"))
-
-        # Save to DB (Update if exists)
-        existing_meta = db.query(models.AiMetadata).filter(models.AiMetadata.business_id == business_id).first()
-        
-        if existing_meta:
-            existing_meta.keywords = keywords_str
-            existing_meta.extracted_insights = insights_str
-            existing_meta.intent_labels = intents_str
-            existing_meta.detected_entities = entities_str
-            existing_meta.generated_at = datetime.utcnow()
-            db.commit()
-            db.refresh(existing_meta)
-            return existing_meta
+        fields = {
+            "keywords": ensure_string(ai_data.get("keywords")),
+            "extracted_insights": ensure_string(ai_data.get("extracted_insights")),
+            "intent_labels": ensure_string(ai_data.get("intent_labels")),
+            "detected_entities": ensure_string(ai_data.get("detected_entities")),
+            "generated_at": datetime.utcnow(),
+        }
+        meta = existing.get(business_id)
+        if meta:
+            for key, value in fields.items():
+                setattr(meta, key, value)
         else:
-            new_meta = models.AiMetadata(
-                business_id=business_id,
-                keywords=keywords_str,
-                extracted_insights=insights_str,
-                intent_labels=intents_str,
-                detected_entities=entities_str,
-                generated_at=datetime.utcnow(),
-            )
-            db.add(new_meta)
-            db.commit()
-            db.refresh(new_meta)
-            return new_meta
+            meta = models.AiMetadata(business_id=business_id, **fields)
+            db.add(meta)
+        saved[business_id] = meta
+    db.commit()
+    for meta in saved.values():
+        db.refresh(meta)
+    return saved
+
+def generate_metadata_for_business(business_id: UUID, db: Session) -> models.AiMetadata:
+    # 1. Fetch the business with its services and hours
+    contexts = load_metadata_contexts(db, [business_id])
+    if business_id not in contexts:
+        raise ValueError("Business not found")
+
+    # 2. Construct a RICH Context Prompt
+    prompt = metadata_prompt(contexts[business_id])
+
+    try:
+        ai_data = parse_llm_json(llm.generate('gemini-2.5-flash', prompt))
+        return save_metadata(db, {business_id: ai_data})[business_id]
 
     except Exception as e:
         print(f"AI Generation Error: {e}")
-        raise HTTPException(status_code=500, detail=f"AI Error: {str(e)}")
\ No newline at end of file
+        llm.forget('gemini-2.5-flash', prompt)
+        raise RuntimeError(f"AI Error: {str(e)}")
+
+
+# --- GENERATE (Batched) ---
+def generate_metadata_batch(business_ids, db: Session) -> dict:
+    contexts = load_metadata_contexts(db, business_ids)
+    stats = {"batched": 0, "fallback": 0, "failed": 0, "missing": len(business_ids) - len(contexts)}
+    if not contexts:
+        return stats
+
+    prompt = batch_metadata_prompt(contexts)
+    results = {}
+    try:
+        combined = parse_llm_json(llm.generate('gemini-2.5-flash', prompt))
+        if not isinstance(combined, dict):
+            raise ValueError("Expected a JSON object keyed by business_id")
+        for business_id in contexts:
+            ai_data = combined.get(str(business_id))
+            if isinstance(ai_data, dict):
+                results[business_id] = ai_data
+    except Exception as e:
+        print(f"AI Batch Generation Error ({len(contexts)} businesses): {e}")
+        llm.forget('gemini-2.5-flash', prompt)
+
+    if results:
+        save_metadata(db, results)
+        stats["batched"] = len(results)
+
+    # Fall back to one call per business the batch answer did not cover
+    for business_id in contexts:
+        if business_id in results:
+            continue
+        try:
+            generate_metadata_for_business(business_id, db)
+            stats["fallback"] += 1
+        except Exception:
+            db.rollback()
+            stats["failed"] += 1
+    return stats
+
+def _generate_batch_job(business_ids) -> dict:
+    db = SessionLocal()
+    try:
+        return generate_metadata_batch(business_ids, db)
+    finally:
+        db.close()
+
+def generate_all_metadata(business_ids=None, batch_size=METADATA_BATCH_SIZE, concurrency=LLM_MAX_CONCURRENCY, progress=print) -> dict:
+    started = time.monotonic()
+    if business_ids is None:
+        db = SessionLocal()
+        try:
+            business_ids = [row[0] for row in db.query(models.BusinessProfile.business_id).order_by(models.BusinessProfile.business_id)]
+        finally:
+            db.close()
+    business_ids = list(dict.fromkeys(UUID(str(b)) for b in business_ids))
+
+    totals = {"total": len(business_ids), "batched": 0, "fallback": 0, "failed": 0, "missing": 0, "llm_batches": 0}
+    batches = [business_ids[i:i + batch_size] for i in range(0, len(business_ids), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="ai-metadata") as pool:
+        for stats in pool.map(_generate_batch_job, batches):
+            totals["llm_batches"] += 1
+            for key, value in stats.items():
+                totals[key] += value
+            if progress:
+                done = totals["batched"] + totals["fallback"] + totals["failed"] + totals["missing"]
+                progress(f"🧠 AI metadata: {done}/{totals['total']} (fallback {totals['fallback']}, failed {totals['failed']})")
+
+    totals["seconds"] = round(time.monotonic() - started, 2)
+    return totals
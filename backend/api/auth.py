@@ -1,27 +1,74 @@
+from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from db.database import get_db
 from db.models import User, BusinessProfile  # ✅ Import BusinessProfile
-from schemas.auth import LoginRequest
-from api.security import verify_password 
+from schemas.auth import LoginRequest, RefreshRequest, TokenOut
+from api.security import verify_password_async, hash_password_async, needs_rehash
+from api.tokens import InvalidToken, decode_token, get_current_session, is_admin, issue_token_pair, revoke_session
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 @router.post("/login")
-def login(data: LoginRequest, db: Session = Depends(get_db)):
-    # 1. Verify User
-    user = db.query(User).filter_by(email=data.email).first()
-    
-    if not user or not verify_password(data.password, user.password_hash):
+async def login(data: LoginRequest, db: Session = Depends(get_db)):
+    # 1. Verify User (bcrypt runs on the hashing pool, not the request threadpool)
+    user = await run_in_threadpool(lambda: db.query(User).filter_by(email=data.email).first())
+
+    # No password on file (external provider, passwordless import): nothing to check against
+    if not user or not user.password_hash or not await verify_password_async(data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid email or password")
-        
-    # 2. ✅ OPTIMIZATION: Fetch Business ID internally (Zero network latency)
-    business = db.query(BusinessProfile).filter_by(owner_id=user.user_id).first()
+
+    user_id = user.user_id
+
+    # 2. Cost factor changed since this hash was made? Upgrade it while we know the password
+    if needs_rehash(user.password_hash):
+        try:
+            user.password_hash = await hash_password_async(data.password)
+            await run_in_threadpool(db.commit)
+        except HTTPException:
+            pass  # Hashing pool is saturated: keep the old hash, upgrade on a later login
+
+    # 3. ✅ OPTIMIZATION: Fetch Business ID internally (Zero network latency)
+    business = await run_in_threadpool(lambda: db.query(BusinessProfile).filter_by(owner_id=user_id).first())
     business_id = str(business.business_id) if business else None
 
-    # 3. Return everything in ONE response
+    # 4. Return everything in ONE response, plus the session tokens
     return {
-        "user_id": str(user.user_id),
+        "user_id": str(user_id),
         "business_id": business_id,  # ✅ Sending this now!
-        "status": "authenticated"
-    }
\ No newline at end of file
+        "status": "authenticated",
+        **issue_token_pair(user_id, business_id, is_admin(user.email)),
+    }
+
+# ✅ Rotation: a valid refresh token is spent for a new session (new access + refresh token)
+@router.post("/refresh", response_model=TokenOut)
+def refresh(data: RefreshRequest, db: Session = Depends(get_db)):
+    try:
+        claims = decode_token(data.refresh_token, "refresh")
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    # Rare (once per access TTL), so it may look at the DB: deactivated users stop here,
+    # and a business created after login gets into the claims
+    user = db.query(User).filter_by(user_id=UUID(claims["sub"])).first()
+    if not user or not user.is_active:
+        raise HTTPException(status_code=401, detail="User is not active")
+    business = db.query(BusinessProfile.business_id).filter_by(owner_id=user.user_id).first()
+    business_id = business.business_id if business else None
+
+    # End the old session first: of two refreshes racing with the same token, only one wins
+    if not revoke_session(claims):
+        raise HTTPException(status_code=401, detail="Session ended")
+    return issue_token_pair(user.user_id, business_id, is_admin(user.email))
+
+# ✅ Ends the session: its access and refresh tokens are both rejected from now on
+@router.post("/logout")
+def logout(session: dict = Depends(get_current_session)):
+    revoke_session(session)
+    return {"status": "logged_out"}
+
+# ✅ Who am I? Answered from the token alone (no query)
+@router.get("/me")
+async def read_session(session: dict = Depends(get_current_session)):
+    return {"user_id": session["sub"], "business_id": session["bid"], "expires_at": session["exp"]}
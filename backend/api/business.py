@@ -1,64 +1,257 @@
+import os
+import json
+import math
+import base64
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from db.database import get_db
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session, selectinload
+from db.database import get_db, SessionLocal
 from db import models
 # ✅ UPDATED: Imported BusinessDirectoryView
-from schemas.business import BusinessCreate, BusinessOut, BusinessUpdate, BusinessDirectoryView
+from schemas.business import BusinessCreate, BusinessOut, BusinessUpdate, BusinessDirectoryView, BusinessDirectoryPage, BusinessType
 from uuid import UUID
 from typing import List
-from datetime import datetime, timedelta, timezone  # ✅ Added timezone and timedelta
+from datetime import datetime, timezone
+from api.cache import cache, on_business_change, publish_business_change
+from api.media_variants import variant_url_expr
+from api.tokens import authorize_business, get_current_session
 
 router = APIRouter(prefix="/business", tags=["Business"])
 
-# --- 🚀 SYSTEM DESIGN: IN-MEMORY CACHE ---
-# Stores the directory result to avoid hitting the DB on every request.
-DIRECTORY_CACHE = {
-    "data": None,
-    "expires_at": datetime.now(timezone.utc)
-}
+# --- 🚀 SYSTEM DESIGN: SHARED DIRECTORY CACHE ---
+# Stored in the pluggable cache layer (api/cache.py) so every worker sees the
+# same snapshot and the same invalidations.
+DIRECTORY_NAMESPACE = "directory"
 CACHE_TTL_SECONDS = 300  # 5 Minutes
+# Serve an expired snapshot for this long while it is refreshed in the background (0 = off)
+CACHE_STALE_SECONDS = int(os.getenv("DIRECTORY_CACHE_STALE_SECONDS", "300"))
+# Display width of a directory card image; the listing links the smallest variant that covers it
+DIRECTORY_IMAGE_WIDTH = int(os.getenv("DIRECTORY_IMAGE_WIDTH", "320"))
+# Filtered pages are keyed by client input: they get a budget of their own (so they
+# can't evict "all"), bounding boxes are snapped outward to a ~1 km grid so nearby
+# map views share an entry, and empty pages are not cached
+DIRECTORY_PAGE_NAMESPACE = "directory_page"
+DIRECTORY_PAGE_CACHE_ENTRIES = int(os.getenv("DIRECTORY_PAGE_CACHE_ENTRIES", "256"))
+DIRECTORY_BBOX_GRID = 0.01  # degrees
+cache.set_budget(DIRECTORY_PAGE_NAMESPACE, DIRECTORY_PAGE_CACHE_ENTRIES)
+
+@on_business_change
+def invalidate_directory(business_ids=None):
+    cache.invalidate(DIRECTORY_NAMESPACE)
+    cache.invalidate(DIRECTORY_PAGE_NAMESPACE)
+
+# --- Directory filters (shared by the paginated and streaming views) ---
+def directory_filters(
+    # Typed as the enum: an unknown value is a 422, never a failing cast in Postgres
+    business_type: BusinessType | None = Query(None),
+    published: bool | None = Query(None),
+    min_lat: float | None = Query(None, ge=-90, le=90),
+    max_lat: float | None = Query(None, ge=-90, le=90),
+    min_lng: float | None = Query(None, ge=-180, le=180),
+    max_lng: float | None = Query(None, ge=-180, le=180),
+) -> dict:
+    filters = {
+        "business_type": business_type,
+        "published": published,
+        "min_lat": min_lat,
+        "max_lat": max_lat,
+        "min_lng": min_lng,
+        "max_lng": max_lng,
+    }
+    return {k: v for k, v in filters.items() if v is not None}
+
+def snap_bbox(filters: dict) -> dict:
+    # Outward, so the snapped box still contains everything the requested one did
+    snapped = dict(filters)
+    for name, rounding in (("min_lat", math.floor), ("min_lng", math.floor), ("max_lat", math.ceil), ("max_lng", math.ceil)):
+        if name in snapped:
+            cells = rounding(round(snapped[name] / DIRECTORY_BBOX_GRID, 6))
+            snapped[name] = round(cells * DIRECTORY_BBOX_GRID, 6)
+    return snapped
+
+def apply_directory_filters(query, filters: dict):
+    Business = models.BusinessProfile
+    if "business_type" in filters:
+        query = query.filter(Business.business_type == filters["business_type"])
+    if "published" in filters:
+        query = query.filter(Business.published == filters["published"])
+    # Bounding box
+    if "min_lat" in filters:
+        query = query.filter(Business.latitude >= filters["min_lat"])
+    if "max_lat" in filters:
+        query = query.filter(Business.latitude <= filters["max_lat"])
+    if "min_lng" in filters:
+        query = query.filter(Business.longitude >= filters["min_lng"])
+    if "max_lng" in filters:
+        query = query.filter(Business.longitude <= filters["max_lng"])
+    return query
+
+# --- Keyset cursor: opaque base64 of (created_at, business_id) ---
+def encode_cursor(biz: models.BusinessProfile) -> str:
+    raw = json.dumps([biz.created_at.isoformat(), str(biz.business_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, business_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), UUID(business_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# --- Set-based loader for the directory ---
+# Builds the whole directory from a fixed number of queries, no matter how many
+# businesses exist: 1 for profiles, 1 per eager-loaded collection (selectin),
+# 1 for operational info and 1 for the thumbnail media.
+def load_directory(db: Session, filters: dict | None = None, after: tuple | None = None, limit: int | None = None) -> List[models.BusinessProfile]:
+    # 1. Businesses + services/coupons via SELECT ... WHERE business_id IN (...)
+    query = apply_directory_filters(db.query(models.BusinessProfile), filters or {})
+    if after:
+        # Keyset pagination: strictly "older" than the last row of the previous page
+        query = query.filter(tuple_(models.BusinessProfile.created_at, models.BusinessProfile.business_id) < after)
+    query = (
+        query.options(
+            selectinload(models.BusinessProfile.services),
+            selectinload(models.BusinessProfile.coupons),
+        )
+        .order_by(models.BusinessProfile.created_at.desc(), models.BusinessProfile.business_id.desc())
+    )
+    if limit:
+        query = query.limit(limit)
+    businesses = query.all()
+    business_ids = [biz.business_id for biz in businesses]
+    if not business_ids:
+        return []
+
+    # 2. Operational info grouped by business_id (one row per business)
+    op_infos = {}
+    for info in db.query(models.OperationalInfo).filter(models.OperationalInfo.business_id.in_(business_ids)):
+        op_infos.setdefault(info.business_id, info)
+
+    # 3. First media asset per business (thumbnail) using a window function
+    row_num = func.row_number().over(
+        partition_by=models.MediaAsset.business_id,
+        order_by=(models.MediaAsset.uploaded_at, models.MediaAsset.asset_id),
+    ).label("row_num")
+    ranked = (
+        db.query(models.MediaAsset.asset_id, row_num)
+        .filter(models.MediaAsset.business_id.in_(business_ids))
+        .subquery()
+    )
+    #    plus its smallest fitting WebP variant, in the same statement
+    thumbnails = {}
+    thumbnail_urls = {}
+    for asset, variant_url in (
+        db.query(models.MediaAsset, variant_url_expr(models.MediaAsset.url, DIRECTORY_IMAGE_WIDTH))
+        .join(ranked, models.MediaAsset.asset_id == ranked.c.asset_id)
+        .filter(ranked.c.row_num == 1)
+    ):
+        thumbnails[asset.business_id] = [asset]
+        if asset.media_type == "image":
+            thumbnail_urls[asset.business_id] = variant_url or asset.url
+
+    # 4. Attach to the object dynamically
+    for biz in businesses:
+        biz.operational_info = op_infos.get(biz.business_id)
+        biz.media = thumbnails.get(biz.business_id, [])
+        biz.thumbnail_url = thumbnail_urls.get(biz.business_id)
+
+    return businesses
+
+def serialize_listing(biz: models.BusinessProfile) -> dict:
+    return BusinessDirectoryView.model_validate(biz, from_attributes=True).model_dump(mode="json")
+
+def build_directory(db: Session) -> list:
+    # Serialize once so the snapshot can live in a shared (JSON) backend
+    return [serialize_listing(biz) for biz in load_directory(db)]
+
+def rebuild_directory() -> list:
+    # Own session: a stale-while-revalidate refresh runs after the request has ended
+    db = SessionLocal()
+    try:
+        return build_directory(db)
+    finally:
+        db.close()
 
 # ✅ Aggregated Endpoint with Caching
 @router.get("/directory-view", response_model=List[BusinessDirectoryView])
-def get_directory_aggregated(db: Session = Depends(get_db)):
-    global DIRECTORY_CACHE
-    now = datetime.now(timezone.utc)
-    
-    # 1. Cache Hit Check (The "Fast Path")
-    # If we have data and it hasn't expired, return it instantly (0ms DB latency)
-    if DIRECTORY_CACHE["data"] and now < DIRECTORY_CACHE["expires_at"]:
-        return DIRECTORY_CACHE["data"]
-
-    # 2. Cache Miss (The "Slow Path")
-    # If cache is empty or expired, query the database
-    businesses = db.query(models.BusinessProfile).all()
-    
-    results = []
-
-    # Server-Side Aggregation
-    for biz in businesses:
-        op_info = db.query(models.OperationalInfo).filter_by(business_id=biz.business_id).first()
-        media = db.query(models.MediaAsset).filter_by(business_id=biz.business_id).limit(1).all() # Just 1 for thumbnail
-        services = db.query(models.Service).filter_by(business_id=biz.business_id).all()
-        coupons = db.query(models.Coupon).filter_by(business_id=biz.business_id).all()
-        
-        # Attach to the object dynamically
-        biz.operational_info = op_info
-        biz.media = media
-        biz.services = services
-        biz.coupons = coupons
-        
-        results.append(biz)
-        
-    # 3. Write to Cache (Read-Through)
-    DIRECTORY_CACHE["data"] = results
-    DIRECTORY_CACHE["expires_at"] = now + timedelta(seconds=CACHE_TTL_SECONDS)
-    
-    return results
+def get_directory_aggregated():
+    # Cache hit returns instantly (0ms DB latency); a miss rebuilds once
+    # (single-flight) with a constant number of queries (Read-Through)
+    return cache.get_or_build(
+        DIRECTORY_NAMESPACE,
+        "all",
+        rebuild_directory,
+        ttl=CACHE_TTL_SECONDS,
+        stale_ttl=CACHE_STALE_SECONDS,
+    )
+
+# ✅ Paginated + filterable directory (keyset on created_at/business_id)
+@router.get("/directory-view/page", response_model=BusinessDirectoryPage)
+def get_directory_page(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None),
+    filters: dict = Depends(directory_filters),
+):
+    after = decode_cursor(cursor) if cursor else None
+    filters = snap_bbox(filters)
+
+    def build_page() -> dict | None:
+        db = SessionLocal()
+        try:
+            # Fetch one extra row to know whether another page exists
+            rows = load_directory(db, filters, after=after, limit=limit + 1)
+            items = rows[:limit]
+            if not items:
+                return None
+            return {
+                "items": [serialize_listing(biz) for biz in items],
+                "next_cursor": encode_cursor(items[-1]) if len(rows) > limit else None,
+            }
+        finally:
+            db.close()
+
+    # Keyed by the decoded cursor and snapped filters, not the raw query string
+    position = [after[0].isoformat(), str(after[1])] if after else None
+    key = json.dumps({"limit": limit, "after": position, **filters}, sort_keys=True)
+    page = cache.get_or_build(DIRECTORY_PAGE_NAMESPACE, key, build_page, ttl=CACHE_TTL_SECONDS, empty_ttl=0)
+    return page or {"items": [], "next_cursor": None}
+
+# ✅ Streaming directory (NDJSON): one listing per line, sent batch by batch
+@router.get("/directory-view/stream")
+def stream_directory(
+    batch_size: int = Query(200, ge=1, le=1000),
+    filters: dict = Depends(directory_filters),
+):
+    def generate():
+        db = SessionLocal()
+        try:
+            after = None
+            while True:
+                batch = load_directory(db, filters, after=after, limit=batch_size)
+                for biz in batch:
+                    yield json.dumps(serialize_listing(biz)) + "\n"
+                if len(batch) < batch_size:
+                    break
+                after = (batch[-1].created_at, batch[-1].business_id)
+                # Drop the finished batch from the session so memory stays flat
+                db.expunge_all()
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+# Cache hit/miss/rebuild counters for this worker
+@router.get("/directory-view/stats")
+def get_directory_cache_stats():
+    return cache.stats()
 
 # Create a new business
 @router.post("/", response_model=BusinessOut)
-def create_business(data: BusinessCreate, db: Session = Depends(get_db)):
+def create_business(data: BusinessCreate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    # Businesses are created for yourself only
+    if str(data.owner_id) != session["sub"]:
+        raise HTTPException(status_code=403, detail="Not allowed for this owner")
     # Ensure owner exists
     owner = db.query(models.User).filter_by(user_id=data.owner_id).first()
     if not owner:
@@ -70,8 +263,7 @@ def create_business(data: BusinessCreate, db: Session = Depends(get_db)):
     db.refresh(new_business)
 
     # ✅ Cache Invalidation: Clear cache so new business appears immediately
-    global DIRECTORY_CACHE
-    DIRECTORY_CACHE["data"] = None 
+    publish_business_change(new_business.business_id)
 
     return new_business
 
@@ -109,10 +301,8 @@ def get_business_by_owner(owner_id: UUID, db: Session = Depends(get_db)):
 
 # Update a business (partial update)
 @router.patch("/{business_id}", response_model=BusinessOut)
-def update_business(business_id: UUID, payload: BusinessUpdate, db: Session = Depends(get_db)):
-    business = db.query(models.BusinessProfile).filter_by(business_id=business_id).first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
+def update_business(business_id: UUID, payload: BusinessUpdate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    business = authorize_business(db, business_id, session)
 
     # Update only provided fields
     for field, value in payload.model_dump(exclude_unset=True).items():
@@ -120,12 +310,12 @@ def update_business(business_id: UUID, payload: BusinessUpdate, db: Session = De
 
     # ✅ Fixed: Use timezone-aware UTC
     business.updated = datetime.now(timezone.utc)
+    business.version = (business.version or 0) + 1
       
     db.commit()
     db.refresh(business)
 
     # ✅ Cache Invalidation: Clear cache so updates appear immediately in Directory
-    global DIRECTORY_CACHE
-    DIRECTORY_CACHE["data"] = None
+    publish_business_change(business.business_id)
 
     return business
\ No newline at end of file
@@ -0,0 +1,478 @@
+import os
+import json
+import logging
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# --- 🚀 SYSTEM DESIGN: PLUGGABLE CACHE LAYER ---
+# "memory" -> per-process LRU (single worker / tests)
+# "sqlite" -> shared file, visible to every uvicorn worker on the host
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "cache.sqlite3")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+# SQLite recency is approximate: a read refreshes accessed_at at most this often,
+# so hot keys cost one write per interval instead of one per read
+CACHE_TOUCH_SECONDS = float(os.getenv("CACHE_TOUCH_SECONDS", "30"))
+# How long a rebuild may hold its lease before other workers give up waiting
+CACHE_LEASE_SECONDS = float(os.getenv("CACHE_LEASE_SECONDS", "30"))
+CACHE_LEASE_POLL_SECONDS = 0.05
+CACHE_LOCK_STRIPES = 64
+# Never evicted by LRU pressure:
+#   gen:/ver: -> counters; one that restarts at its initial value would resurrect old entries
+#   job:      -> job state a client is still polling for
+#   job-run:  -> the one active run of an exclusive job kind (api/jobs.py)
+#   revoked:  -> ended sessions (api/tokens.py); evicting one would un-revoke it
+# Pinned entries with an expiry are dropped only once expired, by a periodic sweep.
+PINNED_PREFIXES = ("gen:", "ver:", "job:", "job-run:", "revoked:")
+PINNED_SWEEP_SECONDS = 60
+# _rebuild() result when another worker holds the lease
+_LEASE_HELD = object()
+
+
+# -------------------------
+# BACKENDS
+# -------------------------
+# Every backend stores entries as (value, expires_at) and leaves the freshness
+# decision to the Cache, so expired snapshots are still available when needed.
+class LRUBackend:
+    """In-process store with least-recently-used eviction (pinned keys are kept aside)."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._pinned = {}
+        self._budgets = {}  # prefix -> (its own LRU, max_entries)
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def set_budget(self, prefix: str, max_entries: int):
+        """Keys starting with prefix get an LRU of their own: they only evict each other."""
+        with self._lock:
+            store = self._budgets.get(prefix, (OrderedDict(), None))[0]
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                store[key] = self._data.pop(key)
+            self._budgets[prefix] = (store, max_entries)
+
+    def _partition(self, key):
+        # (store, max_entries); pinned keys have no limit
+        if key.startswith(PINNED_PREFIXES):
+            return self._pinned, None
+        for prefix, (store, max_entries) in self._budgets.items():
+            if key.startswith(prefix):
+                return store, max_entries
+        return self._data, self.max_entries
+
+    def _store(self, key):
+        return self._partition(key)[0]
+
+    def _stores(self):
+        return [self._data, self._pinned, *(store for store, _ in self._budgets.values())]
+
+    def _sweep_pinned(self):
+        # Caller holds the lock
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + PINNED_SWEEP_SECONDS
+        for key in [k for k, (_, expires_at) in self._pinned.items() if expires_at is not None and expires_at <= now]:
+            del self._pinned[key]
+
+    def get(self, key):
+        with self._lock:
+            store = self._store(key)
+            entry = store.get(key)
+            if entry is not None and store is not self._pinned:
+                store.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            store, max_entries = self._partition(key)
+            store[key] = (value, expires_at)
+            if max_entries is not None:
+                store.move_to_end(key)
+                while len(store) > max_entries:
+                    store.popitem(last=False)
+            elif expires_at is not None:
+                self._sweep_pinned()
+
+    def add(self, key, value, expires_at=None) -> bool:
+        # Set only if absent or expired (used for rebuild leases)
+        with self._lock:
+            store = self._store(key)
+            entry = store.get(key)
+            if entry is not None and (entry[1] is None or time.time() < entry[1]):
+                return False
+            store[key] = (value, expires_at)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._store(key).pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            for store in self._stores():
+                for key in [k for k in store if k.startswith(prefix)]:
+                    del store[key]
+
+    def incr(self, key) -> int:
+        with self._lock:
+            store = self._store(key)
+            value = int(store.get(key, (0, None))[0]) + 1
+            store[key] = (value, None)
+            return value
+
+    def clear(self):
+        with self._lock:
+            for store in self._stores():
+                store.clear()
+
+
+_UNPINNED_SQL = " AND ".join(f"key NOT LIKE '{prefix}%'" for prefix in PINNED_PREFIXES)
+
+
+def _like_prefix(prefix: str) -> str:
+    # LIKE pattern for keys that start with prefix (backslash is the escape character)
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class SQLiteBackend:
+    """Shared store backed by a SQLite file. Values must be JSON-serializable."""
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._budgets = {}  # prefix -> max_entries, evicted among themselves
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+
+    def set_budget(self, prefix: str, max_entries: int):
+        """Keys starting with prefix get an LRU budget of their own: they only evict each other."""
+        self._budgets[prefix] = max_entries
+
+    def _conn(self):
+        # One connection per thread; autocommit mode with explicit transactions where needed
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value, expires_at, accessed_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[2] >= CACHE_TOUCH_SECONDS:
+            self._conn().execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at=None):
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+            "accessed_at = excluded.accessed_at",
+            (key, json.dumps(value), expires_at, time.time()),
+        )
+        if key.startswith(PINNED_PREFIXES):
+            if expires_at is not None:
+                self._sweep_pinned(conn)
+            return
+        # LRU eviction over the shared table (pinned keys are kept), within the key's budget
+        budgeted = next((prefix for prefix in self._budgets if key.startswith(prefix)), None)
+        if budgeted is not None:
+            scope, params = "key LIKE ? ESCAPE '\\'", [_like_prefix(budgeted)]
+            max_entries = self._budgets[budgeted]
+        else:
+            scope = " AND ".join([_UNPINNED_SQL, *("key NOT LIKE ? ESCAPE '\\'" for _ in self._budgets)])
+            params = [_like_prefix(prefix) for prefix in self._budgets]
+            max_entries = self.max_entries
+        conn.execute(
+            "DELETE FROM cache_entries WHERE key IN ("
+            f"SELECT key FROM cache_entries WHERE {scope} "
+            "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (*params, max_entries),
+        )
+
+    def _sweep_pinned(self, conn):
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + PINNED_SWEEP_SECONDS
+        conn.execute(
+            f"DELETE FROM cache_entries WHERE NOT ({_UNPINNED_SQL}) AND expires_at IS NOT NULL AND expires_at <= ?",
+            (now,),
+        )
+
+    def add(self, key, value, expires_at=None) -> bool:
+        # Set only if absent or expired (used for rebuild leases)
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+            "accessed_at = excluded.accessed_at "
+            "WHERE cache_entries.expires_at IS NOT NULL AND cache_entries.expires_at <= ?",
+            (key, json.dumps(value), expires_at, now, now),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix: str):
+        self._conn().execute("DELETE FROM cache_entries WHERE key LIKE ? ESCAPE '\\'", (_like_prefix(prefix),))
+
+    def incr(self, key) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, '1', NULL, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+                (key, time.time()),
+            )
+            value = conn.execute("SELECT value FROM cache_entries WHERE key = ?", (key,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return int(value)
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache_entries")
+
+
+def make_backend(name: str = CACHE_BACKEND, path: str = CACHE_SQLITE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+    if name == "memory":
+        return LRUBackend(max_entries)
+    if name == "sqlite":
+        return SQLiteBackend(path, max_entries)
+    raise ValueError(f"Unknown CACHE_BACKEND '{name}'. Use 'memory' or 'sqlite'.")
+
+
+# -------------------------
+# NAMESPACED CACHE
+# -------------------------
+class Cache:
+    """
+    Namespaced read-through cache on top of a backend.
+
+    Rebuilds are single-flight: concurrent misses in one worker wait on a
+    per-key lock, and workers sharing a backend coordinate through a lease
+    entry, so only one caller recomputes a key at a time. With stale_ttl set,
+    an expired snapshot is served instantly while a background thread
+    refreshes it (stale-while-revalidate).
+
+    Each namespace has a generation counter stored in the backend. Invalidating
+    a namespace bumps the counter, so every worker sharing the backend misses on
+    its next read, and a rebuild that started before the invalidation writes
+    under the old generation where nobody will read it.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or make_backend()
+        self._stats = defaultdict(lambda: {
+            "hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "rebuilds": 0, "invalidations": 0
+        })
+        self._stats_lock = threading.Lock()
+        # Striped locks keep memory bounded however many keys get built
+        self._key_locks = [threading.RLock() for _ in range(CACHE_LOCK_STRIPES)]
+        self._refreshing = set()
+        self._guard = threading.Lock()
+        self._refresh_pool = None
+
+    def _count(self, namespace: str, counter: str):
+        with self._stats_lock:
+            self._stats[namespace][counter] += 1
+
+    def generation(self, namespace: str) -> int:
+        entry = self.backend.get(f"gen:{namespace}")
+        return int(entry[0]) if entry else 0
+
+    def _key(self, namespace: str, key: str, generation: int) -> str:
+        return f"{namespace}:{generation}:{key}"
+
+    def get(self, namespace: str, key: str = ""):
+        entry = self.backend.get(self._key(namespace, key, self.generation(namespace)))
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or time.time() < expires_at:
+                self._count(namespace, "hits")
+                return value
+        self._count(namespace, "misses")
+        return None
+
+    def set(self, namespace: str, key: str, value, ttl: float | None = None, generation: int | None = None):
+        if generation is None:
+            generation = self.generation(namespace)
+        expires_at = time.time() + ttl if ttl else None
+        self.backend.set(self._key(namespace, key, generation), value, expires_at)
+
+    def set_budget(self, namespace: str, max_entries: int):
+        # Per-entity namespaces (one entry per id or URL) get their own LRU budget,
+        # so a crawl over many ids can't push the hot shared entries out
+        self.backend.set_budget(f"{namespace}:", max_entries)
+
+    def _key_lock(self, name: str):
+        return self._key_locks[hash(name) % len(self._key_locks)]
+
+    @staticmethod
+    def _is_fresh(entry) -> bool:
+        return entry is not None and (entry[1] is None or time.time() < entry[1])
+
+    def delete(self, namespace: str, key: str):
+        self.backend.delete(self._key(namespace, key, self.generation(namespace)))
+
+    def get_or_build(self, namespace: str, key: str, builder, ttl: float | None = None, stale_ttl: float = 0, empty_ttl: float | None = None):
+        # empty_ttl: how long a falsy result (unknown id, page past the end) is kept;
+        # None = like any other value, 0 = not cached at all
+        generation = self.generation(namespace)
+        full_key = self._key(namespace, key, generation)
+        entry = self.backend.get(full_key)
+
+        # 1. Fresh hit
+        if self._is_fresh(entry):
+            self._count(namespace, "hits")
+            return entry[0]
+
+        # 2. Expired but inside the stale window: serve it, refresh off the request path
+        if entry is not None and stale_ttl and time.time() < entry[1] + stale_ttl:
+            self._count(namespace, "stale_hits")
+            self._refresh_in_background(namespace, key, builder, ttl, generation, empty_ttl)
+            return entry[0]
+
+        # 3. Miss: only one thread per key rebuilds, the rest wait for its result
+        self._count(namespace, "misses")
+        while True:
+            with self._key_lock(f"{namespace}:{key}"):
+                entry = self.backend.get(full_key)
+                if self._is_fresh(entry):
+                    self._count(namespace, "coalesced")
+                    return entry[0]
+                value = self._rebuild(namespace, key, builder, ttl, generation, empty_ttl)
+                if value is not _LEASE_HELD:
+                    return value
+            # Another worker is building it: poll without the stripe lock, so keys that
+            # share the stripe aren't stuck behind a lease that may last CACHE_LEASE_SECONDS.
+            # The lease expires on its own if that worker dies.
+            time.sleep(CACHE_LEASE_POLL_SECONDS)
+
+    def _rebuild(self, namespace, key, builder, ttl, generation, empty_ttl):
+        # Caller holds the key's stripe lock; _LEASE_HELD if another worker is building it
+        full_key = self._key(namespace, key, generation)
+        lease_key = f"lease:{full_key}"
+        if not self.backend.add(lease_key, os.getpid(), time.time() + CACHE_LEASE_SECONDS):
+            return _LEASE_HELD
+
+        try:
+            value = builder()
+            self._count(namespace, "rebuilds")
+            if value or empty_ttl is None:
+                self.set(namespace, key, value, ttl=ttl, generation=generation)
+            elif empty_ttl:
+                self.set(namespace, key, value, ttl=empty_ttl, generation=generation)
+            return value
+        finally:
+            self.backend.delete(lease_key)
+
+    def _refresh_in_background(self, namespace, key, builder, ttl, generation, empty_ttl):
+        name = f"{namespace}:{key}"
+        with self._guard:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def refresh():
+            try:
+                with self._key_lock(name):
+                    self._rebuild(namespace, key, builder, ttl, generation, empty_ttl)
+            except Exception:
+                logger.exception("Cache refresh failed (%s)", name)
+            finally:
+                with self._guard:
+                    self._refreshing.discard(name)
+
+        with self._guard:
+            # Created on first use, so shutdown() can release it and a later refresh start again
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+            self._refresh_pool.submit(refresh)
+
+    def shutdown(self):
+        # Refreshes in progress finish; queued ones are dropped (the stale entry stays until the next miss)
+        with self._guard:
+            pool, self._refresh_pool = self._refresh_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def version(self, namespace: str, key: str) -> int:
+        entry = self.backend.get(f"ver:{namespace}:{key}")
+        return int(entry[0]) if entry else 0
+
+    def bump(self, namespace: str, key: str) -> int:
+        # Per-key invalidation: callers build "<key>@<version>" entries, so the
+        # new version misses everywhere; entries for older versions are dropped
+        version = self.backend.incr(f"ver:{namespace}:{key}")
+        self.backend.delete_prefix(self._key(namespace, f"{key}@", self.generation(namespace)))
+        self._count(namespace, "invalidations")
+        return version
+
+    def invalidate(self, namespace: str):
+        self.backend.incr(f"gen:{namespace}")
+        self.backend.delete_prefix(f"{namespace}:")
+        self._count(namespace, "invalidations")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            namespaces = {ns: dict(counters) for ns, counters in self._stats.items()}
+        return {
+            "backend": type(self.backend).__name__,
+            "pid": os.getpid(),
+            "namespaces": namespaces,
+        }
+
+
+cache = Cache()
+
+
+# -------------------------
+# INVALIDATION EVENTS
+# -------------------------
+# Routers that write business-visible data publish a change event; modules that
+# cache derived views subscribe and invalidate their namespaces. Handlers get the
+# changed business ids (None = everything), so a bulk write publishes once per
+# batch and every namespace is invalidated once, not once per row.
+_SUBSCRIBERS = []
+
+
+def on_business_change(handler):
+    _SUBSCRIBERS.append(handler)
+    return handler
+
+
+def publish_business_changes(business_ids=None):
+    if business_ids is not None:
+        business_ids = list(business_ids)
+        if not business_ids:
+            return
+    for handler in _SUBSCRIBERS:
+        handler(business_ids)
+
+
+def publish_business_change(business_id=None):
+    publish_business_changes(None if business_id is None else [business_id])
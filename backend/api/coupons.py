@@ -6,20 +6,21 @@ from db import models
 from schemas.coupons import CouponCreate, CouponOut, CouponUpdate
 from uuid import UUID
 from typing import List
+from api.cache import publish_business_change
+from api.tokens import authorize_business, get_current_session
 
 router = APIRouter(prefix="/coupons", tags=["Coupons"])
 
 # Create a new coupon
 @router.post("/", response_model=CouponOut)
-def create_coupon(data: CouponCreate, db: Session = Depends(get_db)):
-    business = db.query(models.BusinessProfile).filter_by(business_id=data.business_id).first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
+def create_coupon(data: CouponCreate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    authorize_business(db, data.business_id, session)
 
     new_coupon = models.Coupon(**data.model_dump())
     db.add(new_coupon)
     db.commit()
     db.refresh(new_coupon)
+    publish_business_change(new_coupon.business_id)
     return new_coupon
 
 # Get a coupon by its UUID
@@ -49,10 +50,11 @@ def list_coupons(
 
 # ✅ UPDATED: Use CouponUpdate schema
 @router.patch("/{coupon_id}", response_model=CouponOut)
-def update_coupon(coupon_id: UUID, data: CouponUpdate, db: Session = Depends(get_db)):
+def update_coupon(coupon_id: UUID, data: CouponUpdate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
     coupon = db.query(models.Coupon).filter_by(coupon_id=coupon_id).first()
     if not coupon:
         raise HTTPException(status_code=404, detail="Coupon not found")
+    authorize_business(db, coupon.business_id, session)
 
     # exclude_unset=True ensures we only update fields sent by the frontend
     update_data = data.model_dump(exclude_unset=True)
@@ -62,15 +64,19 @@ def update_coupon(coupon_id: UUID, data: CouponUpdate, db: Session = Depends(get
 
     db.commit()
     db.refresh(coupon)
+    publish_business_change(coupon.business_id)
     return coupon
 
 # Delete coupon
 @router.delete("/{coupon_id}", response_model=dict)
-def delete_coupon(coupon_id: UUID, db: Session = Depends(get_db)):
+def delete_coupon(coupon_id: UUID, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
     coupon = db.query(models.Coupon).filter_by(coupon_id=coupon_id).first()
     if not coupon:
         raise HTTPException(status_code=404, detail="Coupon not found")
+    authorize_business(db, coupon.business_id, session)
 
+    business_id = coupon.business_id
     db.delete(coupon)
     db.commit()
+    publish_business_change(business_id)
     return {"detail": "Coupon deleted"}
\ No newline at end of file
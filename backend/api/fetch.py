@@ -0,0 +1,171 @@
+import os
+import time
+import codecs
+import asyncio
+import contextlib
+from urllib.parse import urlsplit
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from api.html_extract import HtmlExtractor
+from api.cache import cache
+
+# --- 🚀 SYSTEM DESIGN: ASYNC EXTERNAL FETCH ---
+# One pooled AsyncClient per worker (keep-alive, bounded connections). Bodies
+# are streamed: we stop reading as soon as <head> plus EXTERNAL_TEXT_CHARS of
+# visible text have been parsed (see api/html_extract.py), and abort once EXTERNAL_MAX_BYTES is passed.
+EXTERNAL_TIMEOUT_SECONDS = float(os.getenv("EXTERNAL_TIMEOUT_SECONDS", "10"))
+EXTERNAL_MAX_BYTES = int(os.getenv("EXTERNAL_MAX_BYTES", str(2 * 1024 * 1024)))
+EXTERNAL_MAX_CONNECTIONS = int(os.getenv("EXTERNAL_MAX_CONNECTIONS", "20"))
+USER_AGENT = "AiVault-Auditor/1.0"
+
+# --- 🚀 SYSTEM DESIGN: FETCH CACHE + POLITENESS ---
+# Extracted pages are kept by URL in the shared cache. Within
+# EXTERNAL_FETCH_FRESH_SECONDS they are reused as-is; after that (up to
+# EXTERNAL_FETCH_KEEP_SECONDS) we revalidate with If-None-Match /
+# If-Modified-Since and reuse the extract on 304. Requests to the same host
+# are serialized and spaced by EXTERNAL_HOST_DELAY_SECONDS.
+EXTERNAL_FETCH_NAMESPACE = "external_fetch"
+EXTERNAL_FETCH_FRESH_SECONDS = int(os.getenv("EXTERNAL_FETCH_FRESH_SECONDS", "600"))
+EXTERNAL_FETCH_KEEP_SECONDS = int(os.getenv("EXTERNAL_FETCH_KEEP_SECONDS", str(24 * 60 * 60)))
+EXTERNAL_HOST_DELAY_SECONDS = float(os.getenv("EXTERNAL_HOST_DELAY_SECONDS", "1.0"))
+# One entry per audited URL: a budget of its own, so batch audits can't evict the directory
+EXTERNAL_FETCH_CACHE_ENTRIES = int(os.getenv("EXTERNAL_FETCH_CACHE_ENTRIES", "256"))
+cache.set_budget(EXTERNAL_FETCH_NAMESPACE, EXTERNAL_FETCH_CACHE_ENTRIES)
+
+_client: httpx.AsyncClient | None = None
+
+
+class PageTooLarge(Exception):
+    pass
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            timeout=httpx.Timeout(EXTERNAL_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=EXTERNAL_MAX_CONNECTIONS, max_keepalive_connections=EXTERNAL_MAX_CONNECTIONS),
+            follow_redirects=True,
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_page(url: str, extractor: HtmlExtractor | None = None, max_bytes: int = EXTERNAL_MAX_BYTES, client: httpx.AsyncClient | None = None, headers: dict | None = None) -> dict:
+    extractor = extractor or HtmlExtractor()
+    client = client or get_http_client()
+    bytes_read = 0
+    stopped_early = False
+
+    async with client.stream("GET", url, headers=headers) as response:
+        validators = {"etag": response.headers.get("etag"), "last_modified": response.headers.get("last-modified")}
+        if response.status_code == 304:
+            return {"url": str(response.url), "status_code": 304, "bytes_read": 0, "stopped_early": False, "page": None, **validators}
+        response.raise_for_status()
+
+        # 1. Refuse oversized bodies before downloading anything
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise PageTooLarge(f"Page is {int(declared)} bytes (limit {max_bytes})")
+
+        # 2. Parse while streaming; closing the stream early drops the rest of the body
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        async for chunk in response.aiter_bytes():
+            bytes_read += len(chunk)
+            if bytes_read > max_bytes:
+                raise PageTooLarge(f"Page exceeded {max_bytes} bytes")
+            extractor.feed(decoder.decode(chunk))
+            if extractor.done:
+                stopped_early = True
+                break
+        else:
+            extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+
+    return {
+        "url": str(response.url),
+        "status_code": response.status_code,
+        "bytes_read": bytes_read,
+        "stopped_early": stopped_early,
+        "page": extractor.page,
+        **validators,
+    }
+
+
+class HostThrottle:
+    """Per-host politeness: one request at a time per host, at least `delay` seconds apart."""
+
+    def __init__(self, delay: float | None = None):
+        self.delay = EXTERNAL_HOST_DELAY_SECONDS if delay is None else delay
+        self._locks = {}
+        self._last = {}
+
+    def host(self, url: str) -> str:
+        return (urlsplit(url).hostname or "").lower()
+
+    async def wait(self, host: str):
+        wait_for = self._last.get(host, 0) + self.delay - time.monotonic()
+        if wait_for > 0:
+            await asyncio.sleep(wait_for)
+
+    def lock(self, host: str) -> asyncio.Lock:
+        return self._locks.setdefault(host, asyncio.Lock())
+
+    def done(self, host: str):
+        self._last[host] = time.monotonic()
+
+
+async def fetch_page_cached(url: str, throttle: HostThrottle | None = None, slots: asyncio.Semaphore | None = None) -> dict:
+    # Cache reads/writes may hit SQLite: off the event loop
+    cached = await run_in_threadpool(cache.get, EXTERNAL_FETCH_NAMESPACE, url)
+    # 1. Fresh enough: no network at all
+    if cached and time.time() - cached["fetched_at"] < EXTERNAL_FETCH_FRESH_SECONDS:
+        return {**cached, "cache": "hit"}
+
+    # 2. Revalidate (or fetch) politely
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    host = throttle.host(url) if throttle else None
+    if throttle:
+        await throttle.lock(host).acquire()
+    try:
+        if throttle:
+            await throttle.wait(host)
+        # The caller's concurrency slot (if any) is taken only now, after the host's turn came up
+        async with slots or contextlib.nullcontext():
+            fetched = await fetch_page(url, headers=headers or None)
+            if fetched["status_code"] == 304 and not cached:
+                # 304 with nothing to reuse (stray validators upstream): ask again for the full body
+                fetched = await fetch_page(url, headers={"Cache-Control": "no-cache"})
+                if fetched["status_code"] == 304:
+                    raise httpx.HTTPError(f"{url} answered 304 to an unconditional request")
+    finally:
+        if throttle:
+            throttle.done(host)
+            throttle.lock(host).release()
+
+    if fetched["status_code"] == 304 and cached:
+        entry = {**cached, "fetched_at": time.time()}
+        status = "revalidated"
+    else:
+        entry = {
+            "url": url,
+            "page": fetched["page"].as_dict(),
+            "etag": fetched["etag"],
+            "last_modified": fetched["last_modified"],
+            "fetched_at": time.time(),
+        }
+        status = "miss"
+    await run_in_threadpool(cache.set, EXTERNAL_FETCH_NAMESPACE, url, entry, ttl=EXTERNAL_FETCH_KEEP_SECONDS)
+    return {**entry, "cache": status}
@@ -0,0 +1,179 @@
+import os
+from html.parser import HTMLParser
+
+# --- 🚀 SYSTEM DESIGN: SINGLE-PASS HTML EXTRACTOR ---
+# Everything the external auditor needs (title, meta description, h1/img
+# counts, JSON-LD blocks, first N characters of text) is collected from one
+# stream of start/end/data events. No tree is built and nothing is walked
+# twice. The event source is pluggable:
+#   "lxml"        -> libxml2 push parser (fast, C)
+#   "html.parser" -> stdlib, pure Python (always available)
+HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "lxml")
+EXTERNAL_TEXT_CHARS = int(os.getenv("EXTERNAL_TEXT_CHARS", "3000"))
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml is in requirements.txt
+    etree = None
+
+
+class PageExtract:
+    """Collects audit fields from parser events; `done` once <head> and enough text are read."""
+
+    SKIP_TEXT_TAGS = {"script", "style", "noscript", "template"}
+
+    def __init__(self, text_chars: int = EXTERNAL_TEXT_CHARS):
+        self.text_chars = text_chars
+        self.title = None
+        self.description = None
+        self.h1_count = 0
+        self.img_count = 0
+        self.json_ld = []
+        self.head_done = False
+        self._text = []
+        self._text_len = 0
+        self._pending = []
+        self._in_title = False
+        self._json_ld_buffer = None
+        self._skip_depth = 0
+
+    @property
+    def text(self) -> str:
+        self._flush_text()
+        return " ".join(self._text)[:self.text_chars]
+
+    @property
+    def done(self) -> bool:
+        return self.head_done and self._text_len >= self.text_chars
+
+    def as_dict(self) -> dict:
+        return {
+            "title": self.title,
+            "description": self.description,
+            "h1_count": self.h1_count,
+            "img_count": self.img_count,
+            "json_ld": list(self.json_ld),
+            "text": self.text,
+        }
+
+    def _flush_text(self):
+        # One text node = all data between two tags (parsers may split it across events)
+        if self._pending:
+            chunk = "".join(self._pending).strip()
+            self._pending = []
+            if chunk:
+                self._text.append(chunk)
+                self._text_len += len(chunk) + 1
+
+    def start(self, tag, attrs):
+        self._flush_text()
+        if tag == "title" and self.title is None:
+            self._in_title = True
+            self.title = ""
+        elif tag == "meta" and (attrs.get("name") or "").lower() == "description" and self.description is None:
+            self.description = attrs.get("content") or ""
+        elif tag == "h1":
+            self.h1_count += 1
+        elif tag == "img":
+            self.img_count += 1
+        elif tag == "body":
+            self.head_done = True
+
+        if tag == "script" and (attrs.get("type") or "").strip().lower() == "application/ld+json":
+            self._json_ld_buffer = []
+        if tag in self.SKIP_TEXT_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self._flush_text()
+        if tag == "title":
+            self._in_title = False
+        elif tag == "head":
+            self.head_done = True
+        elif tag == "script" and self._json_ld_buffer is not None:
+            self.json_ld.append("".join(self._json_ld_buffer).strip())
+            self._json_ld_buffer = None
+        if tag in self.SKIP_TEXT_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, data):
+        if self._in_title:
+            # Also counts as page text, as get_text() did
+            self.title += data
+        if self._json_ld_buffer is not None:
+            self._json_ld_buffer.append(data)
+            return
+        if self._skip_depth or self._text_len >= self.text_chars:
+            return
+        self._pending.append(data)
+
+
+class _StdlibEvents(HTMLParser):
+    def __init__(self, page: PageExtract):
+        super().__init__(convert_charrefs=True)
+        self.page = page
+
+    def handle_starttag(self, tag, attrs):
+        self.page.start(tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        self.page.end(tag)
+
+    def handle_data(self, data):
+        self.page.data(data)
+
+
+class _LxmlTarget:
+    # lxml parser target: receives the same events straight from libxml2
+    def __init__(self, page: PageExtract):
+        self.page = page
+
+    def start(self, tag, attrib):
+        self.page.start(tag, attrib)
+
+    def end(self, tag):
+        self.page.end(tag)
+
+    def data(self, data):
+        self.page.data(data)
+
+    def close(self):
+        return self.page
+
+
+class HtmlExtractor:
+    """Incremental extractor: feed() text chunks as they arrive, read `.page` at any time."""
+
+    def __init__(self, backend: str = HTML_PARSER_BACKEND, text_chars: int = EXTERNAL_TEXT_CHARS):
+        if backend == "lxml" and etree is None:
+            backend = "html.parser"
+        self.backend = backend
+        self.page = PageExtract(text_chars)
+        if backend == "lxml":
+            self._parser = etree.HTMLParser(target=_LxmlTarget(self.page), recover=True, no_network=True)
+        elif backend == "html.parser":
+            self._parser = _StdlibEvents(self.page)
+        else:
+            raise ValueError(f"Unknown HTML_PARSER_BACKEND '{backend}'. Use 'lxml' or 'html.parser'.")
+
+    @property
+    def done(self) -> bool:
+        return self.page.done
+
+    def feed(self, text: str):
+        if text:
+            self._parser.feed(text)
+
+    def close(self) -> PageExtract:
+        try:
+            self._parser.close()
+        except Exception:
+            # lxml raises on documents it could not parse at all (e.g. empty); keep what we have
+            pass
+        return self.page
+
+
+def extract_html(html: str, backend: str = HTML_PARSER_BACKEND, text_chars: int = EXTERNAL_TEXT_CHARS) -> PageExtract:
+    extractor = HtmlExtractor(backend, text_chars)
+    extractor.feed(html)
+    return extractor.close()
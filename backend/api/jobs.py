@@ -0,0 +1,130 @@
+import os
+import time
+import asyncio
+import threading
+from uuid import uuid4
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from schemas.jobs import JobOut
+from api.cache import cache
+from api.llm import LLM_MAX_CONCURRENCY
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# --- 🚀 SYSTEM DESIGN: BACKGROUND JOB QUEUE ---
+# Slow LLM calls run on a bounded local worker pool instead of the request
+# threadpool. Job state lives in the shared cache backend, so a client can
+# poll any worker for a job that another worker accepted. "job:" keys are pinned
+# there (api/cache.py): never evicted, removed only after JOB_TTL_SECONDS.
+# Exclusive kinds (catalog-wide batch runs) have at most one run queued or running
+# across all workers: the "job-run:{kind}" key is taken with an atomic add().
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+JOB_POLL_INTERVAL_SECONDS = 0.25
+
+_pool = None
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def get_pool() -> ThreadPoolExecutor:
+    # Created on first use, so the app can shut it down and start it again (tests, reloads)
+    global _pool
+    with _pending_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm-job")
+        return _pool
+
+
+def shutdown_pool():
+    # Running jobs finish; queued ones are dropped and their state expires with JOB_TTL_SECONDS
+    global _pool, _pending
+    with _pending_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+    with _pending_lock:
+        _pending = 0
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _save(job: dict):
+    cache.backend.set(f"job:{job['job_id']}", job, time.time() + JOB_TTL_SECONDS)
+
+
+def get_job(job_id: str) -> dict | None:
+    entry = cache.backend.get(f"job:{job_id}")
+    if entry is None or entry[1] <= time.time():
+        return None
+    return entry[0]
+
+
+def enqueue(kind: str, fn, *args, exclusive: bool = False) -> dict:
+    global _pending
+    job_id = str(uuid4())
+    run_key = f"job-run:{kind}"
+    if exclusive and not cache.backend.add(run_key, job_id, time.time() + JOB_TTL_SECONDS):
+        raise HTTPException(status_code=409, detail=f"A {kind} job is already queued or running")
+
+    with _pending_lock:
+        if _pending >= JOB_MAX_PENDING:
+            if exclusive:
+                cache.backend.delete(run_key)
+            raise HTTPException(status_code=429, detail="Too many jobs in progress, try again shortly")
+        _pending += 1
+
+    job = {
+        "job_id": job_id,
+        "kind": kind,
+        "status": "queued",
+        "result": None,
+        "error": None,
+        "created_at": _now(),
+        "finished_at": None,
+    }
+    _save(job)
+    future = get_pool().submit(_run, job, fn, args, run_key if exclusive else None)
+    if exclusive:
+        # Dropped from the queue at shutdown: _run never starts, so free the kind here
+        future.add_done_callback(lambda f: f.cancelled() and cache.backend.delete(run_key))
+    return job
+
+
+def _run(job: dict, fn, args, run_key: str | None = None):
+    global _pending
+    _save({**job, "status": "running"})
+    try:
+        job = {**job, "status": "succeeded", "result": fn(*args)}
+    except Exception as e:
+        print(f"❌ JOB FAILED ({job['kind']} {job['job_id']}): {str(e)}")
+        job = {**job, "status": "failed", "error": str(e)}
+    finally:
+        with _pending_lock:
+            _pending -= 1
+        # Before the final state is saved: whoever sees it finished may start the next run
+        if run_key:
+            cache.backend.delete(run_key)
+    job["finished_at"] = _now()
+    _save(job)
+
+
+# -------------------------
+# POLL / LONG-POLL
+# -------------------------
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job_status(job_id: str, wait: float = Query(0, ge=0, le=30)):
+    # wait > 0 holds the request (without a thread) until the job finishes or time runs out
+    # The backend read may hit SQLite, so it runs on the threadpool, not the event loop
+    deadline = time.monotonic() + wait
+    job = await run_in_threadpool(get_job, job_id)
+    while job and job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+        job = await run_in_threadpool(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,52 +1,58 @@
+import os
 import json
+import time
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
 from datetime import datetime
 from typing import List
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from db import models
 from db.database import get_db
 from schemas.jsonld import JsonLDFeedOut
+from api.cache import publish_business_change, publish_business_changes
+from api.tokens import authorize_business, get_current_session
 
 router = APIRouter(prefix="/jsonld", tags=["JSON-LD"])
 
-@router.post("/generate", response_model=JsonLDFeedOut)
-def generate_jsonld(business_id: UUID = Query(...), db: Session = Depends(get_db)):
-    # 1. Fetch Main Business Profile
-    business = db.query(models.BusinessProfile).filter_by(business_id=business_id).first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
-
-    # 2. Fetch Supporting Data
-    services = db.query(models.Service).filter_by(business_id=business_id).all()
-    coupons = db.query(models.Coupon).filter_by(business_id=business_id, is_active=True).all()
-    media = db.query(models.MediaAsset).filter_by(business_id=business_id).all()
-    info = db.query(models.OperationalInfo).filter_by(business_id=business_id).first()
-    
-    # 3. ✅ FETCH AI METADATA (The Hybrid Integration)
-    ai_meta = db.query(models.AiMetadata).filter_by(business_id=business_id).first()
-
-    # 4. Map Business Type to Schema.org Types
-    schema_type_map = {
-        "restaurant": "Restaurant",
-        "salon": "HairSalon",
-        "clinic": "MedicalClinic",
-        "bakery": "Bakery",
-        "gym": "ExerciseGym",
-        "cafe": "Cafe"
-    }
+# --- Map Business Type to Schema.org Types ---
+SCHEMA_TYPE_MAP = {
+    "restaurant": "Restaurant",
+    "salon": "HairSalon",
+    "clinic": "MedicalClinic",
+    "bakery": "Bakery",
+    "gym": "ExerciseGym",
+    "cafe": "Cafe"
+}
+
+# How many feeds to keep per business; older (superseded) ones are pruned
+JSONLD_FEED_RETENTION = int(os.getenv("JSONLD_FEED_RETENTION", "5"))
+# Part of every source hash: bump it when build_jsonld's output changes shape,
+# so stored hashes stop matching and the next run rebuilds every feed
+JSONLD_BUILDER_VERSION = 1
+
+def schema_type_for(business_type: str | None) -> str:
     # Default to 'LocalBusiness' if type is unknown
-    schema_type = schema_type_map.get((business.business_type or "").lower(), "LocalBusiness")
+    return SCHEMA_TYPE_MAP.get((business_type or "").lower(), "LocalBusiness")
 
-    # 5. Construct the Hybrid Description
+def build_jsonld(business, services, coupons, media, info, ai_meta) -> dict:
+    business_id = business.business_id
+    schema_type = schema_type_for(business.business_type)
+
+    # Construct the Hybrid Description
     # We combine the official description with the AI marketing hook
     final_description = business.description or ""
     if ai_meta and ai_meta.extracted_insights:
         final_description += f" - {ai_meta.extracted_insights}"
 
-    # 6. Build the JSON-LD Dictionary
+    # Build the JSON-LD Dictionary
     jsonld = {
         "@context": "https://schema.org",
         "@type": schema_type,
@@ -113,22 +119,275 @@ def generate_jsonld(business_id: UUID = Query(...), db: Session = Depends(get_db
         ]
 
     # Clean up None values to keep JSON tidy
-    jsonld = {k: v for k, v in jsonld.items() if v is not None}
+    return {k: v for k, v in jsonld.items() if v is not None}
+
+def source_hash(business, services, coupons, media, info, ai_meta) -> str:
+    # Compact form of exactly what build_jsonld reads (keep the two in sync).
+    # Both loaders return the rows in the same order, so equal data -> equal hash.
+    image_url = next((m.url for m in media if m.media_type == "image"), None)
+    source = [
+        JSONLD_BUILDER_VERSION,
+        [business.business_id, business.business_type, business.name, business.description,
+         business.phone, business.address, business.latitude, business.longitude],
+        [[s.name, s.description, s.price] for s in services],
+        [[c.code, c.description, c.valid_until] for c in coupons],
+        image_url,
+        [info.opening_hours, info.closing_hours] if info else None,
+        [ai_meta.extracted_insights, ai_meta.keywords] if ai_meta else None,
+    ]
+    return hashlib.sha256(json.dumps(source, default=str, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def record_sources(db: Session, rows: list):
+    # rows: {"business_id", "feed_id", "source_hash"}; one upsert for the lot
+    if not rows:
+        return
+    now = datetime.utcnow()
+    stmt = pg_insert(models.JsonLDSource).values([{**row, "updated_at": now} for row in rows])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.JsonLDSource.business_id],
+        set_={"feed_id": stmt.excluded.feed_id, "source_hash": stmt.excluded.source_hash, "updated_at": stmt.excluded.updated_at},
+    ))
+
+def content_hash(jsonld_data: str) -> str:
+    # Canonical form (sorted keys, no whitespace) so key order never causes a miss
+    canonical = json.dumps(json.loads(jsonld_data), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def prune_feeds(db: Session, business_ids: list, keep: int):
+    # Keep the newest `keep` feeds of each business, in one DELETE
+    ranked = (
+        select(
+            models.JsonLDFeed.feed_id,
+            func.row_number().over(
+                partition_by=models.JsonLDFeed.business_id,
+                order_by=models.JsonLDFeed.generated_at.desc(),
+            ).label("rank"),
+        )
+        .where(models.JsonLDFeed.business_id.in_(business_ids))
+        .subquery()
+    )
+    db.query(models.JsonLDFeed).filter(
+        models.JsonLDFeed.feed_id.in_(select(ranked.c.feed_id).where(ranked.c.rank > keep))
+    ).delete(synchronize_session=False)
+
+@router.post("/generate", response_model=JsonLDFeedOut)
+def generate_jsonld(business_id: UUID = Query(...), db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    # 1. Fetch Main Business Profile (the caller must own it)
+    business = authorize_business(db, business_id, session)
+
+    # 2. Fetch Supporting Data (same filters and order as load_jsonld_inputs)
+    services = db.query(models.Service).filter_by(business_id=business_id).order_by(models.Service.service_id).all()
+    coupons = (
+        db.query(models.Coupon).filter_by(business_id=business_id, is_active=True)
+        .order_by(models.Coupon.coupon_id).all()
+    )
+    media = (
+        db.query(models.MediaAsset).filter_by(business_id=business_id, media_type="image")
+        .order_by(models.MediaAsset.uploaded_at, models.MediaAsset.asset_id).all()
+    )
+    info = db.query(models.OperationalInfo).filter_by(business_id=business_id).first()
+    
+    # 3. ✅ FETCH AI METADATA (The Hybrid Integration) - the newest one
+    ai_meta = (
+        db.query(models.AiMetadata).filter_by(business_id=business_id)
+        .order_by(models.AiMetadata.generated_at.desc()).first()
+    )
+
+    # 4. ✅ Dedup on the inputs: same source rows as the latest feed -> return it, nothing built
+    digest = source_hash(business, services, coupons, media, info, ai_meta)
+    stored = db.query(models.JsonLDSource).filter_by(business_id=business_id).first()
+    if stored and stored.source_hash == digest:
+        return db.get(models.JsonLDFeed, stored.feed_id)
+
+    # 5. Build the document (schema type mapping + hybrid description)
+    jsonld = build_jsonld(business, services, coupons, media, info, ai_meta)
+    jsonld_data = json.dumps(jsonld)
 
-    # 7. Save to Database
+    # 6. Same document as the latest feed (e.g. no source hash stored yet) -> keep it, remember the hash
+    latest = (
+        db.query(models.JsonLDFeed)
+        .filter_by(business_id=business_id)
+        .order_by(models.JsonLDFeed.generated_at.desc())
+        .first()
+    )
+    if latest and content_hash(latest.jsonld_data) == content_hash(jsonld_data):
+        record_sources(db, [{"business_id": business_id, "feed_id": latest.feed_id, "source_hash": digest}])
+        db.commit()
+        return latest
+
+    # 7. Save to Database and prune superseded feeds (same transaction)
     feed = models.JsonLDFeed(
         business_id=business_id,
-        schema_type=schema_type,
-        jsonld_data=json.dumps(jsonld),
+        schema_type=jsonld["@type"],
+        jsonld_data=jsonld_data,
         is_valid=True,
         validation_errors=None,
         generated_at=datetime.utcnow(),
     )
     db.add(feed)
+    db.flush()
+    record_sources(db, [{"business_id": business_id, "feed_id": feed.feed_id, "source_hash": digest}])
+    prune_feeds(db, [business_id], JSONLD_FEED_RETENTION)
     db.commit()
     db.refresh(feed)
+    publish_business_change(business_id)
     return feed
 
+# -------------------------
+# BULK REGENERATION (python cli.py regenerate-jsonld)
+# -------------------------
+# Plain, picklable copies of the ORM rows so documents can be built in worker processes
+def _snapshot(row) -> SimpleNamespace:
+    return SimpleNamespace(**{c.key: getattr(row, c.key) for c in row.__table__.columns})
+
+def _group_by_business(rows) -> dict:
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row.business_id].append(_snapshot(row))
+    return grouped
+
+def load_jsonld_inputs(db: Session, business_ids: list) -> list:
+    # One query per table for the whole chunk, grouped by business_id in Python
+    businesses = db.query(models.BusinessProfile).filter(models.BusinessProfile.business_id.in_(business_ids)).all()
+    services = _group_by_business(
+        db.query(models.Service).filter(models.Service.business_id.in_(business_ids))
+        .order_by(models.Service.service_id)
+    )
+    coupons = _group_by_business(
+        db.query(models.Coupon).filter(models.Coupon.business_id.in_(business_ids), models.Coupon.is_active == True)
+        .order_by(models.Coupon.coupon_id)
+    )
+    media = _group_by_business(
+        db.query(models.MediaAsset)
+        .filter(models.MediaAsset.business_id.in_(business_ids), models.MediaAsset.media_type == "image")
+        .order_by(models.MediaAsset.uploaded_at, models.MediaAsset.asset_id)
+    )
+    infos = _group_by_business(
+        db.query(models.OperationalInfo).filter(models.OperationalInfo.business_id.in_(business_ids))
+    )
+    ai_metas = _group_by_business(
+        db.query(models.AiMetadata)
+        .filter(models.AiMetadata.business_id.in_(business_ids))
+        .order_by(models.AiMetadata.generated_at.desc())
+    )
+    return [
+        (
+            _snapshot(b),
+            services.get(b.business_id, []),
+            coupons.get(b.business_id, []),
+            media.get(b.business_id, []),
+            next(iter(infos.get(b.business_id, [])), None),
+            next(iter(ai_metas.get(b.business_id, [])), None),
+        )
+        for b in businesses
+    ]
+
+def build_feed_payload(inputs: tuple) -> tuple:
+    # Runs in a worker process: pure function of the snapshot
+    jsonld = build_jsonld(*inputs)
+    return inputs[0].business_id, jsonld["@type"], json.dumps(jsonld)
+
+def regenerate_all_jsonld(db: Session, chunk_size: int = 500, workers: int | None = None, progress=print) -> dict:
+    supported_types = set(models.JsonLDFeed.__table__.c.schema_type.type.enums)
+    total = db.query(func.count(models.BusinessProfile.business_id)).scalar()
+    stats = {"total": total, "processed": 0, "written": 0, "unchanged": 0, "unsupported": 0}
+    started = time.perf_counter()
+
+    # workers=1 builds in-process (no pool start-up cost for small runs)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    try:
+        last_id = None
+        while True:
+            # 1. Next chunk of ids (keyset on business_id)
+            query = db.query(models.BusinessProfile.business_id).order_by(models.BusinessProfile.business_id)
+            if last_id is not None:
+                query = query.filter(models.BusinessProfile.business_id > last_id)
+            business_ids = [row.business_id for row in query.limit(chunk_size)]
+            if not business_ids:
+                break
+            last_id = business_ids[-1]
+
+            # 2. Set-based load, then skip everything whose source rows are unchanged
+            inputs = load_jsonld_inputs(db, business_ids)
+            stored = dict(
+                db.query(models.JsonLDSource.business_id, models.JsonLDSource.source_hash)
+                .filter(models.JsonLDSource.business_id.in_(business_ids))
+                .all()
+            )
+            digests, to_build = {}, []
+            for item in inputs:
+                business_id = item[0].business_id
+                if schema_type_for(item[0].business_type) not in supported_types:
+                    stats["unsupported"] += 1
+                    continue
+                digests[business_id] = source_hash(*item)
+                if stored.get(business_id) == digests[business_id]:
+                    stats["unchanged"] += 1
+                else:
+                    to_build.append(item)
+
+            # 3. Parallel build of the rest
+            if pool and to_build:
+                payloads = list(pool.map(build_feed_payload, to_build, chunksize=50))
+            else:
+                payloads = [build_feed_payload(item) for item in to_build]
+
+            # 4. Same document as the latest feed (DISTINCT ON) -> only remember the source hash
+            latest = {
+                row.business_id: row
+                for row in db.query(models.JsonLDFeed.business_id, models.JsonLDFeed.feed_id, models.JsonLDFeed.jsonld_data)
+                .filter(models.JsonLDFeed.business_id.in_([payload[0] for payload in payloads]))
+                .order_by(models.JsonLDFeed.business_id, models.JsonLDFeed.generated_at.desc())
+                .distinct(models.JsonLDFeed.business_id)
+            } if payloads else {}
+            now = datetime.utcnow()
+            rows, sources = [], []
+            for business_id, schema_type, jsonld_data in payloads:
+                previous = latest.get(business_id)
+                if previous and content_hash(previous.jsonld_data) == content_hash(jsonld_data):
+                    stats["unchanged"] += 1
+                    feed_id = previous.feed_id
+                else:
+                    feed_id = uuid4()
+                    rows.append({
+                        "feed_id": feed_id,
+                        "business_id": business_id,
+                        "schema_type": schema_type,
+                        "jsonld_data": jsonld_data,
+                        "is_valid": True,
+                        "validation_errors": None,
+                        "generated_at": now,
+                    })
+                sources.append({"business_id": business_id, "feed_id": feed_id, "source_hash": digests[business_id]})
+
+            # 5. Bulk insert + source hashes + prune, one transaction per chunk
+            if rows:
+                written_ids = [row["business_id"] for row in rows]
+                db.execute(insert(models.JsonLDFeed), rows)
+                prune_feeds(db, written_ids, JSONLD_FEED_RETENTION)
+            record_sources(db, sources)
+            db.commit()
+            db.expunge_all()
+            # One invalidation for the whole chunk
+            publish_business_changes(row["business_id"] for row in rows)
+
+            # 6. Progress + throughput
+            stats["processed"] += len(business_ids)
+            stats["written"] += len(rows)
+            elapsed = time.perf_counter() - started
+            progress(
+                f"[jsonld] {stats['processed']}/{total} businesses, {stats['written']} written, "
+                f"{stats['unchanged']} unchanged, {stats['unsupported']} unsupported "
+                f"({stats['processed'] / elapsed:.0f}/s)"
+            )
+    finally:
+        if pool:
+            pool.shutdown()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["per_second"] = round(stats["processed"] / stats["seconds"], 1) if stats["seconds"] else None
+    return stats
+
 @router.get("/", response_model=List[JsonLDFeedOut])
 def list_jsonld(business_id: UUID = Query(...), db: Session = Depends(get_db)):
     return (
@@ -146,11 +405,14 @@ def get_jsonld(feed_id: UUID, db: Session = Depends(get_db)):
     return feed
 
 @router.delete("/{feed_id}")
-def delete_jsonld(feed_id: UUID, db: Session = Depends(get_db)):
+def delete_jsonld(feed_id: UUID, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
     feed = db.query(models.JsonLDFeed).filter_by(feed_id=feed_id).first()
     if not feed:
         raise HTTPException(status_code=404, detail="JSON-LD feed not found")
+    authorize_business(db, feed.business_id, session)
     
+    business_id = feed.business_id
     db.delete(feed)
     db.commit()
+    publish_business_change(business_id)
     return {"message": "Feed deleted successfully"}
\ No newline at end of file
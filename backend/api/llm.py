@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+import threading
+import google.generativeai as genai
+from api.cache import Cache, make_backend
+
+# Configure Gemini
+genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
+# --- 🚀 SYSTEM DESIGN: SWAPPABLE LLM CLIENT ---
+# "gemini" -> real API calls
+# "fake"   -> canned local responses (tests, offline development)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+
+# --- 🚀 SYSTEM DESIGN: ONE CONCURRENCY CAP PER PROCESS ---
+# Every API call, whichever pool or thread it comes from (jobs, batch fan-out,
+# request handlers), takes a slot here first, so at most LLM_MAX_CONCURRENCY
+# calls are in flight per worker. Cache hits don't need a slot.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+# --- 🚀 SYSTEM DESIGN: PROMPT-KEYED RESPONSE CACHE ---
+# Identical prompts (same model, same text after whitespace normalization) are
+# answered from a persistent, size-bounded LRU store instead of the API.
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "sqlite")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 60 * 60)))  # 0 = off
+LLM_CACHE_NAMESPACE = "llm"
+
+
+class GeminiClient:
+    def generate(self, model_name: str, prompt: str) -> str:
+        model = genai.GenerativeModel(model_name)
+        response = model.generate_content(prompt)
+        return response.text
+
+
+class FakeLLMClient:
+    """Answers every prompt locally. Pass `responder` to control the reply."""
+
+    # One payload that satisfies every parser in the app
+    DEFAULT_RESPONSE = {
+        "score": 50,
+        "bot_analysis": "Fake analysis for bots",
+        "human_analysis": "Fake analysis for humans",
+        "issues": ["Fake issue"],
+        "recommendations": ["Fake recommendation"],
+        "keywords": "fake, local, business",
+        "extracted_insights": "A fake marketing pitch.",
+        "intent_labels": "Booking, Inquiry, Discovery",
+        "detected_entities": "Fake City, Fake Service",
+    }
+
+    def __init__(self, responder=None):
+        self.responder = responder
+        self.prompts = []
+
+    def generate(self, model_name: str, prompt: str) -> str:
+        self.prompts.append(prompt)
+        if self.responder:
+            return self.responder(prompt)
+        return json.dumps(self.DEFAULT_RESPONSE)
+
+
+def make_client(name: str = LLM_BACKEND):
+    if name == "gemini":
+        return GeminiClient()
+    if name == "fake":
+        return FakeLLMClient()
+    raise ValueError(f"Unknown LLM_BACKEND '{name}'. Use 'gemini' or 'fake'.")
+
+
+_client = make_client()
+
+
+def get_client():
+    return _client
+
+
+def set_client(client):
+    global _client
+    _client = client
+
+
+llm_cache = Cache(make_backend(LLM_CACHE_BACKEND, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES))
+
+
+def prompt_key(model_name: str, prompt: str) -> str:
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(f"{model_name}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def _call(model_name: str, prompt: str) -> str:
+    with _slots:
+        return _client.generate(model_name, prompt)
+
+
+def generate(model_name: str, prompt: str) -> str:
+    if not LLM_CACHE_TTL_SECONDS:
+        return _call(model_name, prompt)
+
+    key = prompt_key(model_name, prompt)
+    cached = llm_cache.get(LLM_CACHE_NAMESPACE, key)
+    if cached is not None:
+        return cached
+
+    text = _call(model_name, prompt)
+    # Empty answers are never cached, so a transient failure is retried next time
+    if text and text.strip():
+        llm_cache.set(LLM_CACHE_NAMESPACE, key, text, ttl=LLM_CACHE_TTL_SECONDS)
+    return text
+
+
+def forget(model_name: str, prompt: str):
+    # Called when a cached answer turned out to be unusable (e.g. not valid JSON)
+    llm_cache.delete(LLM_CACHE_NAMESPACE, prompt_key(model_name, prompt))
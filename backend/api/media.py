@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from db.database import get_db
 from db import models
 from schemas.media import MediaOut
-from uuid import UUID, uuid4
+from uuid import UUID
 from typing import List
 import os
+import time
 from datetime import datetime
+from api.cache import publish_business_change
+from api.uploads import receive_upload, UploadTooLarge, UploadRejected
+from api.media_variants import schedule_variants, variant_paths
+from api.tokens import authorize_business, get_current_session
 
 router = APIRouter(prefix="/media", tags=["Media"])
 
@@ -37,43 +45,169 @@ def validate_file(media_type: str, filename: str, file_size: int):
             detail=f"File too large. Max allowed size is {MAX_FILE_SIZE // (1024*1024)} MB"
         )
 
-@router.post("/upload", response_model=MediaOut)
-def upload_media_file(
-    business_id: UUID = Form(...),
-    media_type: str = Form(...),
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
+# The body is parsed by api/uploads.py (streamed), so describe the form for the docs by hand
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["business_id", "media_type", "file"],
+                    "properties": {
+                        "business_id": {"type": "string", "format": "uuid"},
+                        "media_type": {"type": "string", "enum": list(ALLOWED_EXTENSIONS)},
+                        "file": {"type": "string", "format": "binary"},
+                    },
+                }
+            }
+        },
+    }
+}
+
+@router.post("/upload", response_model=MediaOut, openapi_extra=UPLOAD_OPENAPI)
+async def upload_media_file(request: Request, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    def check_file(filename, fields):
+        # Bad extension? Reject before a single byte is stored (when media_type was sent first)
+        if "media_type" in fields:
+            validate_file(fields["media_type"], filename, 0)
+
+    # ✅ Stream the file to a temp file in UPLOAD_DIR, enforcing MAX_FILE_SIZE chunk by chunk
+    try:
+        fields, staged = await receive_upload(request, UPLOAD_DIR, MAX_FILE_SIZE, check_file=check_file)
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Max allowed size is {MAX_FILE_SIZE // (1024*1024)} MB"
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if staged is None or "business_id" not in fields or "media_type" not in fields:
+            raise HTTPException(status_code=422, detail="business_id, media_type and file are required")
+        try:
+            business_id = UUID(fields["business_id"])
+        except ValueError:
+            raise HTTPException(status_code=422, detail="business_id must be a UUID")
+        await run_in_threadpool(authorize_business, db, business_id, session)
+        return await run_in_threadpool(store_upload, db, business_id, fields["media_type"], staged)
+    finally:
+        # No-op once the file has been moved into place
+        if staged:
+            staged.discard()
+
+def store_upload(db: Session, business_id: UUID, media_type: str, staged) -> models.MediaAsset:
     business = db.query(models.BusinessProfile).filter_by(business_id=business_id).first()
     if not business:
         raise HTTPException(status_code=404, detail="Business not found")
 
-    # ✅ Read file into memory to check size
-    file_bytes = file.file.read()
-    file_size = len(file_bytes)
-
     # Validate type and size
-    validate_file(media_type, file.filename, file_size)
+    validate_file(media_type, staged.filename, staged.size)
+
+    # 1. Content-addressed name; take (or create) the blob row. The row lock orders
+    #    concurrent uploads of the same bytes against each other and against the GC
+    ext = os.path.splitext(staged.filename)[1].lower()
+    upsert = (
+        pg_insert(models.MediaBlob)
+        .values(
+            sha256=staged.sha256,
+            url=f"/uploads/{staged.sha256}{ext}",
+            size_bytes=staged.size,
+            ref_count=1,
+            created_at=datetime.utcnow(),
+        )
+        .on_conflict_do_update(
+            index_elements=[models.MediaBlob.sha256],
+            set_={"ref_count": models.MediaBlob.ref_count + 1},
+        )
+        .returning(models.MediaBlob.url, models.MediaBlob.ref_count)
+    )
+    url, ref_count = db.execute(upsert).one()
 
-    # Generate unique filename
-    filename = f"{uuid4()}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    with open(file_path, "wb") as f:
-        f.write(file_bytes)
+    # 2. Only the first copy is kept on disk; duplicates are metadata-only
+    file_path = blob_path(url)
+    placed = not os.path.exists(file_path)
+    if placed:
+        staged.commit(file_path)
 
     # Store public URL
     new_media = models.MediaAsset(
         business_id=business_id,
         media_type=media_type,
-        url=f"/uploads/{filename}",
+        url=url,
         alt_text=None,
         uploaded_at=datetime.utcnow()
     )
-    db.add(new_media)
-    db.commit()
+    try:
+        db.add(new_media)
+        db.commit()
+    except Exception:
+        # Remove our copy while we still hold the blob row, then release it
+        if placed:
+            os.remove(file_path)
+        db.rollback()
+        raise
     db.refresh(new_media)
+    publish_business_change(business_id)
+    if media_type == "image" and ref_count == 1:
+        # Thumbnails / WebP sizes are rendered off the request path
+        schedule_variants(staged.sha256, UPLOAD_DIR)
     return new_media
 
+def blob_path(url: str) -> str:
+    return os.path.join(UPLOAD_DIR, os.path.basename(url))
+
+# -------------------------
+# GARBAGE COLLECTION (unreferenced blobs + abandoned temp files)
+# -------------------------
+STALE_UPLOAD_SECONDS = 60 * 60
+
+def collect_media_garbage(db: Session, stale_upload_seconds: int = STALE_UPLOAD_SECONDS) -> dict:
+    stats = {"blobs_removed": 0, "bytes_freed": 0, "temp_files_removed": 0}
+
+    # 1. Candidates: counter at zero, or no row points at the blob any more (MediaAsset
+    #    rows removed by ON DELETE CASCADE with their business never decrement it).
+    #    Rows an upload is holding right now are skipped.
+    referenced = db.query(models.MediaAsset.asset_id).filter(models.MediaAsset.url == models.MediaBlob.url).exists()
+    candidates = (
+        db.query(models.MediaBlob)
+        .filter(or_(models.MediaBlob.ref_count == 0, ~referenced))
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+    # 2. Re-check with a fresh snapshot now that the rows are locked: an upload that
+    #    committed while we waited is visible here
+    still_referenced = {
+        url for (url,) in db.query(models.MediaAsset.url).filter(models.MediaAsset.url.in_([b.url for b in candidates])).distinct()
+    }
+
+    # 3. Unlink while the row is still locked, so an upload of the same bytes waits
+    #    for us and then finds the file missing and puts its own copy in place.
+    #    Variant rows go with the blob (ON DELETE CASCADE), their files go here
+    variants = variant_paths(db, [b.sha256 for b in candidates], UPLOAD_DIR)
+    for blob in candidates:
+        if blob.url in still_referenced:
+            continue
+        for path in [blob_path(blob.url), *variants.get(blob.sha256, [])]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        db.delete(blob)
+        stats["blobs_removed"] += 1
+        stats["bytes_freed"] += blob.size_bytes
+    db.commit()
+
+    # 4. Temp files left behind by crashed uploads
+    cutoff = time.time() - stale_upload_seconds
+    for entry in os.scandir(UPLOAD_DIR):
+        if entry.name.startswith(".upload-") and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            stats["temp_files_removed"] += 1
+    return stats
+
 @router.get("/{media_id}", response_model=MediaOut)
 def get_media(media_id: UUID, db: Session = Depends(get_db)):
     media = db.query(models.MediaAsset).filter_by(asset_id=media_id).first()
@@ -98,11 +232,18 @@ def list_media(
     )
 
 @router.delete("/{media_id}", response_model=dict)
-def delete_media(media_id: UUID, db: Session = Depends(get_db)):
+def delete_media(media_id: UUID, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
     media = db.query(models.MediaAsset).filter_by(asset_id=media_id).first()
     if not media:
         raise HTTPException(status_code=404, detail="Media not found")
+    authorize_business(db, media.business_id, session)
 
+    business_id = media.business_id
+    # The file itself is shared by content hash; the GC removes it once nothing points at it
+    db.query(models.MediaBlob).filter_by(url=media.url).update(
+        {"ref_count": func.greatest(models.MediaBlob.ref_count - 1, 0)}, synchronize_session=False
+    )
     db.delete(media)
     db.commit()
+    publish_business_change(business_id)
     return {"detail": "Media deleted"}
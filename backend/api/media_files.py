@@ -0,0 +1,69 @@
+import os
+import re
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+
+# --- 🚀 SYSTEM DESIGN: MEDIA SERVING ---
+# Uploads are named by content hash (api/media.py) and variants by hash + width
+# (api/media_variants.py), so a URL never changes meaning. Those files are sent
+# with a one-year "immutable" Cache-Control and a strong ETag derived from the
+# name, which browsers and CDNs can keep without ever revalidating. Range
+# requests (video seeking) get 206 / 416 from Starlette's FileResponse.
+# Zero-copy: servers speaking the ASGI pathsend extension get the path instead of
+# chunks; behind nginx/Apache set MEDIA_SENDFILE_HEADER ("X-Accel-Redirect" or
+# "X-Sendfile") and the proxy streams the file with sendfile(2) itself.
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MEDIA_CACHE_SECONDS = int(os.getenv("MEDIA_CACHE_SECONDS", "300"))  # legacy, non-hashed names
+MEDIA_CHUNK_BYTES = int(os.getenv("MEDIA_CHUNK_BYTES", str(1024 * 1024)))
+MEDIA_SENDFILE_HEADER = os.getenv("MEDIA_SENDFILE_HEADER", "")
+MEDIA_SENDFILE_PREFIX = os.getenv("MEDIA_SENDFILE_PREFIX", "/_protected_uploads/")
+
+# "<sha256>.<ext>" or "<sha256>-<width>w.<ext>"
+CONTENT_ADDRESSED_NAME = re.compile(r"^(?P<key>[0-9a-f]{64}(?:-\d+w)?)\.[A-Za-z0-9]+$")
+
+
+def cache_headers(filename: str) -> dict:
+    match = CONTENT_ADDRESSED_NAME.match(filename)
+    if match:
+        return {
+            "cache-control": f"public, max-age={MEDIA_IMMUTABLE_MAX_AGE}, immutable",
+            "etag": f'"{match.group("key")}"',
+        }
+    return {"cache-control": f"public, max-age={MEDIA_CACHE_SECONDS}, must-revalidate"}
+
+
+class MediaFileResponse(FileResponse):
+    # Fewer, larger reads: each chunk is one threadpool hop
+    chunk_size = MEDIA_CHUNK_BYTES
+
+
+class MediaFiles(StaticFiles):
+    """StaticFiles with content-addressed caching headers and optional proxy sendfile offload."""
+
+    def __init__(self, *, directory: str, sendfile_header: str | None = None, sendfile_prefix: str | None = None, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.sendfile_header = MEDIA_SENDFILE_HEADER if sendfile_header is None else sendfile_header
+        self.sendfile_prefix = MEDIA_SENDFILE_PREFIX if sendfile_prefix is None else sendfile_prefix
+
+    async def get_response(self, path: str, scope) -> Response:
+        # In-progress uploads (".upload-*.part") and other dotfiles are never public
+        if any(part.startswith(".") for part in path.replace("\\", "/").split("/") if part):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        response = MediaFileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers.update(cache_headers(os.path.basename(full_path)))
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+
+        if self.sendfile_header and status_code == 200:
+            # The proxy serves the bytes (and Range) from its internal location
+            relative = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+            headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+            headers[self.sendfile_header] = self.sendfile_prefix.rstrip("/") + "/" + relative
+            return Response(status_code=200, headers=headers)
+        return response
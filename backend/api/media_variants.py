@@ -0,0 +1,196 @@
+import os
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import case, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from datetime import datetime
+from db.database import SessionLocal
+from db import models
+from api.cache import publish_business_change
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is in requirements.txt
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+# --- 🚀 SYSTEM DESIGN: BACKGROUND IMAGE DERIVATIVES ---
+# Uploads are stored as-is. Right after an image blob is committed, a small
+# dedicated pool renders resized WebP copies (one per MEDIA_VARIANT_WIDTHS,
+# never wider than the original) next to it and records them in
+# media_variants. Readers pick the smallest variant that is at least as wide
+# as what they display, and fall back to the original until variants exist.
+MEDIA_VARIANT_WIDTHS = sorted({int(w) for w in os.getenv("MEDIA_VARIANT_WIDTHS", "160,480,960").split(",") if w.strip()})
+MEDIA_VARIANT_QUALITY = int(os.getenv("MEDIA_VARIANT_QUALITY", "80"))
+MEDIA_VARIANT_WORKERS = int(os.getenv("MEDIA_VARIANT_WORKERS", "2"))
+MEDIA_VARIANT_FORMAT = "webp"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ThreadPoolExecutor:
+    # Created on first use, so the app can shut it down and start it again (tests, reloads)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=MEDIA_VARIANT_WORKERS, thread_name_prefix="media-variant")
+        return _pool
+
+
+def shutdown_pool():
+    # Variants being rendered finish; queued ones are dropped (readers fall back to the original)
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def variant_name(sha256: str, width: int) -> str:
+    return f"{sha256}-{width}w.{MEDIA_VARIANT_FORMAT}"
+
+
+def variant_url_expr(url_column, min_width: int):
+    """Scalar subquery: the smallest variant at least `min_width` wide for the blob at `url_column`, else the largest one."""
+    variant, blob = models.MediaVariant, models.MediaBlob
+    return (
+        select(variant.url)
+        .join(blob, blob.sha256 == variant.sha256)
+        .where(blob.url == url_column)
+        .order_by((variant.width < min_width).asc(), case((variant.width >= min_width, variant.width), else_=-variant.width))
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def pick_variant_url(db: Session, url: str, min_width: int) -> str:
+    # Falls back to the original while no variant exists (yet)
+    return db.execute(select(variant_url_expr(url, min_width))).scalar() or url
+
+
+def schedule_variants(sha256: str, upload_dir: str):
+    if Image is None:
+        return None
+    return get_pool().submit(_generate_variants_safely, sha256, upload_dir)
+
+
+def _generate_variants_safely(sha256: str, upload_dir: str):
+    # Runs detached from any request: a bad image must not kill the worker
+    try:
+        return generate_variants(sha256, upload_dir)
+    except Exception:
+        logger.exception("Could not generate variants for blob %s", sha256)
+        return None
+
+
+def generate_variants(sha256: str, upload_dir: str, db: Session | None = None) -> int:
+    """Render and record the WebP variants of one image blob; returns how many were created."""
+    own_session = db is None
+    db = db or SessionLocal()
+    written = []
+    try:
+        # 1. Skip blobs that are gone, already done, or not images
+        blob = db.query(models.MediaBlob).filter_by(sha256=sha256).first()
+        if not blob:
+            return 0
+        if db.query(models.MediaVariant.sha256).filter_by(sha256=sha256).first():
+            return 0
+        source = os.path.join(upload_dir, os.path.basename(blob.url))
+        url_prefix = blob.url.rsplit("/", 1)[0]
+        db.rollback()  # don't sit in a transaction while resizing
+
+        rows = []
+        with Image.open(source) as image:
+            if getattr(image, "is_animated", False):
+                # A still WebP would drop the animation; keep serving the original
+                return 0
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+            # 2. One file per width (capped at the original), written atomically
+            for width in sorted({min(w, image.width) for w in MEDIA_VARIANT_WIDTHS}):
+                height = max(1, round(image.height * width / image.width))
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                name = variant_name(sha256, width)
+                final_path = os.path.join(upload_dir, name)
+                with tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".upload-", suffix=".part", delete=False) as temp:
+                    resized.save(temp, format=MEDIA_VARIANT_FORMAT, quality=MEDIA_VARIANT_QUALITY, method=4)
+                os.replace(temp.name, final_path)
+                written.append(final_path)
+                rows.append({
+                    "sha256": sha256,
+                    "width": width,
+                    "height": height,
+                    "format": MEDIA_VARIANT_FORMAT,
+                    "url": f"{url_prefix}/{name}",
+                    "size_bytes": os.path.getsize(final_path),
+                    "created_at": datetime.utcnow(),
+                })
+
+        # 3. Record them while holding the blob row (the GC skips locked rows); if the
+        #    GC removed the blob meanwhile, our files are orphans
+        if not db.query(models.MediaBlob.sha256).filter_by(sha256=sha256).with_for_update(read=True).first():
+            db.rollback()
+            _remove(written)
+            return 0
+        db.execute(pg_insert(models.MediaVariant).values(rows).on_conflict_do_nothing())
+        business_ids = [
+            business_id for (business_id,) in
+            db.query(models.MediaAsset.business_id).filter(models.MediaAsset.url == blob.url).distinct()
+        ]
+        db.commit()
+        written = []
+    except Exception:
+        db.rollback()
+        _remove(written)
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+    # 4. Cached directory / SEO pages still point at the original
+    for business_id in business_ids:
+        publish_business_change(business_id)
+    return len(rows)
+
+
+def variant_paths(db: Session, sha256_list: list, upload_dir: str) -> dict:
+    paths = {}
+    for sha256, url in db.query(models.MediaVariant.sha256, models.MediaVariant.url).filter(models.MediaVariant.sha256.in_(sha256_list)):
+        paths.setdefault(sha256, []).append(os.path.join(upload_dir, os.path.basename(url)))
+    return paths
+
+
+def backfill_variants(db: Session, upload_dir: str, progress=print) -> dict:
+    # Image blobs stored before variants existed (or whose generation failed)
+    image_urls = select(models.MediaAsset.url).where(models.MediaAsset.media_type == "image")
+    has_variants = select(models.MediaVariant.sha256).where(models.MediaVariant.sha256 == models.MediaBlob.sha256).exists()
+    pending = [
+        sha256 for (sha256,) in
+        db.query(models.MediaBlob.sha256).filter(models.MediaBlob.url.in_(image_urls), ~has_variants)
+    ]
+    db.rollback()
+    stats = {"blobs": len(pending), "variants_created": 0, "failed": 0}
+    for done, sha256 in enumerate(pending, start=1):
+        try:
+            stats["variants_created"] += generate_variants(sha256, upload_dir, db)
+        except Exception as e:
+            stats["failed"] += 1
+            progress(f"⚠️ {sha256}: {e}")
+        if done % 50 == 0:
+            progress(f"{done}/{len(pending)} blobs")
+    return stats
+
+
+def _remove(paths: list):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
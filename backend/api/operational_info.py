@@ -4,15 +4,15 @@ from db.database import get_db
 from db import models
 from schemas.operational_info import OperationalInfoCreate, OperationalInfoOut
 from uuid import UUID
+from api.cache import publish_business_change
+from api.tokens import authorize_business, get_current_session
 
 router = APIRouter(tags=["Operational Info"])
 
 # ✅ Create operational info (one per business)
 @router.post("/", response_model=OperationalInfoOut)
-def create_operational_info(data: OperationalInfoCreate, db: Session = Depends(get_db)):
-    business = db.query(models.BusinessProfile).filter_by(business_id=data.business_id).first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
+def create_operational_info(data: OperationalInfoCreate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    authorize_business(db, data.business_id, session)
 
     # prevent duplicate record for same business
     existing = db.query(models.OperationalInfo).filter_by(business_id=data.business_id).first()
@@ -23,6 +23,7 @@ def create_operational_info(data: OperationalInfoCreate, db: Session = Depends(g
     db.add(new_info)
     db.commit()
     db.refresh(new_info)
+    publish_business_change(new_info.business_id)
     return new_info
 
 # ✅ Get by business_id
@@ -35,7 +36,8 @@ def get_operational_info_by_business(business_id: UUID, db: Session = Depends(ge
 
 # ✅ Update by business_id
 @router.patch("/by-business/{business_id}", response_model=OperationalInfoOut)
-def update_operational_info_by_business(business_id: UUID, data: OperationalInfoCreate, db: Session = Depends(get_db)):
+def update_operational_info_by_business(business_id: UUID, data: OperationalInfoCreate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    authorize_business(db, business_id, session)
     info = db.query(models.OperationalInfo).filter_by(business_id=business_id).first()
     if not info:
         raise HTTPException(status_code=404, detail="Operational info not found")
@@ -45,15 +47,18 @@ def update_operational_info_by_business(business_id: UUID, data: OperationalInfo
 
     db.commit()
     db.refresh(info)
+    publish_business_change(business_id)
     return info
 
 # ✅ Delete by business_id (optional)
 @router.delete("/by-business/{business_id}", response_model=dict)
-def delete_operational_info_by_business(business_id: UUID, db: Session = Depends(get_db)):
+def delete_operational_info_by_business(business_id: UUID, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    authorize_business(db, business_id, session)
     info = db.query(models.OperationalInfo).filter_by(business_id=business_id).first()
     if not info:
         raise HTTPException(status_code=404, detail="Operational info not found")
 
     db.delete(info)
     db.commit()
+    publish_business_change(business_id)
     return {"detail": "Operational info deleted"}
@@ -1,55 +1,249 @@
-from fastapi import APIRouter, Depends, Request, Response
-from fastapi.responses import HTMLResponse
+import os
+import math
+import zlib
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
-from db.database import get_db
+from db.database import get_db, SessionLocal
 from db import models
 from uuid import UUID
-from datetime import datetime
+import hashlib
+from api.cache import cache, on_business_change
+from api.media_variants import pick_variant_url
 
 # Define the router
 router = APIRouter(prefix="/public", tags=["Public SEO Pages"])
 
 # 1. DYNAMIC SITEMAP (The Map for Bots)
+# --- 🚀 SYSTEM DESIGN: STREAMED, SHARDED SITEMAPS ---
+# Rows come from a server-side cursor (only business_id/updated/created_at) and
+# are written out in chunks, so memory stays flat at any directory size. Past
+# the protocol limit, /sitemap.xml becomes an index of numbered child sitemaps.
+# Child files are keyset ranges on (created_at, business_id): the first key of
+# every file is found in one pass and cached, so file N is an index range scan
+# instead of an OFFSET over everything before it. New businesses land in the
+# last file; the boundaries are recomputed when the file count changes.
+SITEMAP_MAX_URLS = 50000  # sitemaps.org limit per file
+SITEMAP_BUSINESSES_PER_FILE = SITEMAP_MAX_URLS - 1  # first file also lists the directory hub
+SITEMAP_CHUNK_ROWS = 1000
+SITEMAP_GZIP = os.getenv("SITEMAP_GZIP", "false").lower() == "true"
+SITEMAP_NAMESPACE = "sitemap"
+SITEMAP_BOUNDARIES_TTL_SECONDS = 60 * 60
+
+def sitemap_lastmod(updated, created_at) -> str:
+    stamp = updated or created_at
+    return f"<lastmod>{stamp.strftime('%Y-%m-%d')}</lastmod>" if stamp else ""
+
+def xml_stream_response(parts, gzip_output: bool = False) -> StreamingResponse:
+    if not gzip_output:
+        return StreamingResponse((part.encode("utf-8") for part in parts), media_type="application/xml")
+
+    def compress():
+        # wbits=31 -> gzip container, compressed incrementally as parts arrive
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for part in parts:
+            chunk = compressor.compress(part.encode("utf-8"))
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+
+    return StreamingResponse(compress(), media_type="application/gzip")
+
+def iter_urlset(site_url: str, page: int, latest=None, start: tuple | None = None, end: tuple | None = None):
+    db = SessionLocal()
+    try:
+        yield '<?xml version="1.0" encoding="UTF-8"?>'
+        yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+
+        # Add Directory Hub (first file only)
+        if page == 1:
+            yield (
+                f"<url><loc>{site_url}/public/directory</loc>"
+                f"{sitemap_lastmod(latest, None)}"
+                "<changefreq>daily</changefreq><priority>1.0</priority></url>"
+            )
+
+        # Add Every Business in [start, end) (real lastmod from updated/created_at)
+        position = tuple_(models.BusinessProfile.created_at, models.BusinessProfile.business_id)
+        rows = db.query(
+            models.BusinessProfile.business_id,
+            models.BusinessProfile.updated,
+            models.BusinessProfile.created_at,
+        )
+        if start:
+            rows = rows.filter(position >= start)
+        if end:
+            rows = rows.filter(position < end)
+        rows = (
+            rows.order_by(models.BusinessProfile.created_at, models.BusinessProfile.business_id)
+            .limit(SITEMAP_BUSINESSES_PER_FILE)
+            .execution_options(yield_per=SITEMAP_CHUNK_ROWS)
+        )
+        buffer = []
+        for business_id, updated, created_at in rows:
+            buffer.append(
+                f"<url><loc>{site_url}/public/business/{business_id}</loc>"
+                f"{sitemap_lastmod(updated, created_at)}"
+                "<changefreq>weekly</changefreq><priority>0.8</priority></url>"
+            )
+            if len(buffer) >= SITEMAP_CHUNK_ROWS:
+                yield "".join(buffer)
+                buffer.clear()
+        if buffer:
+            yield "".join(buffer)
+
+        yield "</urlset>"
+    finally:
+        db.close()
+
+def sitemap_boundaries() -> list:
+    # First (created_at, business_id) of every child file, in one pass over the index
+    db = SessionLocal()
+    try:
+        Business = models.BusinessProfile
+        ranked = db.query(
+            Business.created_at,
+            Business.business_id,
+            func.row_number().over(order_by=(Business.created_at, Business.business_id)).label("position"),
+        ).subquery()
+        rows = (
+            db.query(ranked.c.created_at, ranked.c.business_id)
+            .filter((ranked.c.position - 1) % SITEMAP_BUSINESSES_PER_FILE == 0)
+            .order_by(ranked.c.position)
+            .all()
+        )
+    finally:
+        db.close()
+    # JSON-friendly, so the list can live in a shared cache backend
+    return [[created_at.isoformat(), str(business_id)] for created_at, business_id in rows]
+
+def decode_boundary(boundary) -> tuple:
+    created_at, business_id = boundary
+    return datetime.fromisoformat(created_at), UUID(business_id)
+
+def sitemap_summary(db: Session):
+    # One aggregate query: how many files, and the hub's lastmod
+    return db.query(
+        func.count(models.BusinessProfile.business_id),
+        func.max(func.coalesce(models.BusinessProfile.updated, models.BusinessProfile.created_at)),
+    ).one()
+
 @router.get("/sitemap.xml", response_class=Response)
 def generate_sitemap(request: Request, db: Session = Depends(get_db)):
-    # Base URL for the public endpoints
     # Uses the request's base URL to ensure it works on localhost AND Render automatically
-    base_url = str(request.base_url).rstrip("/") + "/public/business"
-    
-    # Fetch all published businesses
-    businesses = db.query(models.BusinessProfile).all()
-    
-    xml_content = ['<?xml version="1.0" encoding="UTF-8"?>']
-    xml_content.append('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">')
-    
-    # Add Directory Hub
-    xml_content.append(f"""
-    <url>
-        <loc>{str(request.base_url).rstrip("/")}/public/directory</loc>
-        <changefreq>daily</changefreq>
-        <priority>1.0</priority>
-    </url>
-    """)
-    
-    # Add Every Business
-    for b in businesses:
-        xml_content.append(f"""
-        <url>
-            <loc>{base_url}/{b.business_id}</loc>
-            <lastmod>{datetime.utcnow().strftime('%Y-%m-%d')}</lastmod>
-            <changefreq>weekly</changefreq>
-            <priority>0.8</priority>
-        </url>
-        """)
-    
-    xml_content.append('</urlset>')
-    return Response(content="".join(xml_content), media_type="application/xml")
+    site_url = str(request.base_url).rstrip("/")
+    total, latest = sitemap_summary(db)
+
+    if total <= SITEMAP_BUSINESSES_PER_FILE:
+        return xml_stream_response(iter_urlset(site_url, 1, latest))
+
+    # Sitemap index pointing at the child files
+    suffix = ".xml.gz" if SITEMAP_GZIP else ".xml"
+    files = math.ceil(total / SITEMAP_BUSINESSES_PER_FILE)
+    entries = "".join(
+        f"<sitemap><loc>{site_url}/public/sitemaps/{page}{suffix}</loc>{sitemap_lastmod(latest, None)}</sitemap>"
+        for page in range(1, files + 1)
+    )
+    xml_content = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>'
+    )
+    return Response(content=xml_content, media_type="application/xml")
+
+@router.get("/sitemaps/{page:int}.xml", response_class=Response)
+def get_child_sitemap(page: int, request: Request, db: Session = Depends(get_db)):
+    return child_sitemap_response(page, request, db, gzip_output=False)
+
+@router.get("/sitemaps/{page:int}.xml.gz", response_class=Response)
+def get_child_sitemap_gz(page: int, request: Request, db: Session = Depends(get_db)):
+    return child_sitemap_response(page, request, db, gzip_output=True)
+
+def child_sitemap_response(page: int, request: Request, db: Session, gzip_output: bool):
+    total, latest = sitemap_summary(db)
+    files = max(1, math.ceil(total / SITEMAP_BUSINESSES_PER_FILE))
+    if page < 1 or page > files:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+
+    # Keyed by the file count: a business that starts a new file brings new boundaries
+    boundaries = cache.get_or_build(
+        SITEMAP_NAMESPACE,
+        f"boundaries:{SITEMAP_BUSINESSES_PER_FILE}:{files}",
+        sitemap_boundaries,
+        ttl=SITEMAP_BOUNDARIES_TTL_SECONDS,
+    )
+    if page > len(boundaries):
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    start = decode_boundary(boundaries[page - 1])
+    end = decode_boundary(boundaries[page]) if page < len(boundaries) else None
+    site_url = str(request.base_url).rstrip("/")
+    return xml_stream_response(iter_urlset(site_url, page, latest, start, end), gzip_output)
 
 # 2. STATIC DIRECTORY (The Hub for Bots)
+# --- 🚀 SYSTEM DESIGN: PAGINATED + CACHED HUB ---
+# Only the rendered columns are selected, pages are linked with rel=next/prev
+# so crawlers can walk them, and each rendered page is cached until the next
+# business write. Only pages that exist are built: the page number is checked
+# against the (cached) business count before it becomes a cache key.
+PUBLIC_DIRECTORY_NAMESPACE = "public_directory"
+PUBLIC_DIRECTORY_PAGE_SIZE = 50
+PUBLIC_DIRECTORY_TTL_SECONDS = 60 * 60
+
+@on_business_change
+def invalidate_public_directory(business_ids=None):
+    cache.invalidate(PUBLIC_DIRECTORY_NAMESPACE)
+
 @router.get("/directory", response_class=HTMLResponse)
-def get_public_directory(request: Request, db: Session = Depends(get_db)):
-    businesses = db.query(models.BusinessProfile).all()
-    
+def get_public_directory(page: int = Query(1, ge=1)):
+    total = cache.get_or_build(PUBLIC_DIRECTORY_NAMESPACE, "count", count_businesses, ttl=PUBLIC_DIRECTORY_TTL_SECONDS)
+    if page > max(1, math.ceil(total / PUBLIC_DIRECTORY_PAGE_SIZE)):
+        return HTMLResponse(content="<h1>Page not found</h1>", status_code=404)
+
+    html = cache.get_or_build(
+        PUBLIC_DIRECTORY_NAMESPACE,
+        f"page:{page}",
+        lambda: build_directory_page(page),
+        ttl=PUBLIC_DIRECTORY_TTL_SECONDS,
+        empty_ttl=0,  # emptied by a concurrent delete: not worth keeping
+    )
+    if not html:
+        return HTMLResponse(content="<h1>Page not found</h1>", status_code=404)
+    return HTMLResponse(content=html)
+
+def count_businesses() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(func.count(models.BusinessProfile.business_id)).scalar()
+    finally:
+        db.close()
+
+def build_directory_page(page: int) -> str:
+    db = SessionLocal()
+    try:
+        # Column projection: no full ORM objects, descriptions cut in SQL
+        rows = (
+            db.query(
+                models.BusinessProfile.business_id,
+                models.BusinessProfile.name,
+                models.BusinessProfile.business_type,
+                models.BusinessProfile.address,
+                func.substr(models.BusinessProfile.description, 1, 101).label("description"),
+            )
+            .order_by(models.BusinessProfile.name, models.BusinessProfile.business_id)
+            .offset((page - 1) * PUBLIC_DIRECTORY_PAGE_SIZE)
+            .limit(PUBLIC_DIRECTORY_PAGE_SIZE + 1)  # one extra row tells us there is a next page
+            .all()
+        )
+    finally:
+        db.close()
+
+    if not rows and page > 1:
+        return ""
+    has_next = len(rows) > PUBLIC_DIRECTORY_PAGE_SIZE
+    return render_directory_page(rows[:PUBLIC_DIRECTORY_PAGE_SIZE], page, has_next)
+
+def render_directory_page(businesses, page: int, has_next: bool) -> str:
     list_items = []
     for b in businesses:
         link = f"/public/business/{b.business_id}"
@@ -63,14 +257,28 @@ def get_public_directory(request: Request, db: Session = Depends(get_db)):
                 <p style="margin: 5px 0 0 0; color: #333;">{desc}</p>
             </li>
         """)
+
+    # Crawlable pagination links
+    prev_url = (f"/public/directory?page={page - 1}" if page > 2 else "/public/directory") if page > 1 else None
+    next_url = f"/public/directory?page={page + 1}" if has_next else None
+    head_links = "".join([
+        f'<link rel="prev" href="{prev_url}">' if prev_url else "",
+        f'<link rel="next" href="{next_url}">' if next_url else "",
+    ])
+    nav_links = " ".join([
+        f'<a href="{prev_url}" rel="prev">&larr; Previous</a>' if prev_url else "",
+        f'<a href="{next_url}" rel="next">Next &rarr;</a>' if next_url else "",
+    ])
+    title = "AiVault Business Directory" if page == 1 else f"AiVault Business Directory - Page {page}"
     
-    html = f"""
+    return f"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
         <meta charset="UTF-8">
-        <title>AiVault Business Directory</title>
+        <title>{title}</title>
         <meta name="description" content="Browse local businesses optimized for AI visibility on AiVault.">
+        {head_links}
     </head>
     <body style="font-family: system-ui, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px;">
         <h1>AiVault Directory</h1>
@@ -78,26 +286,95 @@ def get_public_directory(request: Request, db: Session = Depends(get_db)):
         <ul style="list-style: none; padding: 0;">
             {"".join(list_items)}
         </ul>
+        <nav style="display: flex; justify-content: space-between;">{nav_links}</nav>
     </body>
     </html>
     """
-    return HTMLResponse(content=html)
+
+# --- 🚀 SYSTEM DESIGN: PRE-RENDERED SEO PAGES ---
+# Each page is rendered once per content version and served from the shared
+# cache. The version is bumped by every business-change event, so a repeat
+# crawl costs neither a query nor a render, and an unchanged page is a 304.
+SEO_PAGE_NAMESPACE = "seo_page"
+SEO_PAGE_TTL_SECONDS = 24 * 60 * 60
+# Unknown ids are remembered only briefly, and pages have a cache budget of their
+# own: a crawler walking random UUIDs can't evict the directory and listings
+SEO_PAGE_MISS_TTL_SECONDS = 10
+SEO_PAGE_CACHE_ENTRIES = int(os.getenv("SEO_PAGE_CACHE_ENTRIES", "512"))
+cache.set_budget(SEO_PAGE_NAMESPACE, SEO_PAGE_CACHE_ENTRIES)
+# Hero / og:image width: the smallest WebP variant at least this wide is linked
+SEO_IMAGE_WIDTH = int(os.getenv("SEO_IMAGE_WIDTH", "960"))
+# Past this many changed businesses, one namespace invalidation beats per-page bumps
+SEO_PAGE_MAX_BUMPS = 100
+
+@on_business_change
+def invalidate_seo_page(business_ids=None):
+    if business_ids is None or len(business_ids) > SEO_PAGE_MAX_BUMPS:
+        cache.invalidate(SEO_PAGE_NAMESPACE)
+    else:
+        for business_id in business_ids:
+            cache.bump(SEO_PAGE_NAMESPACE, str(business_id))
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison is allowed for If-None-Match
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
 
 # 3. INDIVIDUAL BUSINESS MIRROR (The Page Bots Read)
 # 3. INDIVIDUAL BUSINESS MIRROR (Styled for Humans & Bots)
 @router.get("/business/{business_id}", response_class=HTMLResponse)
-def get_business_seo_page(business_id: UUID, db: Session = Depends(get_db)):
+def get_business_seo_page(business_id: UUID, request: Request):
+    version = cache.version(SEO_PAGE_NAMESPACE, str(business_id))
+    page = cache.get_or_build(
+        SEO_PAGE_NAMESPACE,
+        f"{business_id}@{version}",
+        lambda: build_business_page(business_id),
+        ttl=SEO_PAGE_TTL_SECONDS,
+        empty_ttl=SEO_PAGE_MISS_TTL_SECONDS,
+    )
+    if not page:
+        return HTMLResponse(content="<h1>Business not found</h1>", status_code=404)
+
+    headers = {"ETag": page["etag"], "Cache-Control": "public, max-age=0, must-revalidate"}
+    if etag_matches(request.headers.get("if-none-match"), page["etag"]):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(content=page["html"], status_code=200, headers=headers)
+
+def build_business_page(business_id: UUID) -> dict:
+    db = SessionLocal()
+    try:
+        html_content = render_business_page(db, business_id)
+    finally:
+        db.close()
+    if html_content is None:
+        # Cached for SEO_PAGE_MISS_TTL_SECONDS, so bots hammering a dead link don't hit the DB
+        return {}
+    body = html_content.encode("utf-8")
+    return {"etag": f'"{hashlib.sha256(body).hexdigest()[:32]}"', "html": html_content}
+
+def render_business_page(db: Session, business_id: UUID) -> str | None:
     business = db.query(models.BusinessProfile).filter_by(business_id=business_id).first()
     if not business:
-        return HTMLResponse(content="<h1>Business not found</h1>", status_code=404)
+        return None
 
     services = db.query(models.Service).filter_by(business_id=business_id).all()
     media = db.query(models.MediaAsset).filter_by(business_id=business_id).all()
-    json_feed = db.query(models.JsonLDFeed).filter_by(business_id=business_id).first()
+    json_feed = (
+        db.query(models.JsonLDFeed)
+        .filter_by(business_id=business_id)
+        .order_by(models.JsonLDFeed.generated_at.desc())
+        .first()
+    )
     
     title = f"{business.name} - {business.business_type}"
     desc = business.description or "View this business profile on AiVault."
     image_url = next((m.url for m in media if m.media_type == "image"), "")
+    if image_url:
+        image_url = pick_variant_url(db, image_url, SEO_IMAGE_WIDTH)
     
     # Generate Service HTML
     services_html = "".join([
@@ -174,4 +451,4 @@ def get_business_seo_page(business_id: UUID, db: Session = Depends(get_db)):
     </html>
     """
     
-    return HTMLResponse(content=html_content, status_code=200)
\ No newline at end of file
+    return html_content
\ No newline at end of file
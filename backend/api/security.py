@@ -1,9 +1,58 @@
+import os
+import asyncio
+import threading
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException
 
-def get_password_hash(password: str) -> str:
+# --- 🚀 SYSTEM DESIGN: BOUNDED PASSWORD HASHING POOL ---
+# bcrypt costs 100-300 ms of CPU per call. Hashes run on their own small pool
+# instead of the request threadpool, so a login burst queues here and the rest
+# of the API keeps its threads. The bcrypt extension releases the GIL while
+# hashing, so threads already run in parallel; "process" is there for
+# deployments that prefer hard isolation. Past PASSWORD_HASH_MAX_PENDING queued
+# calls we answer 429 instead of letting latency grow without bound.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = 1
+
+
+def make_pool(kind: str = PASSWORD_HASH_EXECUTOR, workers: int = PASSWORD_HASH_WORKERS):
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    raise ValueError(f"Unknown PASSWORD_HASH_EXECUTOR '{kind}'. Use 'thread' or 'process'.")
+
+
+_pool = None
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def get_pool():
+    # Created on first use, so the app can shut it down and start it again (tests, reloads)
+    global _pool
+    with _pending_lock:
+        if _pool is None:
+            _pool = make_pool()
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pending_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def get_password_hash(password: str, rounds: int | None = None) -> str:
     # Convert string to bytes, generate salt, and hash
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
     hashed_bytes = bcrypt.hashpw(pwd_bytes, salt)
     return hashed_bytes.decode('utf-8')  # Return string for database storage
 
@@ -16,4 +65,49 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         )
     except (ValueError, TypeError):
         # Handles cases where the hash is invalid or malformed
-        return False
\ No newline at end of file
+        return False
+
+def needs_rehash(hashed_password: str) -> bool:
+    # "$2b$12$<salt+hash>": the cost is the third field
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError, AttributeError):
+        return False
+
+
+# -------------------------
+# ASYNC API (request handlers)
+# -------------------------
+async def _submit(fn, *args):
+    global _pending
+    with _pending_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many sign-ins in progress, try again shortly",
+                headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+            )
+        _pending += 1
+    try:
+        return await asyncio.wrap_future(get_pool().submit(fn, *args))
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _submit(get_password_hash, password, BCRYPT_ROUNDS)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _submit(verify_password, plain_password, hashed_password)
+
+
+def hashing_stats() -> dict:
+    return {
+        "executor": PASSWORD_HASH_EXECUTOR,
+        "workers": PASSWORD_HASH_WORKERS,
+        "pending": _pending,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "rounds": BCRYPT_ROUNDS,
+    }
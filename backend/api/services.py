@@ -6,20 +6,21 @@ from schemas.services import ServiceCreate, ServiceOut, ServiceUpdate
 from uuid import UUID
 from typing import List
 from datetime import datetime
+from api.cache import publish_business_change
+from api.tokens import authorize_business, get_current_session
 
 router = APIRouter(prefix="/services", tags=["Services"])
 
 @router.post("/", response_model=ServiceOut)
-def create_service(data: ServiceCreate, db: Session = Depends(get_db)):
-    # ✅ Ensure business exists
-    business = db.query(models.BusinessProfile).filter_by(business_id=data.business_id).first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
+def create_service(data: ServiceCreate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    # ✅ Ensure business exists and belongs to the caller
+    authorize_business(db, data.business_id, session)
 
     new_service = models.Service(**data.model_dump())
     db.add(new_service)
     db.commit()
     db.refresh(new_service)
+    publish_business_change(new_service.business_id)
     return new_service
 
 @router.get("/{service_id}", response_model=ServiceOut)
@@ -49,24 +50,29 @@ def list_services(
 
 
 @router.patch("/{service_id}", response_model=ServiceOut)
-def update_service(service_id: UUID, payload: ServiceUpdate, db: Session = Depends(get_db)):
+def update_service(service_id: UUID, payload: ServiceUpdate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
     service = db.query(models.Service).filter_by(service_id=service_id).first()
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
+    authorize_business(db, service.business_id, session)
 
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(service, field, value)
 
     db.commit()
     db.refresh(service)
+    publish_business_change(service.business_id)
     return service
 
 @router.delete("/{service_id}", response_model=dict)
-def delete_service(service_id: UUID, db: Session = Depends(get_db)):
+def delete_service(service_id: UUID, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
     service = db.query(models.Service).filter_by(service_id=service_id).first()
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
+    authorize_business(db, service.business_id, session)
 
+    business_id = service.business_id
     db.delete(service)
     db.commit()
+    publish_business_change(business_id)
     return {"detail": "Service deleted"}
\ No newline at end of file
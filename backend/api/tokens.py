@@ -0,0 +1,152 @@
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import secrets
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.orm import Session
+from db.models import BusinessProfile
+from api.cache import cache
+
+# --- 🚀 SYSTEM DESIGN: STATELESS SESSION TOKENS ---
+# Login hands out two HMAC-SHA256 signed tokens sharing one session id (sid):
+#   access  -> short-lived, sent on every request, checked without the DB
+#   refresh -> long-lived, single use: /auth/refresh ends its session and hands
+#              back a new pair (rotation), so a leaked refresh token dies on use
+# Verifying is one HMAC over a few hundred bytes plus a key lookup in the shared
+# revocation store (logout): no query and no bcrypt.
+# TOKEN_SECRET must be the same on every worker, so the app refuses to start
+# without it. TOKEN_ALLOW_RANDOM_SECRET=true (local development, tests) signs
+# with a random per-process key instead: tokens then only work on that process.
+def load_token_secret() -> str:
+    secret = os.getenv("TOKEN_SECRET")
+    if secret:
+        return secret
+    if os.getenv("TOKEN_ALLOW_RANDOM_SECRET", "false").lower() == "true":
+        return secrets.token_urlsafe(32)
+    raise RuntimeError("TOKEN_SECRET is not set. Use the same value on every worker (or TOKEN_ALLOW_RANDOM_SECRET=true for local development).")
+
+
+TOKEN_SECRET = load_token_secret()
+ACCESS_TOKEN_TTL_SECONDS = int(os.getenv("ACCESS_TOKEN_TTL_SECONDS", str(15 * 60)))
+REFRESH_TOKEN_TTL_SECONDS = int(os.getenv("REFRESH_TOKEN_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+# Operators allowed to start catalog-wide runs (imports, batch generation, recompute)
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(TOKEN_SECRET.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def is_admin(email: str | None) -> bool:
+    return bool(email) and email.lower() in ADMIN_EMAILS
+
+
+def issue_token(kind: str, user_id, business_id, sid: str, ttl: int, admin: bool = False) -> str:
+    claims = {
+        "typ": kind,
+        "sub": str(user_id),
+        "bid": str(business_id) if business_id else None,
+        "adm": admin,
+        "sid": sid,
+        "exp": int(time.time()) + ttl,
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}"
+
+
+def decode_token(token: str, kind: str) -> dict:
+    """Check signature, type, expiry and revocation; returns the claims."""
+    payload, _, signature = token.partition(".")
+    try:
+        if not signature or not hmac.compare_digest(signature.encode("ascii"), _sign(payload).encode("ascii")):
+            raise InvalidToken("Invalid token")
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        # Not ASCII / not base64 / not JSON
+        raise InvalidToken("Invalid token")
+    if claims.get("typ") != kind:
+        raise InvalidToken("Wrong token type")
+    if claims.get("exp", 0) <= time.time():
+        raise InvalidToken("Token expired")
+    if is_revoked(claims.get("sid")):
+        raise InvalidToken("Session ended")
+    return claims
+
+
+def issue_token_pair(user_id, business_id, admin: bool = False) -> dict:
+    sid = secrets.token_urlsafe(16)
+    return {
+        "access_token": issue_token("access", user_id, business_id, sid, ACCESS_TOKEN_TTL_SECONDS, admin),
+        "refresh_token": issue_token("refresh", user_id, business_id, sid, REFRESH_TOKEN_TTL_SECONDS, admin),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL_SECONDS,
+    }
+
+
+# -------------------------
+# REVOCATION (logout)
+# -------------------------
+# Ended session ids live in the shared cache backend, so a logout on one worker
+# is seen by every worker. "revoked:" keys are pinned there (api/cache.py): never
+# evicted, dropped once the session's refresh token would have expired anyway.
+def revoke_session(claims: dict) -> bool:
+    """End the session; False if it had already been ended (add() is atomic across workers)."""
+    expires_at = claims["exp"] if claims["typ"] == "refresh" else time.time() + REFRESH_TOKEN_TTL_SECONDS
+    return cache.backend.add(f"revoked:{claims['sid']}", True, expires_at)
+
+
+def is_revoked(sid) -> bool:
+    entry = cache.backend.get(f"revoked:{sid}")
+    return entry is not None and entry[1] > time.time()
+
+
+# -------------------------
+# DEPENDENCIES
+# -------------------------
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+# Sync on purpose: the revocation lookup may read SQLite, so it runs on the threadpool
+def get_current_session(credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)) -> dict:
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return decode_token(credentials.credentials, "access")
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+def require_admin(session: dict = Depends(get_current_session)) -> dict:
+    if not session.get("adm"):
+        raise HTTPException(status_code=403, detail="Admins only")
+    return session
+
+
+# -------------------------
+# OWNERSHIP
+# -------------------------
+# Write routes act on one business: the session's user must own it. Looked up
+# rather than read from the "bid" claim, which only names the user's first business.
+def authorize_business(db: Session, business_id, session: dict) -> BusinessProfile:
+    business = db.query(BusinessProfile).filter_by(business_id=business_id).first()
+    if not business:
+        raise HTTPException(status_code=404, detail="Business not found")
+    if str(business.owner_id) != session["sub"]:
+        raise HTTPException(status_code=403, detail="Not allowed for this business")
+    return business
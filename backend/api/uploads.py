@@ -0,0 +1,142 @@
+import os
+import hashlib
+import tempfile
+from python_multipart.multipart import MultipartParser, parse_options_header
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+
+# --- 🚀 SYSTEM DESIGN: STREAMING UPLOADS ---
+# The multipart body is parsed as it arrives. File bytes go straight to a temp
+# file inside the upload directory (same filesystem, so the final move is an
+# atomic rename) and the size cap is checked on every chunk. Memory per upload
+# stays at one network chunk, and an oversized upload stops being read the
+# moment it crosses the limit.
+UPLOAD_FORM_OVERHEAD = 64 * 1024  # room for boundaries + small form fields
+MAX_FORM_FIELD_SIZE = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadRejected(Exception):
+    pass
+
+
+class StagedUpload:
+    def __init__(self, filename: str, temp_path: str):
+        self.filename = filename
+        self.temp_path = temp_path
+        self.size = 0
+        self.sha256 = None
+
+    def discard(self):
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+    def commit(self, final_path: str):
+        # Atomic on POSIX: readers see the old name missing or the complete file, never a partial one
+        os.replace(self.temp_path, final_path)
+
+
+async def receive_upload(request: Request, upload_dir: str, max_bytes: int, file_field: str = "file", check_file=None):
+    """Stream a multipart request; returns (form fields, StagedUpload or None). The caller commits or discards."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + UPLOAD_FORM_OVERHEAD:
+        raise UploadTooLarge()
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected("Expected a multipart/form-data upload")
+
+    fields = {}
+    staged = None
+    state = {"name": None, "filename": None, "data": bytearray(), "header": b"", "value": b"", "disposition": b"", "to_file": False}
+    pending = []
+    temp = None
+    hasher = hashlib.sha256()
+
+    def on_part_begin():
+        state.update(name=None, filename=None, data=bytearray(), disposition=b"", to_file=False)
+
+    def on_header_field(data, start, end):
+        state["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        if state["header"].lower() == b"content-disposition":
+            state["disposition"] = state["value"]
+        state["header"], state["value"] = b"", b""
+
+    def on_headers_finished():
+        nonlocal staged, temp
+        _, options = parse_options_header(state["disposition"])
+        state["name"] = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in options and state["name"] == file_field and staged is None:
+            filename = os.path.basename(options[b"filename"].decode("utf-8", "replace"))
+            if check_file:
+                check_file(filename, fields)
+            temp = tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".upload-", suffix=".part", delete=False)
+            staged = StagedUpload(filename, temp.name)
+            state["to_file"] = True
+
+    def on_part_data(data, start, end):
+        if state["to_file"]:
+            staged.size += end - start
+            if staged.size > max_bytes:
+                raise UploadTooLarge()
+            pending.append(data[start:end])
+        else:
+            if len(state["data"]) + end - start > MAX_FORM_FIELD_SIZE:
+                raise UploadRejected("Form field too large")
+            state["data"] += data[start:end]
+
+    def on_part_end():
+        if not state["to_file"] and state["name"]:
+            fields[state["name"]] = state["data"].decode("utf-8", "replace")
+        state["to_file"] = False
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if pending:
+                # Disk writes happen off the event loop
+                await run_in_threadpool(_write_chunk, temp, hasher, b"".join(pending))
+                pending.clear()
+        parser.finalize()
+        if temp:
+            await run_in_threadpool(_flush_and_close, temp)
+            staged.sha256 = hasher.hexdigest()
+    except Exception:
+        if temp:
+            temp.close()
+            staged.discard()
+        raise
+
+    return fields, staged
+
+
+def _write_chunk(f, hasher, data: bytes):
+    # Hash while writing, so content addressing costs no extra pass over the file
+    hasher.update(data)
+    f.write(data)
+
+
+def _flush_and_close(f):
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
@@ -1,49 +1,182 @@
+import os
 import uuid
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from psycopg2 import errorcodes
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from db.database import get_db
+from db.database import get_db, SessionLocal
 from db import models
 from db.models import User
-from schemas.users import UserCreate, UserOut
-from api.security import get_password_hash 
+from schemas.users import UserCreate, UserOut, UserImportRequest
+from schemas.jobs import JobOut
+from api.security import hash_password_async, get_password_hash, PASSWORD_HASH_WORKERS
+from api.cache import publish_business_change, publish_business_changes
+from api.jobs import enqueue
+from api.tokens import require_admin
 
 router = APIRouter()
 
+# --- 🚀 SYSTEM DESIGN: BULK USER IMPORT ---
+# Onboarding runs in batches: passwords of a batch are hashed in parallel on a
+# pool of its own (logins keep the shared one), then users and their businesses
+# go in with one multi-row INSERT each and one commit per batch. Emails that
+# already exist are skipped by ON CONFLICT, not looked up first.
+USER_IMPORT_BATCH_SIZE = int(os.getenv("USER_IMPORT_BATCH_SIZE", "500"))
+USER_IMPORT_MAX_USERS = int(os.getenv("USER_IMPORT_MAX_USERS", "10000"))
+
+def is_duplicate_email(error: IntegrityError) -> bool:
+    diag = getattr(error.orig, "diag", None)
+    return getattr(error.orig, "pgcode", None) == errorcodes.UNIQUE_VIOLATION and "email" in (getattr(diag, "constraint_name", None) or "")
+
 @router.post("/", response_model=UserOut)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user.email).first()
-    if existing_user:
-        raise HTTPException(status_code=409, detail="User already exists")
+async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+    # bcrypt runs on the hashing pool (429 when saturated), the DB work on the request threadpool
+    password_hash = await hash_password_async(user.password_hash)
+    return await run_in_threadpool(insert_user, db, user, password_hash)
 
+def insert_user(db: Session, user: UserCreate, password_hash: str) -> UserOut:
     new_user = User(
         user_id=uuid.uuid4(),
         email=user.email,
         name=user.name,
         auth_provider=user.auth_provider,
-        password_hash=get_password_hash(user.password_hash), # Security fix
-        created_at=datetime.utcnow(),
+        password_hash=password_hash, # Security fix
+        created_at=datetime.now(timezone.utc),
+        last_login=None,
         is_active=True
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
     # Auto-create business
     auto_business = models.BusinessProfile(
+        business_id=uuid.uuid4(),
         owner_id=new_user.user_id,
         name=f"{(new_user.name or 'New')} Business",
         description="Auto-created on signup",
         published=True
     )
-    db.add(auto_business)
-    db.commit()
+    # Every value is known up front: no refresh round trip after the commit
+    created = UserOut.model_validate(new_user, from_attributes=True)
+
+    # ✅ One transaction; the unique index on email decides (no racy pre-check)
+    db.add_all([new_user, auto_business])
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if is_duplicate_email(e):
+            raise HTTPException(status_code=409, detail="User already exists")
+        raise
+    publish_business_change(auto_business.business_id)
 
-    return new_user
+    return created
 
 @router.get("/by-email/{email}", response_model=UserOut)
 def get_user_by_email(email: str, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == email).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
\ No newline at end of file
+    return user
+
+# -------------------------
+# BULK IMPORT
+# -------------------------
+@router.post("/import", response_model=JobOut, status_code=202)
+def import_users_endpoint(data: UserImportRequest, session: dict = Depends(require_admin)):
+    if len(data.users) > USER_IMPORT_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {USER_IMPORT_MAX_USERS} users per import")
+    # Runs in the background (poll /jobs/{job_id}), one import at a time; the result holds the counts
+    return enqueue("user_import", import_users_job, [item.model_dump() for item in data.users], exclusive=True)
+
+def import_users_job(records: list) -> dict:
+    db = SessionLocal()
+    try:
+        return import_users(db, records, progress=None)
+    finally:
+        db.close()
+
+def import_users(db: Session, records: list, batch_size: int = USER_IMPORT_BATCH_SIZE, workers: int = PASSWORD_HASH_WORKERS, progress=print) -> dict:
+    """Create users (and one business each) from dicts shaped like UserImportItem; existing emails are skipped."""
+    started = time.perf_counter()
+    stats = {"total": len(records), "created": 0, "skipped_existing": 0, "skipped_duplicate": 0}
+
+    # 1. Same email twice in the input (case-insensitive, like the CITEXT column): keep the first
+    unique, seen = [], set()
+    for record in records:
+        key = record["email"].lower()
+        if key in seen:
+            stats["skipped_duplicate"] += 1
+            continue
+        seen.add(key)
+        unique.append(record)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt-import") as pool:
+        for start in range(0, len(unique), batch_size):
+            batch = unique[start:start + batch_size]
+            # Don't spend bcrypt time on accounts that are already there (ON CONFLICT still guards races)
+            existing = {
+                email.lower() for (email,) in
+                db.query(User.email).filter(User.email.in_([record["email"] for record in batch]))
+            }
+            batch = [record for record in batch if record["email"].lower() not in existing]
+            stats["skipped_existing"] += len(existing)
+            if not batch:
+                continue
+
+            # 2. Hash the batch in parallel (bcrypt releases the GIL)
+            hashes = list(pool.map(
+                lambda password: get_password_hash(password) if password else None,
+                [record.get("password") for record in batch],
+            ))
+
+            # 3. Users: one INSERT, existing emails skipped by the unique index
+            now = datetime.now(timezone.utc)
+            user_rows = [
+                {
+                    "user_id": uuid.uuid4(),
+                    "email": record["email"],
+                    "name": record.get("name"),
+                    "auth_provider": record.get("auth_provider") or "password",
+                    "password_hash": password_hash,
+                    "created_at": now,
+                    "is_active": True,
+                }
+                for record, password_hash in zip(batch, hashes)
+            ]
+            inserted = db.execute(
+                pg_insert(User).values(user_rows).on_conflict_do_nothing(index_elements=[User.email]).returning(User.user_id)
+            ).scalars().all()
+            created_ids = set(inserted)
+
+            # 4. Businesses for the users we just created, same transaction
+            business_rows = [
+                {
+                    "business_id": uuid.uuid4(),
+                    "owner_id": row["user_id"],
+                    "name": record.get("business_name") or f"{(record.get('name') or 'New')} Business",
+                    "business_type": record.get("business_type"),
+                    "address": record.get("address"),
+                    "description": "Imported",
+                    "published": True,
+                    "version": 1,
+                    "created_at": now,
+                }
+                for record, row in zip(batch, user_rows)
+                if row["user_id"] in created_ids
+            ]
+            if business_rows:
+                db.execute(pg_insert(models.BusinessProfile).values(business_rows))
+            db.commit()
+
+            # One invalidation for the whole batch
+            publish_business_changes(row["business_id"] for row in business_rows)
+            stats["created"] += len(created_ids)
+            stats["skipped_existing"] += len(batch) - len(created_ids)
+            if progress:
+                progress(f"{min(start + batch_size, len(unique))}/{len(unique)} users")
+
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
@@ -1,12 +1,16 @@
 import os
 import json
-import requests
-from bs4 import BeautifulSoup
+import time
+import base64
+import asyncio
+import contextlib
 from pydantic import BaseModel, HttpUrl
-import google.generativeai as genai
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, insert, select, tuple_
 from sqlalchemy.orm import Session
-from db.database import get_db
+from db.database import get_db, SessionLocal
 from db import models
 from schemas.visibility import (
     VisibilityCheckRequestCreate,
@@ -14,14 +18,20 @@ from schemas.visibility import (
     VisibilityCheckResultCreate,
     VisibilityCheckResultOut,
     VisibilitySuggestionCreate,
-    VisibilitySuggestionOut
+    VisibilitySuggestionOut,
+    VisibilityRunOut,
+    VisibilityScorePage,
+    VisibilityLeaderboardOut
 )
-from uuid import UUID
+from schemas.jobs import JobOut
+from uuid import UUID, uuid4
 from typing import List
 from datetime import datetime
-
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from api import llm
+from api.jobs import enqueue
+from api.tokens import authorize_business, get_current_session, require_admin
+from api.fetch import fetch_page_cached, HostThrottle
+from api.visibility_score import score_features, score_sql, FEATURE_COLUMNS
 
 router = APIRouter(prefix="/visibility", tags=["Visibility"])
 
@@ -35,10 +45,8 @@ def ensure_string(value):
 # STANDARD CRUD (Internal Use)
 # -------------------------
 @router.post("/check", response_model=VisibilityCheckRequestOut)
-def create_check_request(data: VisibilityCheckRequestCreate, db: Session = Depends(get_db)):
-    business = db.query(models.BusinessProfile).filter_by(business_id=data.business_id).first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
+def create_check_request(data: VisibilityCheckRequestCreate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    authorize_business(db, data.business_id, session)
     new_check = models.VisibilityCheckRequest(**data.model_dump())
     db.add(new_check)
     db.commit()
@@ -69,10 +77,8 @@ def get_check_request(check_id: UUID, db: Session = Depends(get_db)):
     return check
 
 @router.post("/result", response_model=VisibilityCheckResultOut)
-def create_result(data: VisibilityCheckResultCreate, db: Session = Depends(get_db)):
-    business = db.query(models.BusinessProfile).filter_by(business_id=data.business_id).first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
+def create_result(data: VisibilityCheckResultCreate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    authorize_business(db, data.business_id, session)
     new_result = models.VisibilityCheckResult(**data.model_dump())
     db.add(new_result)
     db.commit()
@@ -103,10 +109,8 @@ def get_result(result_id: UUID, db: Session = Depends(get_db)):
     return result
 
 @router.post("/suggestion", response_model=VisibilitySuggestionOut)
-def create_suggestion(data: VisibilitySuggestionCreate, db: Session = Depends(get_db)):
-    business = db.query(models.BusinessProfile).filter_by(business_id=data.business_id).first()
-    if not business:
-        raise HTTPException(status_code=404, detail="Business not found")
+def create_suggestion(data: VisibilitySuggestionCreate, db: Session = Depends(get_db), session: dict = Depends(get_current_session)):
+    authorize_business(db, data.business_id, session)
     new_suggestion = models.VisibilitySuggestion(**data.model_dump())
     db.add(new_suggestion)
     db.commit()
@@ -139,169 +143,376 @@ def get_suggestion(suggestion_id: UUID, db: Session = Depends(get_db)):
 # -------------------------
 # ✅ STRICT VISIBILITY CHECKER (INTERNAL)
 # -------------------------
-@router.post("/run", response_model=VisibilityCheckResultOut)
-def run_visibility(business_id: UUID = Query(...), db: Session = Depends(get_db)):
-    # 1. Fetch Data
-    business = db.query(models.BusinessProfile).filter_by(business_id=business_id).first()
-    if not business:
+@router.post("/run", response_model=VisibilityRunOut)
+def run_visibility(
+    business_id: UUID = Query(...),
+    enrich: bool = Query(True, description="Also queue LLM commentary for this result"),
+    db: Session = Depends(get_db),
+    session: dict = Depends(get_current_session)
+):
+    authorize_business(db, business_id, session)
+    # The score is rule-based and instant; LLM commentary is attached later by a job (poll /jobs/{job_id})
+    try:
+        result = run_visibility_check(business_id, db)
+    except ValueError:
         raise HTTPException(status_code=404, detail="Business not found")
 
-    services = db.query(models.Service).filter_by(business_id=business_id).all()
-    media_count = db.query(models.MediaAsset).filter_by(business_id=business_id).count()
-    op_info = db.query(models.OperationalInfo).filter_by(business_id=business_id).first()
-    jsonld_exists = db.query(models.JsonLDFeed).filter_by(business_id=business_id).count() > 0
+    enrichment = None
+    if enrich:
+        try:
+            enrichment = enqueue("visibility_enrichment", enrich_visibility_job, result.result_id)
+        except HTTPException:
+            # Queue is full: the score is saved, the commentary is simply skipped
+            pass
+    return {
+        "result": VisibilityCheckResultOut.model_validate(result, from_attributes=True),
+        "enrichment": enrichment,
+    }
+
+# --- Keyset cursor: opaque base64 of (visibility_score, business_id) ---
+def encode_score_cursor(row) -> str:
+    raw = json.dumps([row.visibility_score, str(row.business_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_score_cursor(cursor: str) -> tuple:
+    try:
+        score, business_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(score), UUID(business_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/scores", response_model=VisibilityScorePage)
+def list_visibility_scores(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = Query(None),
+    db: Session = Depends(get_db)
+):
+    # Live scores for dashboards, highest first: scored, sorted and paged by the database
+    features = visibility_features_query(db).subquery()
+    score = score_sql({column: features.c[column] for column in FEATURE_COLUMNS})
+    query = db.query(features.c.business_id, features.c.name, score.label("visibility_score"))
+    if cursor:
+        query = query.filter(tuple_(score, features.c.business_id) < decode_score_cursor(cursor))
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(score.desc(), features.c.business_id.desc()).limit(limit + 1).all()
+    items = rows[:limit]
+    return {
+        "items": [row._asdict() for row in items],
+        "next_cursor": encode_score_cursor(items[-1]) if len(rows) > limit else None,
+    }
+
+def load_visibility_features(db: Session, business_ids=None) -> List[dict]:
+    return [row._asdict() for row in visibility_features_query(db, business_ids)]
+
+def visibility_features_query(db: Session, business_ids=None):
+    # Per-table counts are aggregated once with GROUP BY and outer-joined onto the profiles
+    def counts(model):
+        query = db.query(model.business_id, func.count().label("n"))
+        if business_ids is not None:
+            query = query.filter(model.business_id.in_(business_ids))
+        return query.group_by(model.business_id).subquery()
+
+    services = counts(models.Service)
+    media = counts(models.MediaAsset)
+    jsonld = counts(models.JsonLDFeed)
+    hours = counts(models.OperationalInfo)
+
+    query = (
+        db.query(
+            models.BusinessProfile.business_id,
+            models.BusinessProfile.name,
+            func.coalesce(jsonld.c.n, 0).label("jsonld_count"),
+            func.coalesce(services.c.n, 0).label("service_count"),
+            func.coalesce(media.c.n, 0).label("media_count"),
+            func.length(func.coalesce(models.BusinessProfile.description, "")).label("description_length"),
+            func.coalesce(hours.c.n, 0).label("hours_count"),
+            func.length(func.coalesce(models.BusinessProfile.quote_slogan, "")).label("slogan_length"),
+        )
+        .outerjoin(services, services.c.business_id == models.BusinessProfile.business_id)
+        .outerjoin(media, media.c.business_id == models.BusinessProfile.business_id)
+        .outerjoin(jsonld, jsonld.c.business_id == models.BusinessProfile.business_id)
+        .outerjoin(hours, hours.c.business_id == models.BusinessProfile.business_id)
+    )
+    if business_ids is not None:
+        query = query.filter(models.BusinessProfile.business_id.in_(business_ids))
+    return query
+
+def run_visibility_check(business_id: UUID, db: Session) -> models.VisibilityCheckResult:
+    # 1. Fetch Data
+    rows = load_visibility_features(db, [business_id])
+    if not rows:
+        raise ValueError("Business not found")
+    features = rows[0]
 
     # 2. Log request
     check = models.VisibilityCheckRequest(
         business_id=business_id,
-        check_type="visibility", 
-        input_data=f"Services: {len(services)}, Media: {media_count}, JSON-LD: {jsonld_exists}",
+        check_type="visibility",
+        input_data=f"Services: {features['service_count']}, Media: {features['media_count']}, JSON-LD: {features['jsonld_count'] > 0}",
         requested_at=datetime.utcnow()
     )
     db.add(check)
+    db.flush()
+
+    # 3. Score locally (no network)
+    scored = score_features(features)
+    result = models.VisibilityCheckResult(
+        request_id=check.request_id,
+        business_id=business_id,
+        visibility_score=scored["score"],
+        issues_found="; ".join(scored["issues"]),
+        recommendations="; ".join(scored["recommendations"]),
+        completed_at=datetime.utcnow()
+    )
+    db.add(result)
     db.commit()
+    db.refresh(result)
+    return result
+
+def enrich_visibility_job(result_id: UUID) -> dict:
+    db = SessionLocal()
+    try:
+        result = enrich_visibility_result(result_id, db)
+        return VisibilityCheckResultOut.model_validate(result, from_attributes=True).model_dump(mode="json")
+    finally:
+        db.close()
 
-    # 3. Construct Prompt
+def enrich_visibility_result(result_id: UUID, db: Session) -> models.VisibilityCheckResult:
+    result = db.query(models.VisibilityCheckResult).filter_by(result_id=result_id).first()
+    if not result:
+        raise ValueError("Result not found")
+    business = db.query(models.BusinessProfile).filter_by(business_id=result.business_id).first()
+    features = load_visibility_features(db, [result.business_id])[0]
+    services = db.query(models.Service.name).filter_by(business_id=result.business_id).all()
+
+    # 1. Construct Prompt (the score is fixed; the model only explains it)
     s_names = [s.name for s in services if s.name]
     services_str = ", ".join(s_names) if s_names else "None"
-    
+
     prompt = f"""
-    Act as a Strict SEO Auditor. Grade this business for visibility to AI Agents and Humans.
+    Act as a Strict SEO Auditor. Explain this business's visibility to AI Agents and Humans.
     BE HARSH.
-    
+
     DATA:
     - Name: {business.name}
     - Description: {business.description or "Missing"}
     - Slogan: {business.quote_slogan or "Missing"}
-    - Service Count: {len(services)} ({services_str})
-    - Images: {media_count}
-    - Hours Listed: {'Yes' if op_info else 'No'}
-    - JSON-LD Schema: {'Yes' if jsonld_exists else 'NO'}
-
-    SCORING RULES:
-    - Base Score = 0.
-    - JSON-LD Missing? Max possible score is 40.
-    - No Services? Deduct 20.
-    - No Images? Deduct 20.
-    - Description < 50 chars? Deduct 15.
-    - Perfect Profile = 100.
+    - Service Count: {features['service_count']} ({services_str})
+    - Images: {features['media_count']}
+    - Hours Listed: {'Yes' if features['hours_count'] else 'No'}
+    - JSON-LD Schema: {'Yes' if features['jsonld_count'] else 'NO'}
+
+    The visibility score has already been computed: {float(result.visibility_score):g}/100.
+    Known issues: {result.issues_found or "None"}
+    Do NOT re-score. Explain the score and suggest fixes.
 
     Return valid raw JSON (no markdown) with keys:
-    1. "score": Number (0-100).
-    2. "bot_analysis": String (Bot readability).
-    3. "human_analysis": String (Human appeal).
-    4. "issues": List[String] (Failures).
-    5. "recommendations": List[String] (Fixes).
+    1. "bot_analysis": String (Bot readability).
+    2. "human_analysis": String (Human appeal).
+    3. "issues": List[String] (Failures).
+    4. "recommendations": List[String] (Fixes).
     """
 
     try:
-        # ✅ Using Gemini 2.5 Flash as requested
-        model = genai.GenerativeModel('models/gemini-2.5-flash')
-        
-        response = model.generate_content(prompt)
-        
+        response_text = llm.generate('models/gemini-2.5-flash', prompt)
+
         # Robust Parsing
-        clean_text = response.text.replace("```json", "").replace("```", "").strip()
-        
+        clean_text = response_text.replace("```json", "").replace("```", "").strip()
+
         if not clean_text:
             raise ValueError("Empty AI response received")
 
         ai_data = json.loads(clean_text)
+    except Exception as e:
+        print(f"❌ AI VISIBILITY COMMENTARY FAILED: {str(e)}")
+        llm.forget('models/gemini-2.5-flash', prompt)
+        # The rule-based result stays as it is
+        raise RuntimeError(f"AI Error: {str(e)}")
+
+    bot_txt = ai_data.get("bot_analysis", "Unknown")
+    human_txt = ai_data.get("human_analysis", "Unknown")
+    issues_str = ensure_string(ai_data.get("issues", []))
+    recs_str = ensure_string(ai_data.get("recommendations", []))
+
+    if issues_str:
+        result.issues_found = "; ".join(filter(None, [result.issues_found, issues_str]))
+    result.recommendations = f"[BOTS]: {bot_txt} || [HUMANS]: {human_txt} || ACTIONS: {recs_str}"
+    result.output_snapshot = clean_text[:500]
+    db.commit()
+    db.refresh(result)
+    return result
+
 
-        score = float(ai_data.get("score", 0))
-        bot_txt = ai_data.get("bot_analysis", "Unknown")
-        human_txt = ai_data.get("human_analysis", "Unknown")
-        issues_str = ensure_string(ai_data.get("issues", []))
-        recs_str = ensure_string(ai_data.get("recommendations", []))
-        
-        full_recommendations = f"[BOTS]: {bot_txt} || [HUMANS]: {human_txt} || ACTIONS: {recs_str}"
-
-        result = models.VisibilityCheckResult(
-            request_id=check.request_id,
-            business_id=business_id,
-            visibility_score=score,
-            issues_found=issues_str,
-            recommendations=full_recommendations, 
-            output_snapshot=clean_text[:500],
-            completed_at=datetime.utcnow()
+# -------------------------
+# FLEET-WIDE RECOMPUTE + LEADERBOARD
+# -------------------------
+VISIBILITY_RECOMPUTE_CHUNK_SIZE = int(os.getenv("VISIBILITY_RECOMPUTE_CHUNK_SIZE", "1000"))
+# Transaction-level advisory lock: runs from any worker or script take turns
+VISIBILITY_RECOMPUTE_LOCK_KEY = 7_301_001
+
+@router.post("/recompute", response_model=JobOut, status_code=202)
+def recompute_visibility_endpoint(session: dict = Depends(require_admin)):
+    # Scores every business and rebuilds the leaderboard (poll /jobs/{job_id}), one run at a time
+    return enqueue("visibility_recompute", recompute_visibility_job, exclusive=True)
+
+@router.get("/leaderboard", response_model=List[VisibilityLeaderboardOut])
+def get_leaderboard(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    # Served straight from the precomputed table (indexed by rank)
+    rows = (
+        db.query(
+            models.VisibilityLeaderboard.rank,
+            models.VisibilityLeaderboard.business_id,
+            models.BusinessProfile.name,
+            models.BusinessProfile.business_type,
+            models.VisibilityLeaderboard.visibility_score,
+            models.VisibilityLeaderboard.computed_at,
         )
+        .join(models.BusinessProfile, models.BusinessProfile.business_id == models.VisibilityLeaderboard.business_id)
+        .order_by(models.VisibilityLeaderboard.rank, models.BusinessProfile.name)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return [row._asdict() for row in rows]
 
-        db.add(result)
-        db.commit()
-        db.refresh(result)
-        return result
+def recompute_visibility_job() -> dict:
+    db = SessionLocal()
+    try:
+        return recompute_visibility(db, progress=None)
+    finally:
+        db.close()
+
+def recompute_visibility(db: Session, chunk_size: int = VISIBILITY_RECOMPUTE_CHUNK_SIZE, progress=print) -> dict:
+    started = time.perf_counter()
+
+    # 0. One recompute at a time: a concurrent one waits here (released at commit/rollback),
+    #    then scores the data as it is after ours, instead of colliding on the leaderboard swap
+    db.execute(select(func.pg_advisory_xact_lock(VISIBILITY_RECOMPUTE_LOCK_KEY)))
+
+    # 1. All counts in one pass (grouped subqueries)
+    rows = load_visibility_features(db)
+
+    # 2. One request + one result row per business, bulk-inserted in chunks
+    now = datetime.utcnow()
+    ranked = []
+    for start in range(0, len(rows), chunk_size):
+        requests, results = [], []
+        for row in rows[start:start + chunk_size]:
+            # One scorer pass per row: the score plus its issues and recommendations
+            scored = score_features(row)
+            score = scored["score"]
+            request_id, result_id = uuid4(), uuid4()
+            requests.append({
+                "request_id": request_id,
+                "business_id": row["business_id"],
+                "check_type": "visibility",
+                "input_data": f"Fleet recompute. Services: {row['service_count']}, Media: {row['media_count']}, JSON-LD: {row['jsonld_count'] > 0}",
+                "requested_at": now,
+            })
+            results.append({
+                "result_id": result_id,
+                "request_id": request_id,
+                "business_id": row["business_id"],
+                "visibility_score": score,
+                "issues_found": "; ".join(scored["issues"]),
+                "recommendations": "; ".join(scored["recommendations"]),
+                "output_snapshot": None,
+                "completed_at": now,
+            })
+            ranked.append((score, row["name"] or "", row["business_id"], result_id))
+        db.execute(insert(models.VisibilityCheckRequest), requests)
+        db.execute(insert(models.VisibilityCheckResult), results)
+        if progress:
+            progress(f"[visibility] {start + len(results)}/{len(rows)} businesses scored")
+
+    # 3. Swap in the new leaderboard in the same transaction (readers see old or new, never half)
+    ranked.sort(key=lambda r: (-r[0], r[1]))
+    leaderboard, rank, previous = [], 0, None
+    for position, (score, _, business_id, result_id) in enumerate(ranked, start=1):
+        if score != previous:
+            rank, previous = position, score
+        leaderboard.append({
+            "business_id": business_id,
+            "result_id": result_id,
+            "rank": rank,
+            "visibility_score": score,
+            "computed_at": now,
+        })
+    db.query(models.VisibilityLeaderboard).delete(synchronize_session=False)
+    for start in range(0, len(leaderboard), chunk_size):
+        db.execute(insert(models.VisibilityLeaderboard), leaderboard[start:start + chunk_size])
+    db.commit()
 
-    except Exception as e:
-        print(f"❌ AI VISIBILITY CHECK FAILED: {str(e)}")
-        
-        # ✅ Transparent Fallback
-        error_msg = str(e)
-        strict_score = 0
-        issues = [f"AI Error: {error_msg}"]
-        recs = ["Check API Quota", "Verify Data"]
-
-        if not jsonld_exists:
-            issues.append("CRITICAL: Missing JSON-LD")
-            recs.append("Generate JSON-LD immediately")
-        else:
-            strict_score += 30
-
-        if len(services) == 0:
-            issues.append("No services listed")
-        else:
-            strict_score += 20
-        
-        if media_count < 3:
-            issues.append("Not enough images (Need 3+)")
-        else:
-            strict_score += 20
-        
-        if not business.description or len(business.description) < 50:
-            issues.append("Description too short or missing")
-        else:
-            strict_score += 10
-
-        final_score = min(strict_score, 50) 
-
-        result = models.VisibilityCheckResult(
-            request_id=check.request_id,
-            business_id=business_id,
-            visibility_score=final_score,
-            issues_found="; ".join(issues),
-            recommendations="; ".join(recs),
-            completed_at=datetime.utcnow()
-        )
-        db.add(result)
-        db.commit()
-        return result
+    seconds = round(time.perf_counter() - started, 3)
+    return {"businesses": len(rows), "results_written": len(rows), "seconds": seconds}
 
 
 # -------------------------
 # ✅ NEW: EXTERNAL (PUBLIC) AUDIT
 # -------------------------
+# Batch audits: at most EXTERNAL_BATCH_CONCURRENCY sites in flight, one at a
+# time per host (see api/fetch.py), results streamed as NDJSON as they finish
+EXTERNAL_BATCH_MAX_URLS = int(os.getenv("EXTERNAL_BATCH_MAX_URLS", "100"))
+EXTERNAL_BATCH_CONCURRENCY = int(os.getenv("EXTERNAL_BATCH_CONCURRENCY", "8"))
+
 class ExternalAuditRequest(BaseModel):
     url: HttpUrl
 
+class ExternalBatchAuditRequest(BaseModel):
+    urls: List[HttpUrl]
+
 @router.post("/external")
-def audit_external_site(data: ExternalAuditRequest):
-    # 1. Scrape the website (Basic)
+async def audit_external_site(data: ExternalAuditRequest):
+    return await audit_url(str(data.url))
+
+# Up to EXTERNAL_BATCH_MAX_URLS fetches and LLM calls per request: signed-in users only
+@router.post("/external/batch")
+async def audit_external_sites(data: ExternalBatchAuditRequest, session: dict = Depends(get_current_session)):
+    # Identical URLs are audited once
+    urls = list(dict.fromkeys(str(url) for url in data.urls))
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URLs given")
+    if len(urls) > EXTERNAL_BATCH_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {EXTERNAL_BATCH_MAX_URLS} URLs per batch")
+    return StreamingResponse(stream_audits(urls), media_type="application/x-ndjson")
+
+async def stream_audits(urls: List[str]):
+    # A slot is held only while fetching or analysing, never while queued behind a
+    # host's politeness delay, so a busy host can't starve the others
+    slots = asyncio.Semaphore(EXTERNAL_BATCH_CONCURRENCY)
+    throttle = HostThrottle()
+
+    async def audit_one(url):
+        return {"url": url, **await audit_url(url, throttle, slots)}
+
+    tasks = [asyncio.create_task(audit_one(url)) for url in urls]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield json.dumps(await finished) + "\n"
+    finally:
+        # Client went away: stop the audits still in flight
+        for task in tasks:
+            task.cancel()
+
+async def audit_url(url: str, throttle: HostThrottle | None = None, slots: asyncio.Semaphore | None = None) -> dict:
+    # 1. Scrape the website: async, pooled, size-capped, cached by URL (ETag / Last-Modified)
     try:
-        headers = {'User-Agent': 'AiVault-Auditor/1.0'}
-        response = requests.get(str(data.url), headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
+        fetched = await fetch_page_cached(url, throttle, slots)
+        page = fetched["page"]
+
         # Extract Key Data
-        title = soup.title.string if soup.title else "Missing Title"
-        desc_tag = soup.find("meta", attrs={"name": "description"})
-        description = desc_tag["content"] if desc_tag else "Missing Description"
-        
-        h1_count = len(soup.find_all('h1'))
-        img_count = len(soup.find_all('img'))
-        json_ld = soup.find('script', type='application/ld+json')
-        
-        raw_text = soup.get_text(separator=' ', strip=True)[:3000] 
+        title = page["title"].strip() if page["title"] else "Missing Title"
+        description = page["description"] if page["description"] is not None else "Missing Description"
+
+        h1_count = page["h1_count"]
+        img_count = page["img_count"]
+        json_ld = len(page["json_ld"]) > 0
+
+        raw_text = page["text"]
 
     except Exception as e:
         return {
@@ -316,7 +527,7 @@ def audit_external_site(data: ExternalAuditRequest):
     prompt = f"""
     Act as an SEO & AI Visibility Auditor. Analyze this raw website data:
     
-    URL: {data.url}
+    URL: {url}
     Title: {title}
     Description: {description}
     H1 Tags: {h1_count}
@@ -339,10 +550,11 @@ def audit_external_site(data: ExternalAuditRequest):
     """
 
     try:
-        model = genai.GenerativeModel('models/gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        clean_text = response.text.replace("```json", "").replace("```", "").strip()
+        async with slots or contextlib.nullcontext():
+            response_text = await run_in_threadpool(llm.generate, 'models/gemini-2.5-flash', prompt)
+        clean_text = response_text.replace("```json", "").replace("```", "").strip()
         result = json.loads(clean_text)
         return result
     except Exception as e:
+        llm.forget('models/gemini-2.5-flash', prompt)
         return {"error": "AI Analysis Failed", "details": str(e)}  
\ No newline at end of file
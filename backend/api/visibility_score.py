@@ -0,0 +1,48 @@
+from sqlalchemy import case, func
+
+# --- 🚀 SYSTEM DESIGN: DETERMINISTIC VISIBILITY SCORE ---
+# The score is pure arithmetic over a handful of profile counts, so it is
+# instant and reproducible. Every rule is "column >= threshold -> points",
+# which works the same on one business (plain numbers) or inside the database
+# (one CASE expression), so dashboards can sort and page the fleet by score.
+# The LLM only adds commentary on top (see api/visibility.py).
+
+# (feature column, threshold, points, issue when failed, recommendation when failed)
+VISIBILITY_RULES = [
+    ("jsonld_count", 1, 30, "CRITICAL: Missing JSON-LD", "Generate JSON-LD immediately"),
+    ("service_count", 1, 20, "No services listed", "Add at least one service with a price"),
+    ("media_count", 3, 20, "Not enough images (Need 3+)", "Upload at least 3 photos"),
+    ("description_length", 50, 10, "Description too short or missing", "Write a description of 50+ characters"),
+    ("hours_count", 1, 10, "Opening hours not listed", "Add your opening hours"),
+    ("slogan_length", 1, 10, "No slogan", "Add a short slogan"),
+]
+
+# Without JSON-LD, bots can't read the profile: the score is capped
+MISSING_JSONLD_MAX_SCORE = 40
+
+FEATURE_COLUMNS = [rule[0] for rule in VISIBILITY_RULES]
+
+
+def score_features(features: dict) -> dict:
+    """Score one business from its feature counts; returns score, issues and recommendations."""
+    score = 0
+    issues, recommendations = [], []
+    for column, threshold, points, issue, recommendation in VISIBILITY_RULES:
+        if (features.get(column) or 0) >= threshold:
+            score += points
+        else:
+            issues.append(issue)
+            recommendations.append(recommendation)
+
+    if (features.get("jsonld_count") or 0) < 1:
+        score = min(score, MISSING_JSONLD_MAX_SCORE)
+    return {"score": score, "issues": issues, "recommendations": recommendations}
+
+
+def score_sql(columns: dict):
+    """The same rules as one SQL expression over {column: column expression}."""
+    total = sum(
+        case((columns[column] >= threshold, points), else_=0)
+        for column, threshold, points, _, _ in VISIBILITY_RULES
+    )
+    return case((columns["jsonld_count"] >= 1, total), else_=func.least(total, MISSING_JSONLD_MAX_SCORE))
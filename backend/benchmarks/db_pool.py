@@ -0,0 +1,83 @@
+"""
+Load test: request threads competing for the connection pool, below and past saturation.
+
+    cd backend && python -m benchmarks.db_pool --pool-size 5 --max-overflow 0 --clients 5,10,40 --hold-ms 50
+
+Each client thread repeatedly checks out a connection, holds it for one
+statement of --hold-ms (pg_sleep) and gives it back, like a request handler.
+While clients <= pool capacity nobody waits. Past it, throughput stays flat at
+capacity / hold time and the excess turns into checkout wait, then into pool
+timeouts (503s in the API) once the wait exceeds --timeout.
+"""
+import time
+import argparse
+import threading
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from db.database import make_engine, pool_stats
+
+
+def run_clients(engine, clients: int, requests_per_client: int, hold_seconds: float) -> dict:
+    engine.pool.metrics.reset()
+    failures = {"timeouts": 0}
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(requests_per_client):
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT pg_sleep(:s)"), {"s": hold_seconds})
+            except PoolTimeout:
+                with lock:
+                    failures["timeouts"] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = pool_stats(engine)
+    completed = clients * requests_per_client - failures["timeouts"]
+    return {
+        "clients": clients,
+        "completed": completed,
+        "timeouts": failures["timeouts"],
+        "throughput": completed / elapsed,
+        "wait_ms_avg": stats["wait_ms_avg"],
+        "wait_ms_max": stats["wait_ms_max"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--max-overflow", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=1.0, help="Pool checkout timeout (seconds)")
+    parser.add_argument("--clients", default="5,10,40", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=20, help="Checkouts per client")
+    parser.add_argument("--hold-ms", type=float, default=50, help="Time each checkout holds its connection")
+    args = parser.parse_args(argv)
+
+    engine = make_engine(pool_size=args.pool_size, max_overflow=args.max_overflow, pool_timeout=args.timeout)
+    capacity = args.pool_size + args.max_overflow
+    print(
+        f"🔌 Pool: {args.pool_size} + {args.max_overflow} overflow, timeout {args.timeout}s, "
+        f"hold {args.hold_ms:.0f} ms -> ceiling {capacity / (args.hold_ms / 1000):.0f} checkouts/s\n"
+    )
+    try:
+        for clients in [int(c) for c in args.clients.split(",")]:
+            r = run_clients(engine, clients, args.requests, args.hold_ms / 1000)
+            print(
+                f"{r['clients']:>4} clients | {r['throughput']:7.1f} checkouts/s | "
+                f"wait avg {r['wait_ms_avg']:8.1f} ms, max {r['wait_ms_max']:8.1f} ms | "
+                f"{r['completed']} ok, {r['timeouts']} timed out"
+            )
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
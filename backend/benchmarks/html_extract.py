@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: the old BeautifulSoup audit path vs the single-pass extractor.
+
+    cd backend && python -m benchmarks.html_extract --sections 2000 --runs 20
+"""
+import time
+import argparse
+import statistics
+from bs4 import BeautifulSoup
+from api.html_extract import extract_html
+
+
+def build_page(sections: int) -> str:
+    body = "".join(
+        f"<section><h2>Service {i}</h2><img src='/img/{i}.jpg' alt='Service {i}'>"
+        f"<p>Book service {i} today &amp; save. Open late, walk-ins welcome.</p>"
+        f"<script>window.track && track({i});</script></section>"
+        for i in range(sections)
+    )
+    return (
+        "<!doctype html><html><head><title>Benchmark Salon</title>"
+        "<meta name='description' content='Haircuts, colouring and styling.'>"
+        "<script type='application/ld+json'>{\"@type\": \"HairSalon\", \"name\": \"Benchmark Salon\"}</script>"
+        f"</head><body><h1>Benchmark Salon</h1>{body}</body></html>"
+    )
+
+
+def beautifulsoup_audit(html: str) -> dict:
+    # Same calls audit_external_site used to make: one parse, then four tree walks
+    soup = BeautifulSoup(html, "html.parser")
+    desc_tag = soup.find("meta", attrs={"name": "description"})
+    return {
+        "title": soup.title.string if soup.title else None,
+        "description": desc_tag["content"] if desc_tag else None,
+        "h1_count": len(soup.find_all("h1")),
+        "img_count": len(soup.find_all("img")),
+        "json_ld": soup.find("script", type="application/ld+json") is not None,
+        "text": soup.get_text(separator=" ", strip=True)[:3000],
+    }
+
+
+def extractor_audit(html: str, backend: str) -> dict:
+    page = extract_html(html, backend)
+    return {
+        "title": page.title,
+        "description": page.description,
+        "h1_count": page.h1_count,
+        "img_count": page.img_count,
+        "json_ld": bool(page.json_ld),
+        "text": page.text,
+    }
+
+
+def timed(fn, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sections", type=int, default=2000, help="Repeated content blocks in the generated page")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    html = build_page(args.sections)
+    print(f"📄 Page size: {len(html) / 1024:.0f} KiB, {args.runs} runs each\n")
+
+    contenders = {
+        "beautifulsoup (html.parser)": lambda: beautifulsoup_audit(html),
+        "extractor (html.parser)": lambda: extractor_audit(html, "html.parser"),
+        "extractor (lxml)": lambda: extractor_audit(html, "lxml"),
+    }
+    baseline = None
+    for name, fn in contenders.items():
+        samples = timed(fn, args.runs)
+        median = statistics.median(samples)
+        baseline = baseline or median
+        print(f"{name:<30} median {median:8.2f} ms   p95 {sorted(samples)[int(len(samples) * 0.95) - 1]:8.2f} ms   x{baseline / median:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Throughput benchmark: the plain StaticFiles mount vs MediaFiles for /uploads.
+
+    cd backend && python -m benchmarks.media_serving --video-mb 50 --runs 5
+
+Both apps run under uvicorn on localhost against the same directory. Measured:
+full video downloads (MB/s), random 1 MiB range reads (seeking) and repeat
+image loads by a client that honours Cache-Control.
+"""
+import os
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+import statistics
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+from api.media_files import MediaFiles
+
+
+def make_files(directory: str, video_mb: int) -> dict:
+    video = os.urandom(video_mb * 1024 * 1024)
+    image = os.urandom(200 * 1024)
+    names = {
+        "video": f"{hashlib.sha256(video).hexdigest()}.mp4",
+        "image": f"{hashlib.sha256(image).hexdigest()}-480w.webp",
+    }
+    for kind, content in (("video", video), ("image", image)):
+        with open(os.path.join(directory, names[kind]), "wb") as f:
+            f.write(content)
+    return {"names": names, "video_size": len(video)}
+
+
+def serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def full_downloads(http: httpx.Client, url: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        size = 0
+        with http.stream("GET", url) as response:
+            for chunk in response.iter_raw():
+                size += len(chunk)
+        samples.append(size / (1024 * 1024) / (time.perf_counter() - started))
+    return statistics.median(samples)
+
+
+def range_reads(http: httpx.Client, url: str, file_size: int, requests: int) -> float:
+    rng = random.Random(42)
+    span = 1024 * 1024
+    started = time.perf_counter()
+    for _ in range(requests):
+        start = rng.randrange(0, file_size - span)
+        response = http.get(url, headers={"Range": f"bytes={start}-{start + span - 1}"})
+        assert response.status_code == 206 and len(response.content) == span, response.status_code
+    return requests / (time.perf_counter() - started)
+
+
+def repeat_views(http: httpx.Client, url: str, views: int) -> tuple:
+    # A browser-like client: reuse the copy while fresh, otherwise revalidate with the ETag
+    cached = None
+    fresh_until = 0.0
+    network = 0
+    bytes_sent = 0
+    started = time.perf_counter()
+    for _ in range(views):
+        if cached and time.time() < fresh_until:
+            continue
+        headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+        response = http.get(url, headers=headers)
+        network += 1
+        bytes_sent += len(response.content)
+        if response.status_code == 200:
+            cached = {"etag": response.headers.get("etag")}
+        max_age = next(
+            (int(d.split("=")[1]) for d in response.headers.get("cache-control", "").split(",") if d.strip().startswith("max-age=")),
+            0,
+        )
+        fresh_until = time.time() + max_age
+    return network, bytes_sent, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--video-mb", type=int, default=50, help="Size of the generated video file")
+    parser.add_argument("--runs", type=int, default=5, help="Full downloads per contender")
+    parser.add_argument("--ranges", type=int, default=200, help="Random 1 MiB range requests per contender")
+    parser.add_argument("--views", type=int, default=500, help="Repeat image views per contender")
+    parser.add_argument("--port", type=int, default=8931)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = make_files(directory, args.video_mb)
+        contenders = {
+            "StaticFiles (before)": StaticFiles(directory=directory),
+            "MediaFiles": MediaFiles(directory=directory, sendfile_header=""),
+        }
+        print(f"🎞️  Video: {args.video_mb} MiB, {args.runs} downloads, {args.ranges} range reads, {args.views} image views\n")
+        for offset, (name, files_app) in enumerate(contenders.items()):
+            app = FastAPI()
+            app.mount("/uploads", files_app)
+            server = serve(app, args.port + offset)
+            base = f"http://127.0.0.1:{args.port + offset}/uploads/"
+            try:
+                with httpx.Client(timeout=60) as http:
+                    throughput = full_downloads(http, base + files["names"]["video"], args.runs)
+                    seeks = range_reads(http, base + files["names"]["video"], files["video_size"], args.ranges)
+                    network, bytes_sent, elapsed = repeat_views(http, base + files["names"]["image"], args.views)
+            finally:
+                server.should_exit = True
+            print(
+                f"{name:<22} download {throughput:8.1f} MB/s | ranges {seeks:7.1f} req/s | "
+                f"image views: {network} requests, {bytes_sent / 1024:.0f} KiB in {elapsed * 1000:.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import os
+import csv
+import argparse
+from uuid import UUID
+from db.database import SessionLocal
+
+# Importing these registers their cache invalidation subscribers, so jobs that
+# write business data refresh the directory and SEO page caches too
+from api import business, public  # noqa: F401
+
+
+# -------------------------
+# JOBS
+# -------------------------
+def regenerate_jsonld(args):
+    from api.jsonld import regenerate_all_jsonld
+
+    db = SessionLocal()
+    try:
+        stats = regenerate_all_jsonld(db, chunk_size=args.chunk_size, workers=args.workers)
+    finally:
+        db.close()
+    print(f"✅ Done: {stats}")
+
+
+def generate_metadata(args):
+    from api.ai_metadata import generate_all_metadata
+
+    business_ids = [UUID(b) for b in args.business_id] or None
+    # Unset flags keep the METADATA_BATCH_SIZE / LLM_MAX_CONCURRENCY defaults
+    options = {k: v for k, v in (("batch_size", args.batch_size), ("concurrency", args.concurrency)) if v}
+    stats = generate_all_metadata(business_ids, **options)
+    print(f"✅ Done: {stats}")
+
+
+def recompute_visibility(args):
+    from api.visibility import recompute_visibility
+
+    db = SessionLocal()
+    try:
+        stats = recompute_visibility(db, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+    print(f"✅ Done: {stats}")
+
+
+def gc_media(args):
+    from api.media import collect_media_garbage
+
+    db = SessionLocal()
+    try:
+        stats = collect_media_garbage(db)
+    finally:
+        db.close()
+    print(f"✅ Done: {stats}")
+
+
+def generate_variants(args):
+    from api.media import UPLOAD_DIR
+    from api.media_variants import backfill_variants
+
+    db = SessionLocal()
+    try:
+        stats = backfill_variants(db, UPLOAD_DIR)
+    finally:
+        db.close()
+    print(f"✅ Done: {stats}")
+
+
+def import_users(args):
+    from pydantic import ValidationError
+    from api.users import import_users
+    from schemas.users import UserImportItem
+
+    # CSV header: email,name,password,business_name,business_type,address[,auth_provider]
+    records, invalid = [], 0
+    with open(args.csv_path, newline="", encoding="utf-8") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                records.append(UserImportItem(**{k: v for k, v in row.items() if k and v}).model_dump())
+            except ValidationError as e:
+                invalid += 1
+                print(f"⚠️ Line {line}: {e.errors()[0]['msg']}")
+
+    db = SessionLocal()
+    try:
+        stats = import_users(db, records, batch_size=args.batch_size, workers=args.workers)
+    finally:
+        db.close()
+    print(f"✅ Done: {dict(stats, invalid=invalid)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AiVault backend maintenance jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    jsonld = commands.add_parser("regenerate-jsonld", help="Rebuild JSON-LD feeds for every business")
+    jsonld.add_argument("--chunk-size", type=int, default=500, help="Businesses loaded and inserted per batch")
+    jsonld.add_argument("--workers", type=int, default=os.cpu_count(), help="Build processes (1 = in-process)")
+    jsonld.set_defaults(func=regenerate_jsonld)
+
+    metadata = commands.add_parser("generate-metadata", help="Refresh AI metadata, several businesses per LLM call")
+    metadata.add_argument("--batch-size", type=int, default=None, help="Businesses packed into one prompt")
+    metadata.add_argument("--concurrency", type=int, default=None, help="LLM calls in flight at once")
+    metadata.add_argument("--business-id", action="append", default=[], help="Limit to these businesses (repeatable)")
+    metadata.set_defaults(func=generate_metadata)
+
+    visibility = commands.add_parser("recompute-visibility", help="Score every business and rebuild the leaderboard")
+    visibility.add_argument("--chunk-size", type=int, default=1000, help="Rows per bulk insert")
+    visibility.set_defaults(func=recompute_visibility)
+
+    gc = commands.add_parser("gc-media", help="Delete uploaded files no media asset references any more")
+    gc.set_defaults(func=gc_media)
+
+    variants = commands.add_parser("generate-variants", help="Render missing thumbnail/WebP sizes for uploaded images")
+    variants.set_defaults(func=generate_variants)
+
+    users = commands.add_parser("import-users", help="Create users (and a business each) from a CSV file")
+    users.add_argument("csv_path", help="CSV with an email column; name, password, business_name, business_type, address optional")
+    users.add_argument("--batch-size", type=int, default=500, help="Users hashed and inserted per transaction")
+    users.add_argument("--workers", type=int, default=os.cpu_count(), help="Parallel bcrypt hashes")
+    users.set_defaults(func=import_users)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Integer, Float, ForeignKey, DateTime, Enum, Numeric
+from sqlalchemy import Column, String, Boolean, Integer, BigInteger, Float, ForeignKey, DateTime, Enum, Numeric
 from sqlalchemy.dialects.postgresql import UUID, CITEXT
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import ARRAY
@@ -135,6 +135,35 @@ class MediaAsset(Base):
 
     # Relationship
     business = relationship("BusinessProfile", back_populates="media_assets")
+
+
+# -------------------------
+# MEDIA BLOBS (content-addressed files in uploads/, shared by MediaAsset rows with the same url)
+# -------------------------
+class MediaBlob(Base):
+    __tablename__ = "media_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    url = Column(String, nullable=False, unique=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(UTC))
+
+
+# -------------------------
+# MEDIA VARIANTS (resized WebP copies of an image blob, generated in the background)
+# -------------------------
+class MediaVariant(Base):
+    __tablename__ = "media_variants"
+
+    sha256 = Column(String(64), ForeignKey("media_blobs.sha256", ondelete="CASCADE"), primary_key=True)
+    width = Column(Integer, primary_key=True)
+
+    height = Column(Integer, nullable=False)
+    format = Column(String, nullable=False, default="webp")
+    url = Column(String, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(UTC))
 # -------------------------
 # CHECK_REQUEST TABLE
 # -------------------------
@@ -173,6 +202,23 @@ class VisibilityCheckResult(Base):
 
 
 
+# -------------------------
+# LEADERBOARD TABLE (rebuilt by the fleet-wide recompute)
+# -------------------------
+class VisibilityLeaderboard(Base):
+    __tablename__ = "visibility_leaderboard"
+
+    business_id = Column(UUID(as_uuid=True), ForeignKey("business_profiles.business_id", ondelete="CASCADE"), primary_key=True)
+    result_id = Column(UUID(as_uuid=True), ForeignKey("visibility_check_result.result_id", ondelete="CASCADE"), nullable=False)
+
+    rank = Column(Integer, nullable=False, index=True)
+    visibility_score = Column(Numeric(5, 2), nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(UTC))
+
+    business = relationship("BusinessProfile")
+
+
+
 # -------------------------
 # SUGGESTIONS TABLE
 # -------------------------
@@ -247,6 +293,18 @@ class JsonLDFeed(Base):
     business = relationship("BusinessProfile")
 
 
+# -------------------------
+# JSON-LD SOURCE HASH (latest feed per business + hash of the rows it was built from)
+# -------------------------
+class JsonLDSource(Base):
+    __tablename__ = "jsonld_source"
+
+    business_id = Column(UUID(as_uuid=True), ForeignKey("business_profiles.business_id", ondelete="CASCADE"), primary_key=True)
+    feed_id = Column(UUID(as_uuid=True), ForeignKey("jsonld_feed.feed_id", ondelete="CASCADE"), nullable=False)
+    source_hash = Column(String(64), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(UTC))
+
+
 class OperationalInfo(Base):
     __tablename__ = "operational_info"
 
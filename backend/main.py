@@ -1,7 +1,16 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from db.database import engine, Base
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from db.database import engine, Base, pool_stats
+from api.cache import cache
+from api import llm
+from api.fetch import close_http_client
+from api.media_files import MediaFiles
+from api.security import hashing_stats, shutdown_pool as shutdown_hashing_pool
+from api.jobs import shutdown_pool as shutdown_job_pool
+from api.media_variants import shutdown_pool as shutdown_variant_pool
 from api import (
     auth,
     users,
@@ -13,18 +22,33 @@ from api import (
     visibility,
     jsonld,
     operational_info,
-    public
+    public,
+    jobs
 )
 
 
 # Create all tables
 Base.metadata.create_all(bind=engine)
 
+# Startup / shutdown: release what this worker holds open
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Pooled external-fetch connections, then the worker pools (running work finishes):
+    # bcrypt, LLM jobs, image variants and the caches' background refreshes
+    await close_http_client()
+    shutdown_hashing_pool()
+    shutdown_job_pool()
+    shutdown_variant_pool()
+    cache.shutdown()
+    llm.llm_cache.shutdown()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AiVault Backend",
     description="Modular backend for business profiles, services, media, and AI metadata",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -37,6 +61,11 @@ app.add_middleware(
     
 )
 
+# All pooled connections busy for DB_POOL_TIMEOUT: tell the client to back off instead of a bare 500
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": "Database busy, try again shortly"}, headers={"Retry-After": "1"})
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(users.router, prefix="/users", tags=["Users"])
@@ -48,11 +77,28 @@ app.include_router(services.router)
 app.include_router(visibility.router)
 app.include_router(jsonld.router)
 app.include_router(public.router)
+app.include_router(jobs.router)
 app.include_router(operational_info.router, prefix="/operational-info", tags=["Operational Info"])
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Immutable caching for content-addressed files, Range/206, optional proxy sendfile
+app.mount("/uploads", MediaFiles(directory="uploads"), name="uploads")
 
 # Health check
 @app.get("/")
 def read_root():
     return {"status": "AiVault backend is running"}
+
+# Cache hit/miss counters for this worker (directory/page caches + LLM responses)
+@app.get("/metrics/cache")
+def read_cache_metrics():
+    return {"cache": cache.stats(), "llm_cache": llm.llm_cache.stats()}
+
+# Password hashing pool load for this worker (queue depth vs the 429 threshold)
+@app.get("/metrics/hashing")
+def read_hashing_metrics():
+    return hashing_stats()
+
+# Connection pool usage for this worker (checkouts, waits, timeouts)
+@app.get("/metrics/db")
+def read_db_metrics():
+    return pool_stats(engine)
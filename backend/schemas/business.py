@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 # ✅ NEW: Imports needed for the Aggregated View
 from .operational_info import OperationalInfoOut
@@ -9,6 +9,9 @@ from .media import MediaOut
 from .services import ServiceOut
 from .coupons import CouponOut
 
+# Values of the business_type_enum column
+BusinessType = Literal["restaurant", "salon", "clinic"]
+
 class BusinessCreate(BaseModel):
     owner_id: UUID
     name: str
@@ -79,5 +82,12 @@ class BusinessDirectoryView(BaseModel):
     media: List[MediaOut] = []
     services: List[ServiceOut] = []
     coupons: List[CouponOut] = []
+    # Smallest WebP variant of the first image that fits a directory card (original until variants exist)
+    thumbnail_url: Optional[str] = None
+
+    model_config = {"from_attributes": True}
 
-    model_config = {"from_attributes": True}
\ No newline at end of file
+# ✅ NEW: One page of the directory with an opaque keyset cursor
+class BusinessDirectoryPage(BaseModel):
+    items: List[BusinessDirectoryView] = []
+    next_cursor: Optional[str] = None
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any
+
+class JobOut(BaseModel):
+    job_id: str
+    kind: str
+    status: str  # queued, running, succeeded, failed
+    result: Any | None = None
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
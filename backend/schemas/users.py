@@ -1,4 +1,5 @@
 from pydantic import BaseModel, EmailStr
+from typing import List, Literal
 from uuid import UUID
 from datetime import datetime
 
@@ -19,3 +20,16 @@ class UserOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+# ✅ One row of a bulk import (flat, so a CSV maps onto it directly)
+class UserImportItem(BaseModel):
+    email: EmailStr
+    name: str | None = None
+    auth_provider: str = "password"
+    password: str | None = None
+    business_name: str | None = None
+    business_type: Literal["restaurant", "salon", "clinic"] | None = None
+    address: str | None = None
+
+class UserImportRequest(BaseModel):
+    users: List[UserImportItem]
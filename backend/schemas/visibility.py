@@ -1,6 +1,8 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
+from typing import List, Optional
+from schemas.jobs import JobOut
 
 # Check request
 class VisibilityCheckRequestCreate(BaseModel):
@@ -58,3 +60,26 @@ class VisibilitySuggestionOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+class VisibilityRunOut(BaseModel):
+    # Rule-based result right away; the LLM commentary job (if any) updates the same row
+    result: VisibilityCheckResultOut
+    enrichment: JobOut | None = None
+
+class VisibilityScoreOut(BaseModel):
+    business_id: UUID
+    name: str
+    visibility_score: float
+
+# One page of live scores (highest first) with an opaque keyset cursor
+class VisibilityScorePage(BaseModel):
+    items: List[VisibilityScoreOut] = []
+    next_cursor: Optional[str] = None
+
+class VisibilityLeaderboardOut(BaseModel):
+    rank: int
+    business_id: UUID
+    name: str
+    business_type: str | None = None
+    visibility_score: float
+    computed_at: datetime
@@ -5,6 +5,15 @@ from fastapi.testclient import TestClient
 
 # Ensure backend is in Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Use the local fake LLM so tests never call the network
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_CACHE_BACKEND", "memory")
+# Cheapest bcrypt cost: signups and logins stay fast
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# Tests run in one process: a random signing key is fine
+os.environ.setdefault("TOKEN_ALLOW_RANDOM_SECRET", "true")
+# Catalog-wide runs (imports, batch generation, recompute) need an admin session
+os.environ.setdefault("ADMIN_EMAILS", "admin@example.com")
 from main import app
 
 @pytest.fixture(scope="module")
@@ -12,6 +21,23 @@ def client():
     with TestClient(app) as c:
         yield c
 
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    # Uploads (and their variants) land in a per-test directory, never in backend/uploads
+    from api import media
+    monkeypatch.setattr(media, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+def bearer_for(client, email, password):
+    response = client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="module")
+def admin_headers(client):
+    client.post("/users/", json={"email": "admin@example.com", "name": "Admin", "auth_provider": "email", "password_hash": "admin_pw"})
+    return bearer_for(client, "admin@example.com", "admin_pw")
+
 @pytest.fixture(scope="module")
 def business_id(client):
     # Step 1: Create Alice
@@ -28,7 +54,10 @@ def business_id(client):
     assert response_lookup.status_code == 200
     alice_id = response_lookup.json()["user_id"]
 
-    # Step 3: Create business for Alice
+    # Step 3: Sign the client in as Alice (write routes need the owner's session)
+    client.headers.update(bearer_for(client, "alice@example.com", "hashed_pw_1"))
+
+    # Step 4: Create business for Alice
     response_business = client.post("/business/", json={
         "owner_id": alice_id,
         "name": "Alice's Salon",
@@ -0,0 +1,103 @@
+import json
+from sqlalchemy import event
+from db.database import engine
+from api.business import DIRECTORY_NAMESPACE
+from api.cache import cache
+
+
+def count_directory_queries(client):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    cache.invalidate(DIRECTORY_NAMESPACE)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get("/business/directory-view")
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_directory_view_query_count_is_constant(client, business_id):
+    before = count_directory_queries(client)
+
+    # Add more businesses; the number of SQL statements must not grow with them
+    owner_id = client.get("/users/by-email/alice@example.com").json()["user_id"]
+    for i in range(3):
+        created = client.post("/business/", json={"owner_id": owner_id, "name": f"Extra Business {i}"})
+        assert created.status_code == 200
+        client.post("/services/", json={
+            "business_id": created.json()["business_id"],
+            "service_type": "salon",
+            "name": "Trim",
+            "price": 199.0
+        })
+
+    after = count_directory_queries(client)
+    assert after == before
+    assert after <= 5
+
+
+def test_directory_view_invalidated_by_service_write(client, business_id):
+    client.get("/business/directory-view")
+    client.post("/services/", json={
+        "business_id": business_id,
+        "service_type": "salon",
+        "name": "Colouring",
+        "price": 999.0
+    })
+    directory = client.get("/business/directory-view").json()
+    listing = next(b for b in directory if b["business_id"] == business_id)
+    assert "Colouring" in [s["name"] for s in listing["services"]]
+
+    stats = client.get("/business/directory-view/stats").json()
+    assert stats["namespaces"][DIRECTORY_NAMESPACE]["rebuilds"] >= 1
+
+
+def test_directory_view_pages_and_stream_match(client, business_id):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2, "published": True}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/business/directory-view/page", params=params).json()
+        ids += [b["business_id"] for b in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert business_id in ids
+    assert len(ids) == len(set(ids))
+
+    response = client.get("/business/directory-view/stream", params={"published": True, "batch_size": 2})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    streamed = [json.loads(line)["business_id"] for line in response.text.splitlines()]
+    assert streamed == ids
+
+    salons = client.get("/business/directory-view/page", params={"business_type": "salon", "limit": 100}).json()
+    assert all(b["business_type"] == "salon" for b in salons["items"])
+
+
+def test_directory_rejects_unknown_business_type(client):
+    for path in ("/business/directory-view/page", "/business/directory-view/stream"):
+        response = client.get(path, params={"business_type": "bakery"})
+        assert response.status_code == 422
+
+
+def test_directory_page_keys_are_normalised(client, business_id):
+    from api.business import DIRECTORY_PAGE_NAMESPACE, snap_bbox
+
+    # Nearby boxes snap (outward) onto the same grid cell
+    assert snap_bbox({"min_lat": 28.6139, "max_lat": 28.6201}) == {"min_lat": 28.61, "max_lat": 28.63}
+    assert snap_bbox({"min_lat": 28.6101, "max_lat": 28.6299}) == {"min_lat": 28.61, "max_lat": 28.63}
+
+    # The box still contains Alice's salon, and an empty result is never cached
+    params = {"min_lat": 28.6139, "max_lat": 28.6139, "limit": 100}
+    assert business_id in [b["business_id"] for b in client.get("/business/directory-view/page", params=params).json()["items"]]
+    rebuilds = cache.stats()["namespaces"][DIRECTORY_PAGE_NAMESPACE]["rebuilds"]
+    for _ in range(2):
+        empty = client.get("/business/directory-view/page", params={"min_lat": -89.5, "max_lat": -89.4}).json()
+        assert empty == {"items": [], "next_cursor": None}
+    assert cache.stats()["namespaces"][DIRECTORY_PAGE_NAMESPACE]["rebuilds"] == rebuilds + 2
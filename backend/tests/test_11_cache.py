@@ -0,0 +1,181 @@
+import time
+import itertools
+import threading
+from api.cache import Cache, LRUBackend, SQLiteBackend
+
+
+def test_concurrent_misses_rebuild_once():
+    cache = Cache(LRUBackend())
+    calls = []
+
+    def slow_builder():
+        calls.append(1)
+        time.sleep(0.2)
+        return ["snapshot"]
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_build("directory", "all", slow_builder, ttl=60)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [["snapshot"]] * 8
+
+
+def test_stale_while_revalidate_serves_expired_snapshot():
+    cache = Cache(LRUBackend())
+    versions = itertools.chain(["v1"], itertools.repeat("v2"))
+    refreshed = threading.Event()
+
+    def builder():
+        value = next(versions)
+        if value == "v2":
+            refreshed.set()
+        return value
+
+    assert cache.get_or_build("directory", "all", builder, ttl=0.05, stale_ttl=60) == "v1"
+    time.sleep(0.1)
+
+    # Expired: the old snapshot comes back immediately, the refresh runs in the background
+    assert cache.get_or_build("directory", "all", builder, ttl=0.05, stale_ttl=60) == "v1"
+    assert refreshed.wait(2)
+    time.sleep(0.05)
+    assert cache.get_or_build("directory", "all", builder, ttl=0.05, stale_ttl=60) == "v2"
+
+
+def test_lru_eviction_keeps_generation_and_version_counters():
+    cache = Cache(LRUBackend(max_entries=4))
+    cache.invalidate("directory")
+    cache.invalidate("directory")
+    assert cache.bump("seo_page", "biz") == 1
+
+    # Flood the LRU: the counters must survive, or old generations come back
+    for i in range(20):
+        cache.set("noise", str(i), i)
+    assert cache.generation("directory") == 2
+    assert cache.version("seo_page", "biz") == 1
+    assert cache.bump("seo_page", "biz") == 2
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    worker_a = Cache(SQLiteBackend(path))
+    worker_b = Cache(SQLiteBackend(path))
+
+    worker_a.set("directory", "all", ["v1"], ttl=60)
+    assert worker_b.get("directory", "all") == ["v1"]
+
+    # An invalidation through one worker is a miss for the other
+    worker_b.invalidate("directory")
+    assert worker_a.get("directory", "all") is None
+    assert worker_a.get_or_build("directory", "all", lambda: ["v2"], ttl=60) == ["v2"]
+    assert worker_b.get("directory", "all") == ["v2"]
+
+
+def test_batch_change_is_published_once(monkeypatch):
+    from api import cache as cache_module
+
+    calls = []
+    monkeypatch.setattr(cache_module, "_SUBSCRIBERS", [calls.append])
+    cache_module.publish_business_changes(str(i) for i in range(500))
+    cache_module.publish_business_changes([])
+    cache_module.publish_business_change("one")
+    cache_module.publish_business_change()
+    assert calls == [[str(i) for i in range(500)], ["one"], None]
+
+
+def test_pinned_entries_survive_eviction_until_they_expire(tmp_path):
+    for backend in (LRUBackend(max_entries=2), SQLiteBackend(str(tmp_path / "jobs.sqlite3"), max_entries=2)):
+        backend.set("job:done", {"status": "succeeded"}, time.time() + 60)
+        backend.set("job:old", {"status": "succeeded"}, time.time() - 1)
+        for i in range(20):
+            backend.set(f"noise:{i}", i, None)
+        assert backend.get("job:done")[0] == {"status": "succeeded"}
+
+        # Expired pinned entries go with the next sweep, live ones stay
+        backend._next_sweep = 0.0
+        backend.set("job:new", {"status": "queued"}, time.time() + 60)
+        assert backend.get("job:old") is None
+        assert backend.get("job:done") is not None
+
+
+def test_per_entity_namespace_cannot_evict_the_rest(tmp_path):
+    for backend in (LRUBackend(max_entries=4), SQLiteBackend(str(tmp_path / "budget.sqlite3"), max_entries=4)):
+        cache = Cache(backend)
+        cache.set_budget("seo_page", 2)
+        cache.set("directory", "all", ["hot"], ttl=60)
+
+        # A scan over many ids only pushes out its own pages
+        for i in range(20):
+            cache.set("seo_page", f"id-{i}", {}, ttl=60)
+        assert cache.get("directory", "all") == ["hot"]
+        assert cache.get("seo_page", "id-19") == {}
+        assert cache.get("seo_page", "id-0") is None
+
+
+def test_empty_results_use_their_own_ttl():
+    cache = Cache(LRUBackend())
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {}
+
+    # 0 = never cached: every lookup rebuilds
+    cache.get_or_build("seo_page", "gone", build, ttl=60, empty_ttl=0)
+    cache.get_or_build("seo_page", "gone", build, ttl=60, empty_ttl=0)
+    assert len(builds) == 2
+
+    # Short TTL: reused until it runs out
+    cache.get_or_build("seo_page", "dead", build, ttl=60, empty_ttl=0.05)
+    cache.get_or_build("seo_page", "dead", build, ttl=60, empty_ttl=0.05)
+    assert len(builds) == 3
+    time.sleep(0.06)
+    cache.get_or_build("seo_page", "dead", build, ttl=60, empty_ttl=0.05)
+    assert len(builds) == 4
+
+
+def test_sqlite_reads_touch_recency_at_most_once_per_interval(tmp_path, monkeypatch):
+    from api import cache as cache_module
+
+    backend = SQLiteBackend(str(tmp_path / "touch.sqlite3"), max_entries=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    writes = backend._conn().total_changes
+    for _ in range(10):
+        assert backend.get("a") == (1, None)
+    assert backend._conn().total_changes == writes
+
+    # Past the interval a read counts again: "a" becomes the most recent, "b" is evicted
+    monkeypatch.setattr(cache_module, "CACHE_TOUCH_SECONDS", 0)
+    time.sleep(0.01)
+    backend.get("a")
+    backend.set("c", 3)
+    assert backend.get("a") is not None
+    assert backend.get("b") is None
+
+
+def test_lease_wait_does_not_hold_the_stripe_lock():
+    cache = Cache(LRUBackend())
+    # Another worker is rebuilding directory:all (its lease outlives this test)
+    cache.backend.add(f"lease:{cache._key('directory', 'all', 0)}", "other-worker", time.time() + 5)
+    waiter = threading.Thread(target=lambda: cache.get_or_build("directory", "all", lambda: ["mine"], ttl=60), daemon=True)
+    waiter.start()
+    time.sleep(0.1)
+
+    # A key on the same lock stripe is built right away
+    stripe = cache._key_lock("directory:all")
+    neighbour = next(f"{i}" for i in itertools.count() if cache._key_lock(f"seo_page:{i}") is stripe)
+    started = time.monotonic()
+    assert cache.get_or_build("seo_page", neighbour, lambda: "page", ttl=60) == "page"
+    assert time.monotonic() - started < 1
+
+    # The waiter takes the other worker's result as soon as it lands
+    cache.set("directory", "all", ["theirs"], ttl=60)
+    waiter.join(1)
+    assert not waiter.is_alive()
@@ -0,0 +1,65 @@
+import re
+import gzip
+
+def test_seo_page_etag_and_304(client, business_id):
+    first = client.get(f"/public/business/{business_id}")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    cached = client.get(f"/public/business/{business_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    # Any related write bumps the content version
+    client.patch(f"/business/{business_id}", json={"description": "Premium hair and beauty services, now open Sundays"})
+    updated = client.get(f"/public/business/{business_id}", headers={"If-None-Match": etag})
+    assert updated.status_code == 200
+    assert updated.headers["etag"] != etag
+    assert "now open Sundays" in updated.text
+
+
+def test_sitemap_shards_into_index(client, business_id, monkeypatch):
+    from api import public
+
+    single = client.get("/public/sitemap.xml")
+    assert f"/public/business/{business_id}</loc><lastmod>" in single.text
+
+    monkeypatch.setattr(public, "SITEMAP_BUSINESSES_PER_FILE", 2)
+    index = client.get("/public/sitemap.xml")
+    assert "<sitemapindex" in index.text
+    assert "/public/sitemaps/1.xml" in index.text
+
+    child = client.get("/public/sitemaps/1.xml.gz")
+    assert child.headers["content-type"] == "application/gzip"
+    assert gzip.decompress(child.content).decode().count("<url>") == 3  # hub + 2 businesses
+
+    # The keyset ranges cover every business exactly once, oldest first
+    files = index.text.count("<sitemap>")
+    listed = []
+    for page in range(1, files + 1):
+        listed += re.findall(r"/public/business/([0-9a-f-]+)</loc>", client.get(f"/public/sitemaps/{page}.xml").text)
+    assert len(listed) == len(set(listed)) == len(re.findall(r"/public/business/", single.text))
+    assert listed[0] == re.findall(r"/public/business/([0-9a-f-]+)</loc>", single.text)[0]
+    assert client.get(f"/public/sitemaps/{files + 1}.xml").status_code == 404
+
+
+def test_public_directory_is_paginated(client, business_id, monkeypatch):
+    from api import public
+
+    monkeypatch.setattr(public, "PUBLIC_DIRECTORY_PAGE_SIZE", 2)
+    public.cache.invalidate(public.PUBLIC_DIRECTORY_NAMESPACE)
+
+    first = client.get("/public/directory")
+    assert first.status_code == 200
+    assert first.text.count("<li ") == 2
+    assert '<link rel="next" href="/public/directory?page=2">' in first.text
+
+    second = client.get("/public/directory", params={"page": 2})
+    assert '<link rel="prev" href="/public/directory">' in second.text
+
+    # Past the last page: refused before anything is built or cached
+    rebuilds = public.cache.stats()["namespaces"][public.PUBLIC_DIRECTORY_NAMESPACE]["rebuilds"]
+    for page in (100000, 100001):
+        assert client.get("/public/directory", params={"page": page}).status_code == 404
+    assert public.cache.stats()["namespaces"][public.PUBLIC_DIRECTORY_NAMESPACE]["rebuilds"] == rebuilds
+    public.cache.invalidate(public.PUBLIC_DIRECTORY_NAMESPACE)
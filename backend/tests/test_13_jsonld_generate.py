@@ -0,0 +1,75 @@
+def test_generate_jsonld_is_idempotent(client, business_id):
+    first = client.post("/jsonld/generate", params={"business_id": business_id})
+    assert first.status_code == 200
+
+    # Nothing changed: the latest feed comes back, no new row
+    second = client.post("/jsonld/generate", params={"business_id": business_id})
+    assert second.json()["feed_id"] == first.json()["feed_id"]
+
+    client.patch(f"/business/{business_id}", json={"phone": "9000000000"})
+    third = client.post("/jsonld/generate", params={"business_id": business_id})
+    assert third.json()["feed_id"] != first.json()["feed_id"]
+
+    feeds = client.get("/jsonld/", params={"business_id": business_id}).json()
+    assert len(feeds) == 2
+
+
+def test_superseded_feeds_are_pruned(client, business_id, monkeypatch):
+    from api import jsonld
+
+    monkeypatch.setattr(jsonld, "JSONLD_FEED_RETENTION", 1)
+    client.patch(f"/business/{business_id}", json={"phone": "9111111111"})
+    latest = client.post("/jsonld/generate", params={"business_id": business_id}).json()
+
+    feeds = client.get("/jsonld/", params={"business_id": business_id}).json()
+    assert [f["feed_id"] for f in feeds] == [latest["feed_id"]]
+
+
+def test_bulk_regeneration_is_set_based_and_idempotent(client, business_id):
+    from db.database import SessionLocal
+    from api.jsonld import regenerate_all_jsonld
+
+    db = SessionLocal()
+    try:
+        first = regenerate_all_jsonld(db, chunk_size=2, workers=2, progress=lambda msg: None)
+        assert first["processed"] == first["total"]
+        assert first["written"] + first["unchanged"] + first["unsupported"] == first["total"]
+
+        # Second pass: every supported business already has an identical feed
+        second = regenerate_all_jsonld(db, chunk_size=2, workers=1, progress=lambda msg: None)
+        assert second["written"] == 0
+        assert second["unchanged"] == first["written"] + first["unchanged"]
+    finally:
+        db.close()
+
+
+def test_unchanged_sources_skip_the_build(client, business_id, monkeypatch):
+    from api import jsonld
+
+    first = client.post("/jsonld/generate", params={"business_id": business_id}).json()
+
+    # Source hash matches the stored one: the document is never built
+    def fail(*args):
+        raise AssertionError("build_jsonld should not run for unchanged sources")
+
+    monkeypatch.setattr(jsonld, "build_jsonld", fail)
+    again = client.post("/jsonld/generate", params={"business_id": business_id}).json()
+    assert again["feed_id"] == first["feed_id"]
+
+
+def test_single_and_bulk_paths_hash_sources_identically(client, business_id):
+    from uuid import UUID
+    from db import models
+    from db.database import SessionLocal
+    from api.jsonld import load_jsonld_inputs, source_hash
+
+    client.patch(f"/business/{business_id}", json={"phone": "9222222222"})
+    client.post("/jsonld/generate", params={"business_id": business_id})
+
+    db = SessionLocal()
+    try:
+        stored = db.get(models.JsonLDSource, UUID(business_id))
+        (inputs,) = load_jsonld_inputs(db, [UUID(business_id)])
+        assert source_hash(*inputs) == stored.source_hash
+    finally:
+        db.close()
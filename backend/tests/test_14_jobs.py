@@ -0,0 +1,71 @@
+import threading
+import pytest
+from fastapi import HTTPException
+from api.jobs import enqueue
+
+
+def wait_for_job(client, job_id):
+    response = client.get(f"/jobs/{job_id}", params={"wait": 10})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_visibility_commentary_is_enqueued(client, business_id):
+    response = client.post("/visibility/run", params={"business_id": business_id})
+    assert response.status_code == 200
+    result = response.json()["result"]
+    enrichment = response.json()["enrichment"]
+    assert enrichment["status"] in ("queued", "running", "succeeded")
+
+    job = wait_for_job(client, enrichment["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["result_id"] == result["result_id"]
+    # The LLM explains the score, it never changes it
+    assert job["result"]["visibility_score"] == result["visibility_score"]
+    assert job["result"]["recommendations"].startswith("[BOTS]: Fake analysis for bots")
+
+
+def test_ai_metadata_generate_is_enqueued(client, business_id):
+    response = client.post("/ai-metadata/generate", params={"business_id": business_id})
+    assert response.status_code == 202
+
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["keywords"] == "fake, local, business"
+
+
+def test_exclusive_kind_runs_once_at_a_time(client):
+    release = threading.Event()
+    first = enqueue("exclusive_test", release.wait, 10, exclusive=True)
+    try:
+        with pytest.raises(HTTPException) as busy:
+            enqueue("exclusive_test", release.wait, 10, exclusive=True)
+        assert busy.value.status_code == 409
+    finally:
+        release.set()
+
+    assert wait_for_job(client, first["job_id"])["status"] == "succeeded"
+    # Once the run is over the kind is free again
+    again = enqueue("exclusive_test", lambda: None, exclusive=True)
+    assert wait_for_job(client, again["job_id"])["status"] == "succeeded"
+
+
+def test_unknown_job_is_404(client):
+    assert client.get("/jobs/does-not-exist").status_code == 404
+
+
+def test_identical_prompts_hit_the_llm_cache(client):
+    from api import llm
+
+    fake = llm.FakeLLMClient()
+    llm.set_client(fake)
+    try:
+        first = llm.generate("gemini-2.5-flash", "Grade   this\nbusiness")
+        second = llm.generate("gemini-2.5-flash", "Grade this business")
+        assert first == second
+        assert len(fake.prompts) == 1
+
+        stats = client.get("/metrics/cache").json()["llm_cache"]["namespaces"]["llm"]
+        assert stats["hits"] >= 1
+    finally:
+        llm.set_client(llm.make_client())
@@ -0,0 +1,90 @@
+import re
+import json
+from api import llm
+from api.ai_metadata import generate_all_metadata
+
+
+def create_businesses(client, count):
+    owner_id = client.get("/users/by-email/alice@example.com").json()["user_id"]
+    ids = []
+    for i in range(count):
+        created = client.post("/business/", json={"owner_id": owner_id, "name": f"Batch Business {i}", "business_type": "salon"})
+        assert created.status_code == 200
+        ids.append(created.json()["business_id"])
+    return ids
+
+
+def batch_responder(prompt):
+    ids = re.findall(r"### business_id: ([0-9a-f-]{36})", prompt)
+    if not ids:
+        return json.dumps(llm.FakeLLMClient.DEFAULT_RESPONSE)
+    # Drop the last business so it has to go through the single-call fallback
+    return json.dumps({business_id: {**llm.FakeLLMClient.DEFAULT_RESPONSE, "keywords": ["batched", business_id]} for business_id in ids[:-1]})
+
+
+def test_batch_packs_businesses_into_one_prompt(client, business_id):
+    ids = create_businesses(client, 3)
+    fake = llm.FakeLLMClient(responder=batch_responder)
+    llm.set_client(fake)
+    try:
+        stats = generate_all_metadata(ids, batch_size=3, concurrency=2, progress=None)
+    finally:
+        llm.set_client(llm.make_client())
+
+    assert stats["llm_batches"] == 1
+    assert (stats["batched"], stats["fallback"], stats["failed"]) == (2, 1, 0)
+    # One combined prompt plus one fallback prompt instead of three round trips
+    assert len(fake.prompts) == 2
+
+    first = client.get("/ai-metadata/", params={"business_id": ids[0]}).json()
+    assert first[0]["keywords"] == f"batched, {ids[0]}"
+    last = client.get("/ai-metadata/", params={"business_id": ids[2]}).json()
+    assert last[0]["keywords"] == "fake, local, business"
+
+
+def test_unparseable_batch_falls_back_to_single_calls(client, business_id, admin_headers):
+    ids = create_businesses(client, 2)
+    # The client is signed in as Alice: an owner, not an admin
+    assert client.post("/ai-metadata/generate-batch", json={"business_ids": ids}).status_code == 403
+
+    def responder(prompt):
+        return "not json" if "### business_id:" in prompt else json.dumps(llm.FakeLLMClient.DEFAULT_RESPONSE)
+
+    llm.set_client(llm.FakeLLMClient(responder=responder))
+    try:
+        response = client.post("/ai-metadata/generate-batch", params={"batch_size": 5}, json={"business_ids": ids}, headers=admin_headers)
+        assert response.status_code == 202
+        job = client.get(f"/jobs/{response.json()['job_id']}", params={"wait": 10}).json()
+    finally:
+        llm.set_client(llm.make_client())
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["fallback"] == 2
+    assert job["result"]["batched"] == 0
+
+
+def test_llm_calls_never_exceed_the_shared_cap(client, business_id, monkeypatch):
+    import time
+    import threading
+
+    ids = create_businesses(client, 6)
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def responder(prompt):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return "not json"  # every batch falls back to single calls: plenty of concurrent calls
+
+    monkeypatch.setattr(llm, "_slots", threading.BoundedSemaphore(2))
+    monkeypatch.setattr(llm, "LLM_CACHE_TTL_SECONDS", 0)
+    llm.set_client(llm.FakeLLMClient(responder=responder))
+    try:
+        generate_all_metadata(ids, batch_size=1, concurrency=6, progress=None)
+    finally:
+        llm.set_client(llm.make_client())
+
+    assert peak[0] == 2
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from api.fetch import fetch_page, PageTooLarge
+from api.html_extract import HtmlExtractor
+
+PAGE = b"""<html><head><title>Stub Salon</title>
+<meta name="description" content="Haircuts in Delhi">
+<script type="application/ld+json">{"@type": "HairSalon"}</script>
+</head><body><h1>Welcome</h1><img src="a.png"><img src="b.png"><p>Fresh cuts daily.</p></body></html>"""
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/page":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+        elif self.path == "/huge":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(50 * 1024 * 1024))
+            self.end_headers()
+        elif self.path in ("/endless", "/bloated-head"):
+            # No Content-Length: keeps writing until the client hangs up
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.end_headers()
+            # /bloated-head never leaves an inline <script> in <head>, so only the byte cap can stop it
+            head = b"<html><head><script>" if self.path == "/bloated-head" else b"<html><head><title>Endless</title></head><body>"
+            try:
+                self.wfile.write(head)
+                for _ in range(2000):
+                    chunk = (b"var x = 1;" * 400) if self.path == "/bloated-head" else (b"<p>" + b"word " * 800 + b"</p>")
+                    self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def fetch(url, **kwargs):
+    async def run():
+        async with httpx.AsyncClient() as client:
+            return await fetch_page(url, client=client, **kwargs)
+    return asyncio.run(run())
+
+
+def test_fetch_extracts_head_and_counts(stub_url):
+    page = fetch(f"{stub_url}/page")["page"]
+    assert page.title == "Stub Salon"
+    assert page.description == "Haircuts in Delhi"
+    assert (page.h1_count, page.img_count, len(page.json_ld)) == (1, 2, 1)
+    assert page.text == "Stub Salon Welcome Fresh cuts daily."
+
+
+def test_fetch_stops_after_head_and_text_sample(stub_url):
+    fetched = fetch(f"{stub_url}/endless", extractor=HtmlExtractor(text_chars=1000))
+    assert fetched["stopped_early"]
+    assert fetched["page"].title == "Endless"
+    assert len(fetched["page"].text) == 1000
+    assert fetched["bytes_read"] < 256 * 1024
+
+
+def test_fetch_aborts_oversized_bodies(stub_url):
+    with pytest.raises(PageTooLarge):
+        fetch(f"{stub_url}/huge")
+    with pytest.raises(PageTooLarge):
+        fetch(f"{stub_url}/bloated-head", max_bytes=64 * 1024)
+
+
+def test_external_audit_uses_async_fetch(client, stub_url):
+    response = client.post("/visibility/external", json={"url": f"{stub_url}/page"})
+    assert response.status_code == 200
+    assert response.json()["score"] == 50
+
+    unreachable = client.post("/visibility/external", json={"url": f"{stub_url}/huge"}).json()
+    assert unreachable["score"] == 0
+    assert "Could not scan website" in unreachable["error"]
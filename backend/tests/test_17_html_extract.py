@@ -0,0 +1,29 @@
+import json
+import pytest
+from api.html_extract import extract_html, HtmlExtractor
+from benchmarks.html_extract import build_page, beautifulsoup_audit, extractor_audit
+
+
+@pytest.mark.parametrize("backend", ["lxml", "html.parser"])
+def test_single_pass_matches_beautifulsoup(backend):
+    html = build_page(50)
+    assert extractor_audit(html, backend) == beautifulsoup_audit(html)
+
+
+@pytest.mark.parametrize("backend", ["lxml", "html.parser"])
+def test_collects_json_ld_blocks_and_streams(backend):
+    html = """<html><head><title>Two Blocks</title>
+    <script type="application/ld+json">{"@type": "HairSalon"}</script>
+    <script type="application/ld+json">{"@type": "Offer", "price": "199"}</script>
+    <script>var ignored = true;</script>
+    </head><body><p>Hello</p><p>World</p></body></html>"""
+
+    extractor = HtmlExtractor(backend)
+    # Feed in tiny chunks, as the streaming fetch does
+    for i in range(0, len(html), 7):
+        extractor.feed(html[i:i + 7])
+    page = extractor.close()
+
+    assert [json.loads(block)["@type"] for block in page.json_ld] == ["HairSalon", "Offer"]
+    assert page.text == "Two Blocks Hello World"
+    assert extract_html(html, backend).title == "Two Blocks"
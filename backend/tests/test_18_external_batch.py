@@ -0,0 +1,141 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from api import fetch
+
+PAGE = b"<html><head><title>Competitor</title></head><body><h1>Hi</h1></body></html>"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests = []
+    lock = threading.Lock()
+    in_flight = {}
+    max_in_flight = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        host = self.headers["Host"].split(":")[0]
+        with self.lock:
+            self.requests.append((self.path, host, time.monotonic(), self.headers.get("If-None-Match")))
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.max_in_flight[host] = max(self.max_in_flight.get(host, 0), self.in_flight[host])
+        try:
+            if self.path == "/slow":
+                time.sleep(0.5)
+            if self.path == "/stray-304" and self.headers.get("Cache-Control") != "no-cache":
+                # A misbehaving proxy: 304 although we sent no validators
+                self.send_response(304)
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header("ETag", '"v1"')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            self.wfile.write(PAGE)
+        finally:
+            with self.lock:
+                self.in_flight[host] -= 1
+
+
+@pytest.fixture(scope="module")
+def stub_port():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_port
+    server.shutdown()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def signed_in(business_id):
+    # Batch audits need a session: the business_id fixture signs the client in as Alice
+    return business_id
+
+
+def audit_batch(client, urls):
+    response = client.post("/visibility/external/batch", json={"urls": urls})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_dedupes_streams_and_is_polite_per_host(client, stub_port, monkeypatch):
+    monkeypatch.setattr(fetch, "EXTERNAL_HOST_DELAY_SECONDS", 0.1)
+    slow = f"http://127.0.0.1:{stub_port}/slow"
+    same_host = [f"http://127.0.0.1:{stub_port}/page{i}" for i in range(3)]
+    other_host = f"http://localhost:{stub_port}/fast"
+
+    results = audit_batch(client, [slow, *same_host, slow, other_host])
+
+    assert sorted(r["url"] for r in results) == sorted([slow, *same_host, other_host])
+    assert all(r["score"] == 50 for r in results)
+    # The other host is not queued behind the slow one, so it streams back first
+    assert results[0]["url"] == other_host
+
+    hits = [r for r in StubHandler.requests if r[1] == "127.0.0.1"]
+    assert len(hits) == 4
+    assert StubHandler.max_in_flight["127.0.0.1"] == 1
+    starts = sorted(r[2] for r in hits)
+    assert all(b - a >= 0.1 for a, b in zip(starts, starts[1:]))
+
+
+def test_busy_host_does_not_hold_the_batch_slots(client, stub_port, monkeypatch):
+    from api import visibility
+
+    monkeypatch.setattr(visibility, "EXTERNAL_BATCH_CONCURRENCY", 2)
+    monkeypatch.setattr(fetch, "EXTERNAL_HOST_DELAY_SECONDS", 0.5)
+    busy_host = [f"http://127.0.0.1:{stub_port}/queued{i}" for i in range(4)]
+    idle_host = f"http://localhost:{stub_port}/idle"
+
+    results = audit_batch(client, [*busy_host, idle_host])
+    assert len(results) == 5
+
+    # Four URLs queue behind the busy host's delay; the idle host is fetched before
+    # the busy host's second request (holding slots while queued, it would come after the third)
+    queued = sorted(r[2] for r in StubHandler.requests if r[0].startswith("/queued"))
+    idle = next(r[2] for r in StubHandler.requests if r[0] == "/idle")
+    assert idle < queued[1]
+
+
+def test_batch_reuses_and_revalidates_cached_fetches(client, stub_port, monkeypatch):
+    monkeypatch.setattr(fetch, "EXTERNAL_HOST_DELAY_SECONDS", 0)
+    url = f"http://127.0.0.1:{stub_port}/cached"
+
+    audit_batch(client, [url])
+    audit_batch(client, [url])
+    assert [r[0] for r in StubHandler.requests].count("/cached") == 1
+
+    # Past the freshness window the page is revalidated with its ETag instead of re-downloaded
+    monkeypatch.setattr(fetch, "EXTERNAL_FETCH_FRESH_SECONDS", 0)
+    results = audit_batch(client, [url])
+    assert results[0]["score"] == 50
+    cached_hits = [r for r in StubHandler.requests if r[0] == "/cached"]
+    assert len(cached_hits) == 2
+    assert cached_hits[-1][3] == '"v1"'
+
+
+def test_stray_304_without_a_cached_page_refetches(client, stub_port, monkeypatch):
+    monkeypatch.setattr(fetch, "EXTERNAL_HOST_DELAY_SECONDS", 0)
+    url = f"http://127.0.0.1:{stub_port}/stray-304"
+
+    results = audit_batch(client, [url])
+    assert results[0]["score"] == 50
+    assert [r[0] for r in StubHandler.requests].count("/stray-304") == 2
+
+
+def test_batch_rejects_empty_and_oversized_lists(client, monkeypatch):
+    from api import visibility
+
+    assert client.post("/visibility/external/batch", json={"urls": []}).status_code == 400
+    monkeypatch.setattr(visibility, "EXTERNAL_BATCH_MAX_URLS", 2)
+    urls = [f"https://example.com/{i}" for i in range(3)]
+    assert client.post("/visibility/external/batch", json={"urls": urls}).status_code == 400
@@ -0,0 +1,62 @@
+from sqlalchemy import select, values, column, Integer
+from db.database import SessionLocal
+from api.visibility_score import score_features, score_sql, VISIBILITY_RULES, FEATURE_COLUMNS
+
+
+def test_scorer_rules_and_jsonld_cap():
+    perfect = {"jsonld_count": 1, "service_count": 2, "media_count": 3, "description_length": 80, "hours_count": 1, "slogan_length": 10}
+    assert score_features(perfect) == {"score": 100, "issues": [], "recommendations": []}
+
+    no_jsonld = {**perfect, "jsonld_count": 0}
+    scored = score_features(no_jsonld)
+    assert scored["score"] == 40
+    assert scored["issues"] == ["CRITICAL: Missing JSON-LD"]
+
+    assert score_features({})["score"] == 0
+    assert len(score_features({})["issues"]) == len(VISIBILITY_RULES)
+
+    # The SQL form gives the same numbers
+    rows = [perfect, no_jsonld, {**perfect, "media_count": 2}, {}]
+    table = values(*[column(name, Integer) for name in FEATURE_COLUMNS], name="features").data(
+        [tuple(row.get(name, 0) for name in FEATURE_COLUMNS) for row in rows]
+    )
+    db = SessionLocal()
+    try:
+        sql_scores = db.execute(select(score_sql({name: table.c[name] for name in FEATURE_COLUMNS}))).scalars().all()
+    finally:
+        db.close()
+    assert sql_scores == [score_features(row)["score"] for row in rows]
+
+
+def test_run_scores_instantly_without_llm(client, business_id):
+    response = client.post("/visibility/run", params={"business_id": business_id, "enrich": False})
+    assert response.status_code == 200
+    assert response.json()["enrichment"] is None
+    result = response.json()["result"]
+
+    scores = {s["business_id"]: s["visibility_score"] for s in client.get("/visibility/scores", params={"limit": 1000}).json()["items"]}
+    assert scores[business_id] == result["visibility_score"]
+    assert client.post("/visibility/run", params={"business_id": "00000000-0000-0000-0000-000000000000"}).status_code == 404
+
+
+def test_scores_are_paged_highest_first(client, business_id):
+    owner_id = client.get("/users/by-email/alice@example.com").json()["user_id"]
+    for i in range(3):
+        client.post("/business/", json={"owner_id": owner_id, "name": f"Paged Business {i}"})
+
+    everything = client.get("/visibility/scores", params={"limit": 1000}).json()
+    assert everything["next_cursor"] is None
+
+    paged, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/visibility/scores", params=params).json()
+        paged += page["items"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert paged == everything["items"]
+    scores = [s["visibility_score"] for s in paged]
+    assert scores == sorted(scores, reverse=True)
+
+    assert client.get("/visibility/scores", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,90 @@
+import time
+import threading
+from sqlalchemy import event
+from db.database import engine, SessionLocal
+from api.visibility import recompute_visibility
+
+
+def count_recompute_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = SessionLocal()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        stats = recompute_visibility(db, progress=None)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        db.close()
+    return stats, len(statements)
+
+
+def test_recompute_is_set_based(client, business_id):
+    _, before = count_recompute_statements()
+
+    owner_id = client.get("/users/by-email/alice@example.com").json()["user_id"]
+    for i in range(3):
+        created = client.post("/business/", json={"owner_id": owner_id, "name": f"Ranked Business {i}"})
+        assert created.status_code == 200
+
+    stats, after = count_recompute_statements()
+    assert after == before
+    assert stats["results_written"] == stats["businesses"]
+
+
+def test_concurrent_recomputes_take_turns(client, business_id, monkeypatch):
+    from api import visibility
+    load = visibility.load_visibility_features
+
+    def slow_load(db):
+        # Widen the window between reading the features and swapping the leaderboard
+        rows = load(db)
+        time.sleep(0.2)
+        return rows
+
+    monkeypatch.setattr(visibility, "load_visibility_features", slow_load)
+    errors = []
+
+    def run():
+        db = SessionLocal()
+        try:
+            recompute_visibility(db, progress=None)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    leaderboard = client.get("/visibility/leaderboard", params={"limit": 500}).json()
+    assert len(leaderboard) == len({entry["business_id"] for entry in leaderboard})
+
+
+def test_leaderboard_served_from_recompute(client, business_id, admin_headers):
+    client.post("/services/", json={"business_id": business_id, "service_type": "salon", "name": "Blowdry", "price": 499.0})
+
+    # Owners can't start a catalog-wide run
+    assert client.post("/visibility/recompute").status_code == 403
+    response = client.post("/visibility/recompute", headers=admin_headers)
+    assert response.status_code == 202
+    job = client.get(f"/jobs/{response.json()['job_id']}", params={"wait": 10}).json()
+    assert job["status"] == "succeeded"
+
+    leaderboard = client.get("/visibility/leaderboard", params={"limit": 500}).json()
+    scores = [entry["visibility_score"] for entry in leaderboard]
+    assert scores == sorted(scores, reverse=True)
+    assert leaderboard[0]["rank"] == 1
+
+    # Same numbers as the live scorer, and the run is recorded in each business's history
+    live = {s["business_id"]: s["visibility_score"] for s in client.get("/visibility/scores", params={"limit": 1000}).json()["items"]}
+    ours = next(entry for entry in leaderboard if entry["business_id"] == business_id)
+    assert ours["visibility_score"] == live[business_id]
+    latest = client.get("/visibility/result", params={"business_id": business_id, "limit": 1}).json()[0]
+    assert latest["visibility_score"] == ours["visibility_score"]
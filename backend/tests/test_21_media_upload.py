@@ -0,0 +1,100 @@
+import os
+import hashlib
+import pytest
+from db.database import SessionLocal
+from api import media
+
+pytestmark = pytest.mark.usefixtures("upload_dir")
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 2048
+
+
+def leftover_temp_files():
+    return [name for name in os.listdir(media.UPLOAD_DIR) if name.startswith(".upload-")]
+
+
+def upload(client, business_id, content, filename="logo.png"):
+    return client.post(
+        "/media/upload",
+        data={"business_id": business_id, "media_type": "image"},
+        files={"file": (filename, content, "image/png")},
+    )
+
+
+def collect_garbage():
+    db = SessionLocal()
+    try:
+        return media.collect_media_garbage(db)
+    finally:
+        db.close()
+
+
+def test_upload_streams_into_upload_dir(client, business_id):
+    content = PNG + b"streamed"
+    response = upload(client, business_id, content)
+    assert response.status_code == 200
+    url = response.json()["url"]
+    assert url == f"/uploads/{hashlib.sha256(content).hexdigest()}.png"
+
+    with open(media.blob_path(url), "rb") as f:
+        assert f.read() == content
+    assert leftover_temp_files() == []
+
+    client.delete(f"/media/{response.json()['asset_id']}")
+    collect_garbage()
+    assert not os.path.exists(media.blob_path(url))
+
+
+def test_duplicate_uploads_share_one_blob_until_gc(client, business_id):
+    content = PNG + b"shared logo"
+    first = upload(client, business_id, content, "logo.png").json()
+    second = upload(client, business_id, content, "logo-copy.PNG").json()
+    assert first["url"] == second["url"]
+    assert first["asset_id"] != second["asset_id"]
+    path = media.blob_path(first["url"])
+
+    # One reference left: the file stays
+    client.delete(f"/media/{first['asset_id']}")
+    assert collect_garbage()["blobs_removed"] == 0
+    assert os.path.exists(path)
+
+    # Last reference gone: the GC reclaims the file
+    client.delete(f"/media/{second['asset_id']}")
+    stats = collect_garbage()
+    assert stats["blobs_removed"] == 1
+    assert stats["bytes_freed"] == len(content)
+    assert not os.path.exists(path)
+
+    # Uploading the same bytes again recreates the blob
+    again = upload(client, business_id, content).json()
+    assert os.path.exists(media.blob_path(again["url"]))
+    client.delete(f"/media/{again['asset_id']}")
+    collect_garbage()
+
+
+def test_upload_aborts_past_max_file_size(client, business_id, monkeypatch):
+    monkeypatch.setattr(media, "MAX_FILE_SIZE", 1024)
+    before = set(os.listdir(media.UPLOAD_DIR))
+
+    response = client.post(
+        "/media/upload",
+        data={"business_id": business_id, "media_type": "image"},
+        files={"file": ("big.png", PNG, "image/png")},
+    )
+    assert response.status_code == 400
+    assert "File too large" in response.json()["detail"]
+    assert set(os.listdir(media.UPLOAD_DIR)) == before
+
+
+def test_upload_rejects_bad_extension_and_missing_fields(client, business_id):
+    bad = client.post(
+        "/media/upload",
+        data={"business_id": business_id, "media_type": "image"},
+        files={"file": ("script.exe", b"MZ", "application/octet-stream")},
+    )
+    assert bad.status_code == 400
+    assert "Invalid file extension" in bad.json()["detail"]
+
+    missing = client.post("/media/upload", data={"business_id": business_id}, files={"file": ("a.png", PNG, "image/png")})
+    assert missing.status_code == 422
+    assert leftover_temp_files() == []
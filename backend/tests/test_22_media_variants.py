@@ -0,0 +1,85 @@
+import io
+import os
+import time
+import pytest
+from db.database import SessionLocal
+from db import models
+from api import media
+
+Image = pytest.importorskip("PIL.Image")
+
+pytestmark = pytest.mark.usefixtures("upload_dir")
+
+
+def png_bytes(width, height, color=(200, 80, 40)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def wait_for_variants(url, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        db = SessionLocal()
+        try:
+            variants = (
+                db.query(models.MediaVariant)
+                .join(models.MediaBlob, models.MediaBlob.sha256 == models.MediaVariant.sha256)
+                .filter(models.MediaBlob.url == url)
+                .order_by(models.MediaVariant.width)
+                .all()
+            )
+        finally:
+            db.close()
+        if variants:
+            return variants
+        time.sleep(0.1)
+    raise AssertionError(f"No variants generated for {url}")
+
+
+def test_image_upload_gets_webp_variants_used_by_directory_and_seo_page(client, business_id):
+    response = client.post(
+        "/media/upload",
+        data={"business_id": business_id, "media_type": "image"},
+        files={"file": ("hero.png", png_bytes(1200, 800), "image/png")},
+    )
+    assert response.status_code == 200
+    asset = response.json()
+
+    # 1. Rendered in the background, never wider than the original
+    variants = wait_for_variants(asset["url"])
+    assert [(v.width, v.height) for v in variants] == [(160, 107), (480, 320), (960, 640)]
+    for variant in variants:
+        with Image.open(media.blob_path(variant.url)) as image:
+            assert image.format == "WEBP"
+            assert image.size == (variant.width, variant.height)
+
+    # 2. Directory card (320px) -> 480w, SEO hero (960px) -> 960w; the original stays listed
+    listing = next(b for b in client.get("/business/directory-view").json() if b["business_id"] == business_id)
+    assert listing["thumbnail_url"].endswith("-480w.webp")
+    assert listing["media"][0]["url"] == asset["url"]
+    page = client.get(f"/public/business/{business_id}").text
+    assert '-960w.webp"' in page
+
+    # 3. GC removes the variant files with the blob
+    client.delete(f"/media/{asset['asset_id']}")
+    db = SessionLocal()
+    try:
+        media.collect_media_garbage(db)
+        assert db.query(models.MediaVariant).filter(models.MediaVariant.sha256 == variants[0].sha256).count() == 0
+    finally:
+        db.close()
+    assert not any(os.path.exists(media.blob_path(v.url)) for v in variants)
+
+
+def test_small_images_are_not_upscaled(client, business_id):
+    response = client.post(
+        "/media/upload",
+        data={"business_id": business_id, "media_type": "image"},
+        files={"file": ("icon.png", png_bytes(300, 150, (10, 20, 30)), "image/png")},
+    )
+    variants = wait_for_variants(response.json()["url"])
+    assert [v.width for v in variants] == [160, 300]
+
+    listing = next(b for b in client.get("/business/directory-view").json() if b["business_id"] == business_id)
+    assert listing["thumbnail_url"].endswith("-300w.webp")
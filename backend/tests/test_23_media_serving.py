@@ -0,0 +1,69 @@
+import os
+import hashlib
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api import media
+from api.media_files import MediaFiles
+
+CONTENT = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 16
+
+
+def test_content_addressed_upload_is_immutable_and_seekable(client, business_id):
+    asset = client.post(
+        "/media/upload",
+        data={"business_id": business_id, "media_type": "image"},
+        files={"file": ("serve.png", CONTENT, "image/png")},
+    ).json()
+    sha = hashlib.sha256(CONTENT).hexdigest()
+
+    # 1. Long-lived, immutable, strong ETag from the name
+    response = client.get(asset["url"])
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["etag"] == f'"{sha}"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "last-modified" in response.headers
+
+    # 2. Revalidation keeps the caching headers
+    not_modified = client.get(asset["url"], headers={"If-None-Match": f'"{sha}"'})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["cache-control"].endswith("immutable")
+
+    # 3. Range requests: partial, If-Range, unsatisfiable
+    partial = client.get(asset["url"], headers={"Range": "bytes=8-17"})
+    assert partial.status_code == 206
+    assert partial.content == CONTENT[8:18]
+    assert partial.headers["content-range"] == f"bytes 8-17/{len(CONTENT)}"
+    stale = client.get(asset["url"], headers={"Range": "bytes=8-17", "If-Range": '"outdated"'})
+    assert stale.status_code == 200 and stale.content == CONTENT
+    assert client.get(asset["url"], headers={"Range": f"bytes={len(CONTENT)}-"}).status_code == 416
+
+    client.delete(f"/media/{asset['asset_id']}")
+
+
+def test_temp_files_are_hidden_and_legacy_names_revalidate(tmp_path):
+    (tmp_path / ".upload-abc.part").write_bytes(b"partial")
+    (tmp_path / "logo_1700000000.png").write_bytes(CONTENT)
+    app = FastAPI()
+    app.mount("/uploads", MediaFiles(directory=str(tmp_path)))
+    local = TestClient(app)
+
+    assert local.get("/uploads/.upload-abc.part").status_code == 404
+    legacy = local.get("/uploads/logo_1700000000.png")
+    assert legacy.status_code == 200
+    assert "immutable" not in legacy.headers["cache-control"]
+
+
+def test_sendfile_offload_hands_the_path_to_the_proxy(tmp_path):
+    name = f"{hashlib.sha256(CONTENT).hexdigest()}.png"
+    (tmp_path / name).write_bytes(CONTENT)
+    app = FastAPI()
+    app.mount("/uploads", MediaFiles(directory=str(tmp_path), sendfile_header="X-Accel-Redirect", sendfile_prefix="/internal/"))
+    response = TestClient(app).get(f"/uploads/{name}")
+
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["x-accel-redirect"] == f"/internal/{name}"
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["cache-control"].endswith("immutable")
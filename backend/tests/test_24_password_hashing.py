@@ -0,0 +1,65 @@
+import time
+from db.database import SessionLocal
+from db.models import User
+from api import security
+
+EMAIL = "hashing@example.com"
+
+
+def stored_hash():
+    db = SessionLocal()
+    try:
+        return db.query(User.password_hash).filter_by(email=EMAIL).scalar()
+    finally:
+        db.close()
+
+
+def signup(client):
+    return client.post("/users/", json={"email": EMAIL, "name": "Hash", "auth_provider": "email", "password_hash": "s3cret!"})
+
+
+def test_login_rehashes_when_cost_changes(client, monkeypatch):
+    monkeypatch.setattr(security, "BCRYPT_ROUNDS", 4)
+    assert signup(client).status_code in (200, 409)
+    client.post("/auth/login", json={"email": EMAIL, "password": "s3cret!"})
+    assert stored_hash().startswith("$2b$04$")
+
+    # Cost raised: the next successful login upgrades the stored hash
+    monkeypatch.setattr(security, "BCRYPT_ROUNDS", 5)
+    response = client.post("/auth/login", json={"email": EMAIL, "password": "s3cret!"})
+    assert response.status_code == 200
+    assert stored_hash().startswith("$2b$05$")
+
+    # Wrong password never touches it
+    assert client.post("/auth/login", json={"email": EMAIL, "password": "nope"}).status_code == 401
+    assert stored_hash().startswith("$2b$05$")
+
+
+def test_saturated_hashing_pool_answers_429(client, monkeypatch):
+    monkeypatch.setattr(security, "PASSWORD_HASH_MAX_PENDING", 0)
+    response = client.post("/auth/login", json={"email": EMAIL, "password": "s3cret!"})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/metrics/hashing").json()["pending"] == 0
+
+
+def test_shutdown_releases_the_worker_pools():
+    from fastapi.testclient import TestClient
+    from main import app
+    from api import jobs, media_variants
+    from api.cache import cache
+
+    with TestClient(app) as local:
+        assert local.post("/auth/login", json={"email": "nobody@example.com", "password": "x"}).status_code in (401, 404)
+        jobs.enqueue("noop", lambda: None)
+        media_variants.get_pool().submit(lambda: None)
+        cache.set("shutdown_test", "k", 1, ttl=0.01)
+        time.sleep(0.02)
+        cache.get_or_build("shutdown_test", "k", lambda: 2, ttl=60, stale_ttl=60)  # stale: refreshed in the background
+        assert security._pool is not None and jobs._pool is not None
+        assert media_variants._pool is not None and cache._refresh_pool is not None
+    assert security._pool is None and jobs._pool is None
+    assert media_variants._pool is None and cache._refresh_pool is None
+
+    # Next use starts fresh pools
+    assert security.verify_password("pw", security.get_pool().submit(security.get_password_hash, "pw", 4).result())
@@ -0,0 +1,110 @@
+import time
+import pytest
+from api import tokens
+
+EMAIL = "tokens@example.com"
+PASSWORD = "t0ken-pass"
+
+
+def login(client):
+    client.post("/users/", json={"email": EMAIL, "name": "Tok", "auth_provider": "email", "password_hash": PASSWORD})
+    response = client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+    assert response.status_code == 200
+    return response.json()
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_login_issues_tokens_checked_without_the_db(client):
+    session = login(client)
+    assert session["token_type"] == "bearer"
+
+    me = client.get("/auth/me", headers=bearer(session["access_token"]))
+    assert me.status_code == 200
+    assert me.json()["user_id"] == session["user_id"]
+    assert me.json()["business_id"] == session["business_id"]
+
+    # Missing, tampered, or the wrong kind of token
+    assert client.get("/auth/me").status_code == 401
+    tampered = session["access_token"][:-2] + ("AA" if not session["access_token"].endswith("AA") else "BB")
+    assert client.get("/auth/me", headers=bearer(tampered)).status_code == 401
+    assert client.get("/auth/me", headers={"Authorization": "Bearer not-a-tokené.x".encode("latin-1")}).status_code == 401
+    assert client.get("/auth/me", headers=bearer(session["refresh_token"])).status_code == 401
+
+
+def test_expired_access_token_is_refreshed(client, monkeypatch):
+    monkeypatch.setattr(tokens, "ACCESS_TOKEN_TTL_SECONDS", -1)
+    session = login(client)
+    expired = client.get("/auth/me", headers=bearer(session["access_token"]))
+    assert expired.status_code == 401
+    assert expired.json()["detail"] == "Token expired"
+    monkeypatch.undo()
+
+    refreshed = client.post("/auth/refresh", json={"refresh_token": session["refresh_token"]})
+    assert refreshed.status_code == 200
+    assert client.get("/auth/me", headers=bearer(refreshed.json()["access_token"])).status_code == 200
+
+
+def test_refresh_rotates_the_refresh_token(client):
+    session = login(client)
+    rotated = client.post("/auth/refresh", json={"refresh_token": session["refresh_token"]}).json()
+    assert rotated["refresh_token"] != session["refresh_token"]
+
+    # The old pair is spent; the new one keeps working
+    assert client.post("/auth/refresh", json={"refresh_token": session["refresh_token"]}).status_code == 401
+    assert client.get("/auth/me", headers=bearer(session["access_token"])).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]}).status_code == 200
+
+
+def test_write_routes_need_the_owner(client, business_id):
+    service = {"business_id": business_id, "service_type": "salon", "name": "Cut", "price": 10}
+    anonymous = client.post("/services/", json=service, headers={"Authorization": ""})
+    assert anonymous.status_code == 401
+    # Logged in, but not as Alice
+    stranger = bearer(login(client)["access_token"])
+    assert client.post("/services/", json=service, headers=stranger).status_code == 403
+    assert client.patch(f"/business/{business_id}", json={"name": "Mine now"}, headers=stranger).status_code == 403
+    assert client.post(f"/visibility/run?business_id={business_id}", headers=stranger).status_code == 403
+    assert client.post("/visibility/external/batch", json={"urls": ["https://example.com"]}, headers={"Authorization": ""}).status_code == 401
+
+
+def test_logout_revokes_access_and_refresh_tokens(client):
+    session = login(client)
+    assert client.post("/auth/logout", headers=bearer(session["access_token"])).status_code == 200
+
+    assert client.get("/auth/me", headers=bearer(session["access_token"])).json()["detail"] == "Session ended"
+    assert client.post("/auth/refresh", json={"refresh_token": session["refresh_token"]}).status_code == 401
+    # Other sessions of the same user are unaffected
+    assert client.get("/auth/me", headers=bearer(login(client)["access_token"])).status_code == 200
+
+
+def test_missing_secret_refuses_to_start(monkeypatch):
+    monkeypatch.delenv("TOKEN_SECRET", raising=False)
+    monkeypatch.delenv("TOKEN_ALLOW_RANDOM_SECRET", raising=False)
+    with pytest.raises(RuntimeError, match="TOKEN_SECRET"):
+        tokens.load_token_secret()
+
+    monkeypatch.setenv("TOKEN_SECRET", "shared")
+    assert tokens.load_token_secret() == "shared"
+    monkeypatch.delenv("TOKEN_SECRET")
+    monkeypatch.setenv("TOKEN_ALLOW_RANDOM_SECRET", "true")
+    assert tokens.load_token_secret() != tokens.load_token_secret()
+
+
+def test_logout_is_shared_between_workers(tmp_path, monkeypatch):
+    from api.cache import Cache, SQLiteBackend
+
+    path = str(tmp_path / "shared.sqlite3")
+    claims = {"typ": "access", "sid": "sid-shared", "exp": time.time() + 60}
+    monkeypatch.setattr(tokens, "cache", Cache(SQLiteBackend(path, max_entries=2)))
+    tokens.revoke_session(claims)
+
+    # Another worker on the same backend, after plenty of LRU pressure
+    other = Cache(SQLiteBackend(path, max_entries=2))
+    for i in range(10):
+        other.set("noise", str(i), i)
+    monkeypatch.setattr(tokens, "cache", other)
+    assert tokens.is_revoked("sid-shared")
+    assert not tokens.is_revoked("sid-other")
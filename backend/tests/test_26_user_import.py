@@ -0,0 +1,74 @@
+import time
+from db.database import SessionLocal
+from db import models
+from api.users import import_users
+from api.security import verify_password
+
+
+def test_signup_is_one_transaction_and_duplicates_conflict(client):
+    payload = {"email": "single-tx@example.com", "name": "Tx", "auth_provider": "email", "password_hash": "pw"}
+    first = client.post("/users/", json=payload)
+    assert first.status_code == 200
+    assert first.json()["email"] == "single-tx@example.com"
+
+    # The unique index answers; nothing half-written
+    duplicate = client.post("/users/", json=payload)
+    assert duplicate.status_code == 409
+    db = SessionLocal()
+    try:
+        owner = db.query(models.User).filter_by(email="single-tx@example.com").one()
+        assert db.query(models.BusinessProfile).filter_by(owner_id=owner.user_id).count() == 1
+    finally:
+        db.close()
+
+
+def test_bulk_import_batches_and_skips_existing(client):
+    client.post("/users/", json={"email": "import-0@example.com", "auth_provider": "email", "password_hash": "pw"})
+    records = [
+        {"email": f"import-{i}@example.com", "name": f"Owner {i}", "password": f"pw-{i}", "business_type": "salon"}
+        for i in range(25)
+    ] + [{"email": "IMPORT-3@example.com", "password": "dupe"}]
+
+    db = SessionLocal()
+    try:
+        stats = import_users(db, records, batch_size=10, workers=4, progress=None)
+        assert stats["created"] == 24
+        assert stats["skipped_existing"] == 1
+        assert stats["skipped_duplicate"] == 1
+
+        user = db.query(models.User).filter_by(email="import-7@example.com").one()
+        assert verify_password("pw-7", user.password_hash)
+        business = db.query(models.BusinessProfile).filter_by(owner_id=user.user_id).one()
+        assert (business.name, business.business_type) == ("Owner 7 Business", "salon")
+
+        # Re-running is a no-op
+        assert import_users(db, records, batch_size=10, progress=None)["created"] == 0
+    finally:
+        db.close()
+
+
+def test_passwordless_imported_user_cannot_log_in(client):
+    db = SessionLocal()
+    try:
+        assert import_users(db, [{"email": "nopw@example.com"}], progress=None)["created"] == 1
+    finally:
+        db.close()
+
+    response = client.post("/auth/login", json={"email": "nopw@example.com", "password": "anything"})
+    assert response.status_code == 401
+
+
+def test_import_endpoint_runs_as_a_job(client, admin_headers):
+    users = {"users": [{"email": "job-import@example.com", "password": "pw"}]}
+    assert client.post("/users/import", json=users).status_code == 401
+    # Signed in, but not an admin
+    client.post("/users/", json={"email": "owner-only@example.com", "name": "Owner", "auth_provider": "email", "password_hash": "pw"})
+    token = client.post("/auth/login", json={"email": "owner-only@example.com", "password": "pw"}).json()["access_token"]
+    assert client.post("/users/import", json=users, headers={"Authorization": f"Bearer {token}"}).status_code == 403
+
+    response = client.post("/users/import", json=users, headers=admin_headers)
+    assert response.status_code == 202
+    job = client.get(f"/jobs/{response.json()['job_id']}?wait=5").json()
+    assert job["status"] == "succeeded"
+    assert job["result"]["created"] == 1
+    assert client.get("/users/by-email/job-import@example.com").status_code == 200
@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeout
+from db.database import DATABASE_URL, make_engine, pool_stats
+
+
+def test_pool_saturation_times_out_and_is_measured():
+    engine = make_engine(DATABASE_URL, pool_size=1, max_overflow=0, pool_timeout=0.2)
+    try:
+        with engine.connect() as held:
+            held.execute(text("SELECT 1"))
+            assert pool_stats(engine)["checked_out"] == 1
+            with pytest.raises(PoolTimeout):
+                engine.connect()
+
+        with engine.connect() as connection:
+            assert connection.execute(text("SELECT 1")).scalar() == 1
+
+        stats = pool_stats(engine)
+        assert stats["checkouts"] == 2
+        assert stats["timeouts"] == 1
+        assert stats["wait_ms_max"] >= 200
+        assert stats["checked_out"] == 0
+    finally:
+        engine.dispose()
+
+
+def test_statement_timeout_cancels_slow_queries():
+    engine = make_engine(DATABASE_URL, pool_size=1, max_overflow=0, statement_timeout_ms=100)
+    try:
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError, match="statement timeout"):
+                connection.execute(text("SELECT pg_sleep(2)"))
+    finally:
+        engine.dispose()
+
+
+def test_db_metrics_endpoint(client):
+    stats = client.get("/metrics/db").json()
+    assert stats["checkouts"] >= 1
+    assert {"size", "checked_out", "overflow", "timeouts", "wait_ms_avg"} <= set(stats)
@@ -10,6 +10,59 @@ export function getFromCache(path) {
   return REQUEST_CACHE.get(url) || null
 }
 
+// --- SESSION TOKENS ---
+// Short-lived access token on every request; the refresh token renews it once on a 401
+export function setSessionTokens({ access_token, refresh_token }) {
+  if (access_token) localStorage.setItem('access_token', access_token)
+  if (refresh_token) localStorage.setItem('refresh_token', refresh_token)
+}
+
+export function clearSessionTokens() {
+  localStorage.removeItem('access_token')
+  localStorage.removeItem('refresh_token')
+}
+
+function authHeaders() {
+  const token = localStorage.getItem('access_token')
+  return token ? { Authorization: `Bearer ${token}` } : {}
+}
+
+// Refresh tokens are single use (rotated on every refresh): concurrent 401s share one refresh
+let refreshing = null
+
+function refreshAccessToken() {
+  if (!refreshing) {
+    refreshing = renewSession().finally(() => { refreshing = null })
+  }
+  return refreshing
+}
+
+async function renewSession() {
+  const refresh_token = localStorage.getItem('refresh_token')
+  if (!refresh_token) return false
+  const res = await fetch(`${BASE}/auth/refresh`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ refresh_token })
+  })
+  if (!res.ok) {
+    clearSessionTokens()
+    return false
+  }
+  setSessionTokens(await res.json())
+  return true
+}
+
+// ✅ fetch() with the session token, renewed once on a 401 (write routes need the owner's session)
+export async function authFetch(url, init = {}) {
+  const send = () => fetch(url, { ...init, headers: { ...authHeaders(), ...(init.headers || {}) } })
+  let res = await send()
+  if (res.status === 401 && !url.startsWith(`${BASE}/auth/`) && await refreshAccessToken()) {
+    res = await send()
+  }
+  return res
+}
+
 async function api(path, init = {}) {
   const url = `${BASE}${path}`
   const method = init.method || 'GET'
@@ -20,9 +73,9 @@ async function api(path, init = {}) {
   }
 
   // 2. NETWORK REQUEST
-  const res = await fetch(url, {
-    headers: { 'Content-Type': 'application/json' },
-    ...init
+  const res = await authFetch(url, {
+    ...init,
+    headers: { 'Content-Type': 'application/json', ...(init.headers || {}) }
   })
 
   // 3. ERROR HANDLING
@@ -59,10 +112,27 @@ export const prefetch = (path) => {
   }
 }
 
+// --- JOBS ---
+// Long-polls a background job (never cached) until it finishes
+export async function waitForJob(jobId, waitSeconds = 25) {
+  while (true) {
+    const res = await fetch(`${BASE}/jobs/${jobId}?wait=${waitSeconds}`)
+    if (!res.ok) {
+      throw new Error(`HTTP ${res.status}: ${await res.text()}`)
+    }
+    const job = await res.json()
+    if (job.status === 'succeeded') return job.result
+    if (job.status === 'failed') throw new Error(job.error || 'Job failed')
+  }
+}
+
 // --- AUTH ---
 export const login = (email, password) =>
   api('/auth/login', { method: 'POST', body: JSON.stringify({ email, password }) })
 
+export const logoutSession = () =>
+  api('/auth/logout', { method: 'POST' })
+
 // --- USERS ---
 export const createUser = (payload) =>
   api('/users/', { method: 'POST', body: JSON.stringify(payload) })
@@ -127,7 +197,7 @@ export const uploadMediaFile = async (businessId, mediaType, file) => {
   data.append('media_type', mediaType)
   data.append('file', file)
 
-  const res = await fetch(`${BASE}/media/upload`, {
+  const res = await authFetch(`${BASE}/media/upload`, {
     method: 'POST',
     body: data
   })
@@ -169,8 +239,11 @@ export const getAiMetadata = (metadataId) =>
 export const listAiMetadata = (businessId, limit = 10, offset = 0) =>
   api(`/ai-metadata/?business_id=${businessId}&limit=${limit}&offset=${offset}`)
 
-export const generateAiMetadata = (businessId) =>
-  api(`/ai-metadata/generate?business_id=${businessId}`, { method: 'POST' })
+// ✅ Enqueues a background job, then waits for its result
+export const generateAiMetadata = async (businessId) => {
+  const job = await api(`/ai-metadata/generate?business_id=${businessId}`, { method: 'POST' })
+  return waitForJob(job.job_id)
+}
 
 export const deleteAiMetadata = (metadataId) =>
   api(`/ai-metadata/${metadataId}`, { method: 'DELETE' })
@@ -189,8 +262,10 @@ export const deleteJsonLD = (feedId) =>
   api(`/jsonld/${feedId}`, { method: 'DELETE' })
 
 // --- VISIBILITY ---
-export const runVisibilityCheck = (businessId) =>
-  api(`/visibility/run?business_id=${businessId}`, { method: 'POST' })
+// Returns { result, enrichment }: the scored result now, plus the job that adds AI commentary
+export const runVisibilityCheck = async (businessId) => {
+  return api(`/visibility/run?business_id=${businessId}`, { method: 'POST' })
+}
 
 export const listVisibilityResults = (businessId, limit = 20, offset = 0) =>
   api(`/visibility/result?business_id=${businessId}&limit=${limit}&offset=${offset}`)
@@ -1,4 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from 'react'
+import { setSessionTokens, clearSessionTokens, logoutSession } from '../api/client'
 
 const AuthContext = createContext()
 
@@ -13,7 +14,8 @@ export function AuthProvider({ children }) {
     if (storedBusiness) setBusinessId(storedBusiness)
   }, [])
 
-  const login = (userId, businessId) => {
+  const login = (userId, businessId, tokens) => {
+    if (tokens) setSessionTokens(tokens)
     localStorage.setItem('user_id', userId)
     setUserId(userId)
     if (businessId) {
@@ -23,6 +25,8 @@ export function AuthProvider({ children }) {
   }
 
   const logout = () => {
+    // Revoke the session server-side; local state is cleared either way
+    logoutSession().catch(() => {}).finally(clearSessionTokens)
     localStorage.removeItem('user_id')
     localStorage.removeItem('business_id')
     setUserId(null)
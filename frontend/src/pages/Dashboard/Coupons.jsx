@@ -5,6 +5,7 @@ import '../../styles/dashboard.css'
 // ✅ Import helpers from client.js
 import { 
   API_BASE, 
+  authFetch, 
   getFromCache, 
   listCoupons, 
   createCoupon 
@@ -88,7 +89,7 @@ export default function Coupons() {
       const fullPayload = { business_id: id, ...payload }
 
       // Raw fetch (since updateCoupon helper doesn't exist yet)
-      const res = await fetch(`${API_BASE}/coupons/${couponId}`, {
+      const res = await authFetch(`${API_BASE}/coupons/${couponId}`, {
         method: 'PATCH',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(fullPayload)
@@ -114,7 +115,7 @@ export default function Coupons() {
   async function handleDelete(couponId) {
     try {
       // Raw fetch
-      await fetch(`${API_BASE}/coupons/${couponId}`, { method: 'DELETE' })
+      await authFetch(`${API_BASE}/coupons/${couponId}`, { method: 'DELETE' })
       
       // Optimistic Update: Remove from UI immediately
       setCoupons(prev => prev.filter(c => c.coupon_id !== couponId))
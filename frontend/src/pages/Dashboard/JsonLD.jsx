@@ -3,7 +3,7 @@ import { useParams } from 'react-router-dom'
 import SidebarNav from '../../components/SidebarNav'
 import '../../styles/dashboard.css'
 // ✅ Import API_BASE and getFromCache
-import { API_BASE, getFromCache } from '../../api/client'
+import { API_BASE, authFetch, getFromCache } from '../../api/client'
 
 export default function JsonLD() {
   const { id } = useParams()
@@ -40,7 +40,7 @@ export default function JsonLD() {
 
   async function generateFeed() {
     try {
-      await fetch(`${API_BASE}/jsonld/generate?business_id=${id}`, {
+      await authFetch(`${API_BASE}/jsonld/generate?business_id=${id}`, {
         method: 'POST'
       })
       loadFeeds()
@@ -51,7 +51,7 @@ export default function JsonLD() {
 
   async function deleteFeed(feedId) {
     try {
-      await fetch(`${API_BASE}/jsonld/${feedId}`, { method: 'DELETE' })
+      await authFetch(`${API_BASE}/jsonld/${feedId}`, { method: 'DELETE' })
       loadFeeds()
     } catch (err) {
       console.error(err)
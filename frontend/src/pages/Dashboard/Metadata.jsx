@@ -5,6 +5,7 @@ import '../../styles/dashboard.css'
 // ✅ Import API_BASE, getFromCache, and client functions
 import { 
   API_BASE, 
+  authFetch, 
   getFromCache, 
   listAiMetadata, 
   generateAiMetadata 
@@ -48,7 +49,7 @@ export default function Metadata() {
   async function handleDelete(metaId) {
     try {
       // 1. Send Delete Request (Raw fetch since no helper exists)
-      const res = await fetch(`${API_BASE}/ai-metadata/${metaId}`, { method: 'DELETE' })
+      const res = await authFetch(`${API_BASE}/ai-metadata/${metaId}`, { method: 'DELETE' })
       
       if (res.ok) {
         // 2. Optimistic Update: Remove from UI immediately
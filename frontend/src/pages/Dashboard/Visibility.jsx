@@ -2,7 +2,7 @@ import React, { useEffect, useState } from 'react'
 import { useParams } from 'react-router-dom'
 import SidebarNav from '../../components/SidebarNav'
 import '../../styles/dashboard.css'
-import { API_BASE } from '../../api/client'
+import { API_BASE, authFetch, waitForJob } from '../../api/client'
 
 export default function Visibility() {
   const { id } = useParams()
@@ -18,11 +18,17 @@ export default function Visibility() {
   async function runCheck() {
     setRunning(true)
     try {
-      const res = await fetch(`${API_BASE}/visibility/run?business_id=${id}`, {
+      const res = await authFetch(`${API_BASE}/visibility/run?business_id=${id}`, {
         method: 'POST'
       })
-      const data = await res.json()
-      setResults(prev => [data, ...prev])
+      // The score comes back right away; AI commentary is attached later by a background job
+      const { result, enrichment } = await res.json()
+      setResults(prev => [result, ...prev])
+      if (enrichment) {
+        waitForJob(enrichment.job_id)
+          .then(enriched => setResults(prev => prev.map(r => (r.result_id === enriched.result_id ? enriched : r))))
+          .catch(err => console.error(err))
+      }
     } catch (err) {
       console.error(err)
     } finally {
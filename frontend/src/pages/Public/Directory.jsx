@@ -84,7 +84,7 @@ export default function Directory() {
                 {/* Logo Section */}
                 {biz.media && biz.media.length > 0 ? (
                   <img
-                    src={getImageUrl(biz.media[0].url)}
+                    src={getImageUrl(biz.thumbnail_url || biz.media[0].url)}
                     alt={biz.name}
                     style={{ 
                         width: '60px', 
@@ -21,7 +21,7 @@ export default function Login() {
       if (!user_id) throw new Error("Login failed")
 
       // 2. Log in with context immediately
-      login(user_id, business_id)
+      login(user_id, business_id, response)
 
       // 3. Redirect immediately (No second wait!)
       if (business_id) {
@@ -1,7 +1,7 @@
 import React, { useState } from 'react'
 import { useNavigate, Link } from 'react-router-dom' // Added Link here
 // Import all necessary API functions
-import { createUser, getBusinessByOwner, updateBusiness } from '../../api/client'
+import { createUser, getBusinessByOwner, updateBusiness, login as loginUser } from '../../api/client'
 import { useAuth } from '../../context/AuthContext'
 import '../../styles/register.css'
 
@@ -45,7 +45,13 @@ export default function Register() {
       // 2. Fetch that auto-created placeholder business
       const business = await getBusinessByOwner(user.user_id)
 
-      // 3. Update the placeholder business with the actual details from the form
+      // 3. Log the user in with BOTH IDs
+      // This is crucial for the Navbar to see the businessId immediately,
+      // and the update below needs the session (only the owner may edit a business)
+      const session = await loginUser(email, password)
+      login(user.user_id, business.business_id, session)
+
+      // 4. Update the placeholder business with the actual details from the form
       if (business) {
          await updateBusiness(business.business_id, {
              name: businessName,
@@ -54,10 +60,6 @@ export default function Register() {
          })
       }
 
-      // 4. Log the user in with BOTH IDs
-      // This is crucial for the Navbar to see the businessId immediately
-      login(user.user_id, business.business_id)
-
       // 5. Redirect to the Dashboard
       navigate(`/dashboard/${business.business_id}`)
 
@@ -27,6 +27,7 @@ ADD CONSTRAINT fk_business_profiles_owner FOREIGN KEY (owner_id) REFERENCES user
 
 CREATE INDEX ix_business_profiles_owner ON business_profiles(owner_id);
 CREATE INDEX ix_business_profiles_business_type ON business_profiles(business_type);
-CREATE INDEX ix_business_profiles_created_at ON business_profiles (created_at);
+-- Keyset order of the directory and the sitemap files
+CREATE INDEX ix_business_profiles_created_at ON business_profiles (created_at, business_id);
 CREATE INDEX ix_business_profiles_published ON business_profiles(published) WHERE published IS TRUE;
 
@@ -0,0 +1,14 @@
+CREATE TABLE jsonld_source(
+	business_id UUID PRIMARY KEY,
+	feed_id UUID NOT NULL,
+	source_hash VARCHAR(64) NOT NULL,
+	updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+ALTER TABLE jsonld_source
+	ADD CONSTRAINT fk_jsonld_source_business FOREIGN KEY(business_id)
+	REFERENCES business_profiles(business_id) ON DELETE CASCADE;
+
+ALTER TABLE jsonld_source
+	ADD CONSTRAINT fk_jsonld_source_feed FOREIGN KEY(feed_id)
+	REFERENCES jsonld_feed(feed_id) ON DELETE CASCADE;
@@ -0,0 +1,10 @@
+CREATE TABLE media_blobs(
+	sha256 VARCHAR(64) PRIMARY KEY,
+	url TEXT NOT NULL UNIQUE,
+	size_bytes BIGINT NOT NULL,
+	ref_count INTEGER NOT NULL DEFAULT 0,
+	created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+
+CREATE INDEX ix_media_blobs_unreferenced ON media_blobs (sha256) WHERE ref_count = 0; -- garbage collection candidates
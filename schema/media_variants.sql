@@ -0,0 +1,14 @@
+CREATE TABLE media_variants(
+	sha256 VARCHAR(64) NOT NULL,
+	width INTEGER NOT NULL,
+	height INTEGER NOT NULL,
+	format TEXT NOT NULL DEFAULT 'webp',
+	url TEXT NOT NULL,
+	size_bytes BIGINT NOT NULL,
+	created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+	PRIMARY KEY (sha256, width)
+);
+
+ALTER TABLE media_variants
+	ADD CONSTRAINT fk_media_variants_blob FOREIGN KEY(sha256)
+	REFERENCES media_blobs(sha256) ON DELETE CASCADE;
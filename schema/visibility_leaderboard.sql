@@ -0,0 +1,18 @@
+CREATE TABLE visibility_leaderboard(
+	business_id UUID PRIMARY KEY,
+	result_id UUID NOT NULL,
+	rank INTEGER NOT NULL,
+	visibility_score NUMERIC(5,2) NOT NULL,
+	computed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+ALTER TABLE visibility_leaderboard
+	ADD CONSTRAINT fk_visibility_leaderboard_business FOREIGN KEY(business_id)
+	REFERENCES business_profiles(business_id) ON DELETE CASCADE;
+
+ALTER TABLE visibility_leaderboard
+	ADD CONSTRAINT fk_visibility_leaderboard_result FOREIGN KEY(result_id)
+	REFERENCES visibility_check_result(result_id) ON DELETE CASCADE;
+
+
+CREATE INDEX ix_visibility_leaderboard_rank ON visibility_leaderboard (rank); -- leaderboard pages